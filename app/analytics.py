@@ -0,0 +1,160 @@
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+from app import cache
+
+# metryki licznikowe z StatystykiSezonowe, dla ktorych liczymy wartosci na 90 minut
+METRYKI = ("gole", "asysty", "zolte_kartki", "czerwone_kartki", "czyste_konta")
+
+# kolumny, ktore loader musi zwrocic (w tej kolejnosci)
+KOLUMNY = (
+    "id_zawodnika", "imie", "nazwisko", "nazwa_klubu", "id_pozycji", "wystepy", "minuty_rozegrane"
+) + METRYKI
+
+class _DaneSezonu:
+    """Kolumny statystyk sezonu jako tablice NumPy (jeden wiersz na zawodnika)"""
+    def __init__(self, wiersze: Sequence[tuple]):
+        kolumny = list(zip(*wiersze)) if wiersze else [()] * len(KOLUMNY)
+        dane = dict(zip(KOLUMNY, kolumny))
+        self.n = len(wiersze)
+        self.id_zawodnika = np.array(dane["id_zawodnika"], dtype=np.int64)
+        self.imie = list(dane["imie"])
+        self.nazwisko = list(dane["nazwisko"])
+        self.nazwa_klubu = list(dane["nazwa_klubu"])
+        # brak pozycji jako osobna grupa -1
+        self.id_pozycji = np.array([-1 if p is None else p for p in dane["id_pozycji"]], dtype=np.int64)
+        self.wystepy = np.array(dane["wystepy"], dtype=np.int64)
+        self.minuty = np.array(dane["minuty_rozegrane"], dtype=np.float64)
+        self.metryki = {m: np.array(dane[m], dtype=np.float64) for m in METRYKI}
+
+def _percentyle(wartosci: np.ndarray, grupy: np.ndarray) -> np.ndarray:
+    """
+    Percentyl kazdej wartosci w obrebie jej grupy: (mniejsze + 0.5 * rowne) / liczebnosc * 100,
+    liczony jednym sortowaniem dla wszystkich grup naraz
+    """
+    n = len(wartosci)
+    if n == 0:
+        return np.empty(0)
+    kolejnosc = np.lexsort((wartosci, grupy))
+    g, v = grupy[kolejnosc], wartosci[kolejnosc]
+    indeksy = np.arange(n)
+
+    nowa_grupa = np.r_[True, g[1:] != g[:-1]]
+    nowa_wartosc = nowa_grupa | np.r_[True, v[1:] != v[:-1]]
+    poczatek_grupy = np.maximum.accumulate(np.where(nowa_grupa, indeksy, 0))
+    poczatek_wartosci = np.maximum.accumulate(np.where(nowa_wartosc, indeksy, 0))
+    # koniec biegu rownych wartosci / grupy = poczatek nastepnego - 1
+    koniec_wartosci = np.minimum.accumulate(np.where(np.r_[nowa_wartosc[1:], True], indeksy, n)[::-1])[::-1]
+    koniec_grupy = np.minimum.accumulate(np.where(np.r_[nowa_grupa[1:], True], indeksy, n)[::-1])[::-1]
+
+    mniejsze = poczatek_wartosci - poczatek_grupy
+    rowne = koniec_wartosci - poczatek_wartosci + 1
+    licznosc = koniec_grupy - poczatek_grupy + 1
+
+    wynik = np.empty(n)
+    wynik[kolejnosc] = (mniejsze + 0.5 * rowne) / licznosc * 100
+    return wynik
+
+def _z_score(wartosci: np.ndarray, grupy: np.ndarray) -> np.ndarray:
+    """Odchylenie od sredniej grupy w jednostkach odchylenia standardowego (0 dla grup bez rozrzutu)"""
+    if len(wartosci) == 0:
+        return np.empty(0)
+    _, g = np.unique(grupy, return_inverse=True)
+    liczebnosc = np.bincount(g)
+    srednia = np.bincount(g, wartosci) / liczebnosc
+    wariancja = np.maximum(np.bincount(g, wartosci * wartosci) / liczebnosc - srednia ** 2, 0)
+    odchylenie = np.sqrt(wariancja)[g]
+    z = np.zeros(len(wartosci))
+    np.divide(wartosci - srednia[g], odchylenie, out=z, where=odchylenie > 1e-12)
+    return z
+
+class Analityka:
+    """
+    Analityka zawodnikow na danych z StatystykiSezonowe: kolumny sezonu sa ladowane do tablic
+    NumPy raz i trzymane w pamieci procesu, a wartosci na 90 minut, percentyle i z-score
+    w obrebie pozycji sa liczone wektorowo dla wszystkich zawodnikow w jednym przebiegu.
+    Zapisy statystyk i zmiany zawodnikow/klubow uniewazniaja dane (per sezon lub w calosci),
+    takze gdy przyszly z innego procesu (wymiana wersji w cache.wersje).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sezony: Dict[str, _DaneSezonu] = {}
+        self._wersja = 0
+
+    def _dane(self, sezon: str, loader: Callable[[], Sequence[tuple]]) -> _DaneSezonu:
+        dane = self._sezony.get(sezon)
+        if dane is not None:
+            return dane
+        wersja = self._wersja
+        dane = _DaneSezonu(loader())
+        with self._lock:
+            # zapis, ktory przyszedl w trakcie ladowania, uniewaznia ten wynik
+            if wersja == self._wersja:
+                self._sezony[sezon] = dane
+        return dane
+
+    def invalidate(self, sezon: Optional[str] = None):
+        with self._lock:
+            self._wersja += 1
+            if sezon is None:
+                self._sezony.clear()
+            else:
+                self._sezony.pop(sezon, None)
+
+    def raport(self, sezon: str, loader, metryki: Sequence[str] = METRYKI, pozycja_id: Optional[int] = None,
+               min_minut: int = 0, sortuj: Optional[str] = None, limit: int = 100) -> dict:
+        """
+        Dla kazdej metryki: wartosc, wartosc na 90 minut, percentyl i z-score (na 90 minut)
+        wsrod zawodnikow tej samej pozycji, ktorzy rozegrali co najmniej min_minut.
+        sortuj to nazwa metryki lub pola wyniku (np. "gole_na_90", "asysty_percentyl").
+        """
+        nieznane = [m for m in metryki if m not in METRYKI]
+        if nieznane or not metryki:
+            raise ValueError(f"Nieznane metryki: {', '.join(nieznane)}; dostępne: {', '.join(METRYKI)}")
+        klucz = sortuj or f"{metryki[0]}_na_90"
+        pola = {f"{m}{k}" for m in metryki for k in ("", "_na_90", "_percentyl", "_z")}
+        if klucz not in pola:
+            raise ValueError(f"Nie można sortować po {klucz}; dostępne: {', '.join(sorted(pola))}")
+
+        dane = self._dane(sezon, loader)
+        maska = dane.minuty >= max(min_minut, 1)
+        grupy = dane.id_pozycji[maska]
+        minuty = dane.minuty[maska]
+
+        kolumny: Dict[str, np.ndarray] = {}
+        for m in metryki:
+            wartosci = dane.metryki[m][maska]
+            na_90 = wartosci / minuty * 90
+            kolumny[m] = wartosci
+            kolumny[f"{m}_na_90"] = na_90
+            kolumny[f"{m}_percentyl"] = _percentyle(na_90, grupy)
+            kolumny[f"{m}_z"] = _z_score(na_90, grupy)
+
+        wybrani = np.flatnonzero(maska)
+        if pozycja_id is not None:
+            na_pozycji = grupy == pozycja_id
+            wybrani = wybrani[na_pozycji]
+            kolumny = {k: v[na_pozycji] for k, v in kolumny.items()}
+
+        kolejnosc = np.argsort(-kolumny[klucz], kind="stable")[:limit]
+
+        zawodnicy: List[dict] = []
+        for i in kolejnosc:
+            j = wybrani[i]
+            wiersz = {
+                "id_zawodnika": int(dane.id_zawodnika[j]),
+                "imie": dane.imie[j],
+                "nazwisko": dane.nazwisko[j],
+                "nazwa_klubu": dane.nazwa_klubu[j],
+                "id_pozycji": None if dane.id_pozycji[j] < 0 else int(dane.id_pozycji[j]),
+                "wystepy": int(dane.wystepy[j]),
+                "minuty": int(dane.minuty[j])
+            }
+            for nazwa, wartosci in kolumny.items():
+                wiersz[nazwa] = int(wartosci[i]) if nazwa in metryki else round(float(wartosci[i]), 2)
+            zawodnicy.append(wiersz)
+
+        return {"sezon": sezon, "liczba_zawodnikow": len(wybrani), "zawodnicy": zawodnicy}
+
+analityka = Analityka()
+cache.wersje.nasluchuj(("statystyki", "zawodnicy", "kluby"), lambda tagi: analityka.invalidate())
@@ -0,0 +1,288 @@
+"""
+Benchmark endpointow API uruchamiany w procesie (transport ASGI, bez serwera HTTP), np.:
+
+    python -m app.benchmark --database-url sqlite:////tmp/bench.db --generuj 5 --zapisz
+    python -m app.benchmark --database-url sqlite:////tmp/bench.db
+
+Pierwsze wywolanie generuje dane (app.generator) i zapisuje wyniki jako baseline,
+kolejne porownuja p95 kazdej trasy z baseline i koncza sie kodem 1, gdy ktoras
+trasa zwolnila o wiecej niz --prog.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+# trasy zapisujace maja jawne scenariusze; GET-y sa wykrywane automatycznie z aplikacji
+DODATKOWE_ODCZYTY = [
+    ("GET /mecze/?sezon", "/mecze/", lambda p: {"sezon": p["sezon"]}),
+    ("GET /mecze/?sezon&limit=1000", "/mecze/", lambda p: {"sezon": p["sezon"], "limit": 1000}),
+    ("GET /zawodnicy/?limit=1000", "/zawodnicy/", lambda p: {"limit": 1000}),
+    ("GET /kluby/?limit=1000", "/kluby/", lambda p: {"limit": 1000}),
+]
+
+# strumienie bez konca (SSE) - nie da sie zmierzyc czasu odpowiedzi
+POMIJANE_TRASY = {"/live/stream"}
+
+def _percentyl(posortowane, p: float) -> float:
+    if not posortowane:
+        return 0.0
+    k = (len(posortowane) - 1) * p
+    d = int(k)
+    g = min(d + 1, len(posortowane) - 1)
+    return posortowane[d] + (posortowane[g] - posortowane[d]) * (k - d)
+
+class Scenariusz:
+    def __init__(self, nazwa: str, metoda: str, sciezka, params=None, body=None, przygotuj=None):
+        self.nazwa = nazwa
+        self.metoda = metoda
+        self.sciezka = sciezka
+        self.params = params
+        self.body = body
+        self.przygotuj = przygotuj
+
+    def zadanie(self, i: int):
+        sciezka = self.sciezka(i) if callable(self.sciezka) else self.sciezka
+        params = self.params(i) if callable(self.params) else self.params
+        body = self.body(i) if callable(self.body) else self.body
+        return sciezka, params, body
+
+def _przyklady(db, models):
+    from sqlalchemy import func, select
+
+    ostatni_mecz = db.scalars(select(models.Mecze).order_by(models.Mecze.data_meczu.desc()).limit(1)).first()
+    if ostatni_mecz is None:
+        raise SystemExit("Baza nie zawiera meczow - uzyj --generuj N")
+    return {
+        "klub_id": ostatni_mecz.id_klubu_gospodarze,
+        "drugi_klub_id": ostatni_mecz.id_klubu_goscie,
+        "mecz_id": ostatni_mecz.id_meczu,
+        "sezon": ostatni_mecz.sezon,
+        "zawodnik_id": db.scalar(select(func.min(models.Zawodnicy.id_zawodnika))),
+        "liczba_zawodnikow": db.scalar(select(func.max(models.Zawodnicy.id_zawodnika))),
+        "pozycja_id": 12,
+        "q": "kow",
+        "data": ostatni_mecz.data_meczu
+    }
+
+def _scenariusze(app, p):
+    from fastapi.routing import APIRoute
+
+    scenariusze = []
+    for trasa in app.routes:
+        if not isinstance(trasa, APIRoute) or "GET" not in trasa.methods or trasa.path in POMIJANE_TRASY:
+            continue
+        try:
+            sciezka = trasa.path.format(**{par.name: p[par.name] for par in trasa.dependant.path_params})
+            params = {par.name: p[par.name] for par in trasa.dependant.query_params if par.required}
+        except KeyError:
+            continue
+        scenariusze.append(Scenariusz(f"GET {trasa.path}", "GET", sciezka, params))
+
+    for nazwa, sciezka, params in DODATKOWE_ODCZYTY:
+        scenariusze.append(Scenariusz(nazwa, "GET", sciezka, params(p)))
+
+    start = p["data"] + timedelta(days=365)
+    kluby = (p["klub_id"], p["drugi_klub_id"])
+
+    def mecz(i):
+        return {
+            "data_meczu": (start + timedelta(seconds=i)).isoformat(),
+            "id_klubu_gospodarze": kluby[i % 2],
+            "id_klubu_goscie": kluby[(i + 1) % 2],
+            "bramki_gospodarze": i % 4,
+            "bramki_goscie": i % 3,
+            "sezon": "bench",
+            "kolejka": 1
+        }
+
+    scenariusze += [
+        Scenariusz("POST /mecze/", "POST", "/mecze/", body=mecz),
+        Scenariusz("POST /mecze/bulk", "POST", "/mecze/bulk", body=lambda i: [mecz(i * 10 + j) for j in range(10)]),
+        Scenariusz("POST /zawodnicy/", "POST", "/zawodnicy/", body=lambda i: {
+            "imie": "Bench", "nazwisko": f"Zawodnik{i}", "id_klubu": p["klub_id"], "id_pozycji": p["pozycja_id"]
+        }),
+        Scenariusz("POST /statystyki/", "POST", "/statystyki/", body=lambda i: {
+            "id_zawodnika": i % p["liczba_zawodnikow"] + 1, "id_meczu": p["mecze_statystyk"][i // p["liczba_zawodnikow"]],
+            "gole": i % 2, "asysty": i % 3 % 2, "minuty_rozegrane": 90
+        }, przygotuj=lambda klient, n: _mecze_dla_statystyk(klient, p, n, mecz)),
+        Scenariusz("POST /statystyki/bulk", "POST", "/statystyki/bulk", body=lambda i: [
+            {"id_zawodnika": z, "id_meczu": p["mecze_bulk"][i], "gole": z % 2, "minuty_rozegrane": 90}
+            for z in range(1, min(p["liczba_zawodnikow"], 30) + 1)
+        ], przygotuj=lambda klient, n: _mecze_dla_bulk(klient, p, n, mecz)),
+        Scenariusz("POST /statystyki/live", "POST", "/statystyki/live", body=lambda i: [
+            {"id_zawodnika": i % p["liczba_zawodnikow"] + 1, "id_meczu": p["mecz_id"], "minuty_rozegrane": i % 90 + 1}
+        ]),
+        Scenariusz("PUT /zawodnicy/{zawodnik_id}", "PUT", f"/zawodnicy/{p['zawodnik_id']}",
+                   body=lambda i: {"numer_koszulki": i % 99 + 1}),
+        Scenariusz("POST /kluby/", "POST", "/kluby/", body=lambda i: {"nazwa_klubu": f"Bench {time.time_ns()} {i}"}),
+        Scenariusz("PUT /kluby/{klub_id}", "PUT", f"/kluby/{p['klub_id']}", body=lambda i: {"id_stadionu": None}),
+        Scenariusz("POST /transfery/", "POST", "/transfery/", body=lambda i: {
+            "id_zawodnika": p["zawodnik_id"], "id_klubu_z": kluby[i % 2], "id_klubu_do": kluby[(i + 1) % 2],
+            "data_transferu": (start.date() + timedelta(days=i)).isoformat(), "typ_transferu": "transfer"
+        }),
+    ]
+    return scenariusze
+
+async def _mecze_dla_statystyk(klient, p, n: int, mecz):
+    """Nowe mecze, tak aby kazda para (zawodnik, mecz) w scenariuszu byla unikalna"""
+    p["mecze_statystyk"] = []
+    for i in range(-(-n // p["liczba_zawodnikow"])):
+        r = await klient.post("/mecze/", json=mecz(10 ** 6 + i))
+        p["mecze_statystyk"].append(r.json()["id_meczu"])
+
+async def _mecze_dla_bulk(klient, p, n: int, mecz):
+    """Osobny nowy mecz dla kazdego zadania bulk (caly mecz statystyk na zadanie)"""
+    p["mecze_bulk"] = []
+    for i in range(n):
+        r = await klient.post("/mecze/", json=mecz(2 * 10 ** 6 + i))
+        p["mecze_bulk"].append(r.json()["id_meczu"])
+
+async def _zmierz(klient, scenariusz, iteracje: int, rozgrzewka: int, rownolegle: int, engine):
+    from app.instrumentation import licz_zapytania
+
+    if scenariusz.przygotuj:
+        await scenariusz.przygotuj(klient, iteracje + rozgrzewka)
+
+    async def wykonaj(i):
+        sciezka, params, body = scenariusz.zadanie(i)
+        t = time.perf_counter()
+        r = await klient.request(scenariusz.metoda, sciezka, params=params, json=body)
+        czas = time.perf_counter() - t
+        if r.status_code >= 400:
+            raise RuntimeError(f"{scenariusz.nazwa}: HTTP {r.status_code} {r.text[:200]}")
+        return czas
+
+    for i in range(rozgrzewka):
+        await wykonaj(iteracje + i)
+
+    czasy = []
+    kolejne = iter(range(iteracje))
+
+    async def pracownik():
+        for i in kolejne:
+            czasy.append(await wykonaj(i))
+
+    with licz_zapytania(engine) as licznik:
+        start = time.perf_counter()
+        await asyncio.gather(*(pracownik() for _ in range(rownolegle)))
+        calosc = time.perf_counter() - start
+
+    czasy.sort()
+    return {
+        "n": len(czasy),
+        "p50_ms": round(_percentyl(czasy, 0.50) * 1000, 3),
+        "p95_ms": round(_percentyl(czasy, 0.95) * 1000, 3),
+        "p99_ms": round(_percentyl(czasy, 0.99) * 1000, 3),
+        "srednia_ms": round(statistics.fmean(czasy) * 1000, 3),
+        "rps": round(len(czasy) / calosc, 1),
+        "zapytania_na_zadanie": round(licznik.liczba / len(czasy), 2)
+    }
+
+async def uruchom(iteracje: int, rozgrzewka: int, rownolegle: int, filtr=None):
+    import httpx
+    import main as aplikacja
+    from app import models
+    from app.database import SessionLocal, engine
+
+    db = SessionLocal()
+    try:
+        przyklady = _przyklady(db, models)
+    finally:
+        db.close()
+
+    wyniki = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=aplikacja.app), base_url="http://bench") as klient:
+        for scenariusz in _scenariusze(aplikacja.app, przyklady):
+            if filtr and filtr not in scenariusz.nazwa:
+                continue
+            wyniki[scenariusz.nazwa] = await _zmierz(
+                klient, scenariusz, iteracje, rozgrzewka, rownolegle, engine
+            )
+            w = wyniki[scenariusz.nazwa]
+            print(f"{scenariusz.nazwa:55} p50 {w['p50_ms']:8.2f} ms  p95 {w['p95_ms']:8.2f} ms  "
+                  f"p99 {w['p99_ms']:8.2f} ms  {w['rps']:8.1f} req/s  {w['zapytania_na_zadanie']:5.1f} SQL")
+    return wyniki
+
+def zmiany(wyniki: dict, baseline: dict):
+    """(trasa, p95 baseline, p95 teraz, zmiana wzgledna) dla tras obecnych w obu przebiegach"""
+    wynik = []
+    for nazwa, w in wyniki.items():
+        b = baseline.get(nazwa)
+        if not b or not b.get("p95_ms"):
+            continue
+        wynik.append((nazwa, b["p95_ms"], w["p95_ms"], w["p95_ms"] / b["p95_ms"] - 1))
+    return wynik
+
+def porownaj(wyniki: dict, baseline: dict, prog: float):
+    """Zwraca liste tras, ktorych p95 pogorszylo sie o wiecej niz prog (np. 0.25 = 25%)"""
+    return [z for z in zmiany(wyniki, baseline) if z[3] > prog]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.benchmark", description="Benchmark endpointow API")
+    parser.add_argument("--database-url", help="Baza do testow (domyslnie DATABASE_URL z ustawien)")
+    parser.add_argument("--generuj", type=int, metavar="SEZONY", help="Wygeneruj dane (wyczysci baze!)")
+    parser.add_argument("--iteracje", type=int, default=200, help="Liczba mierzonych zadan na trase")
+    parser.add_argument("--rozgrzewka", type=int, default=10, help="Liczba zadan rozgrzewajacych na trase")
+    parser.add_argument("--rownolegle", type=int, default=1, help="Liczba rownoleglych klientow")
+    parser.add_argument("--trasy", help="Mierz tylko trasy zawierajace ten tekst")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="Plik z wynikami odniesienia")
+    parser.add_argument("--wyniki", help="Zapisz wyniki biezacego przebiegu do pliku")
+    parser.add_argument("--zapisz", action="store_true", help="Zapisz wyniki jako nowy baseline")
+    parser.add_argument("--prog", type=float, default=0.25, help="Dopuszczalny wzrost p95 (domyslnie 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    # ustawienia i silnik sa tworzone przy imporcie app.database
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SLOW_QUERY_MS", "0")
+
+    if args.generuj:
+        from sqlalchemy import create_engine
+        from app.config import get_settings
+        from app.generator import generuj
+        generuj(create_engine(get_settings().database_url), sezony=args.generuj, wyczysc=True)
+
+    wyniki = asyncio.run(uruchom(args.iteracje, args.rozgrzewka, args.rownolegle, args.trasy))
+    raport = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "iteracje": args.iteracje,
+            "rownolegle": args.rownolegle
+        },
+        "trasy": wyniki
+    }
+
+    if args.wyniki:
+        with open(args.wyniki, "w", encoding="utf-8") as f:
+            json.dump(raport, f, indent=2, ensure_ascii=False)
+    if args.zapisz:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(raport, f, indent=2, ensure_ascii=False)
+        print(f"Zapisano baseline: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Brak pliku {args.baseline} - uruchom z --zapisz, aby utworzyc baseline")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["trasy"]
+
+    for nazwa, przed, po, zmiana in zmiany(wyniki, baseline):
+        if zmiana < -args.prog:
+            print(f"POPRAWA {nazwa}: p95 {przed:.2f} ms -> {po:.2f} ms ({zmiana:.0%})")
+    regresje = porownaj(wyniki, baseline, args.prog)
+    for nazwa, przed, po, zmiana in regresje:
+        print(f"REGRESJA {nazwa}: p95 {przed:.2f} ms -> {po:.2f} ms (+{zmiana:.0%})")
+    if regresje:
+        return 1
+    print(f"Brak regresji powyzej {args.prog:.0%} wzgledem {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
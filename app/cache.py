@@ -0,0 +1,384 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from app import models, schemas
+
+logger = logging.getLogger("app.cache")
+
+_tabela_adapter = TypeAdapter(List[schemas.Klub])
+
+class TabelaLigowaCache:
+    """
+    Wersjonowana tabela ligowa trzymana w pamieci procesu jako gotowy JSON.
+    Kazdy zapis zmieniajacy liczniki klubow wywoluje invalidate(), ktore podbija wersje;
+    odczyt przy aktualnej wersji nie wykonuje zadnego zapytania do bazy.
+    Zapisy innych procesow uniewazniaja tabele po wymianie wersji (WersjeZasobow.nasluchuj).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wersja = 0
+        self._dane: Optional[Tuple[int, bytes]] = None
+
+    @property
+    def wersja(self) -> int:
+        return self._wersja
+
+    def get(self, loader: Callable[[], list]) -> bytes:
+        dane = self._dane
+        if dane is not None and dane[0] == self._wersja:
+            return dane[1]
+
+        # loader nie jest wolany pod blokada: w sciezce async (run_sync) czekanie na baze
+        # oddaje petle zdarzen innym zadaniom, ktore zablokowalyby sie na tym samym locku
+        wersja = self._wersja
+        kluby = _tabela_adapter.validate_python(loader(), from_attributes=True)
+        tresc = _tabela_adapter.dump_json(kluby)
+        with self._lock:
+            # zapis, ktory przyszedl w trakcie ladowania, uniewaznia ten wynik
+            if wersja == self._wersja:
+                self._dane = (wersja, tresc)
+        return tresc
+
+    def invalidate(self):
+        with self._lock:
+            self._wersja += 1
+            self._dane = None
+
+tabela_ligowa = TabelaLigowaCache()
+
+#wersje zasobow
+#tagi danych, ktorych wersje procesy wymieniaja przez tabele WersjeDanych
+TAGI = ("kluby", "mecze", "zawodnicy", "statystyki", "transfery", "slowniki")
+
+class WersjeZasobow:
+    """
+    Liczniki wersji danych (tagow: "mecze", "kluby", "statystyki", ...) podbijane przez crud
+    po kazdym zatwierdzonym zapisie. Na nich opieraja sie cache odpowiedzi i ETagi.
+
+    Liczniki sa lokalne dla procesu, wiec zapisy innych procesow (workerow uvicorn, polecen
+    serwisowych, generatora) docieraja przez tabele WersjeDanych: synchronizuj() dopisuje tam
+    podbicia tego procesu i czyta wersje pozostalych. Tag zmieniony przez kogos innego jest
+    podbijany lokalnie i przekazywany sluchaczom (nasluchuj), ktorzy czyszcza swoje dane w pamieci.
+    Watek uruchomiony przez start() robi to co `interwal` sekund, wiec cudzy zapis jest widoczny
+    najpozniej po okolo dwoch interwalach; zapisy w zadaniach nie dotykaja WersjeDanych.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wersje: Dict[str, int] = {}
+        self._do_zapisu: Set[str] = set()
+        self._w_bazie: Optional[Dict[str, int]] = None
+        self._sluchacze: List[Tuple[frozenset, Callable[[Set[str]], None]]] = []
+        self._synchronizacja = threading.Lock()
+        self._stop = threading.Event()
+        self._watek: Optional[threading.Thread] = None
+
+    def podbij(self, *tagi: str):
+        with self._lock:
+            for tag in tagi:
+                self._wersje[tag] = self._wersje.get(tag, 0) + 1
+            self._do_zapisu.update(tagi)
+
+    def get(self, tagi) -> tuple:
+        return tuple(self._wersje.get(t, 0) for t in tagi)
+
+    def nasluchuj(self, tagi: Iterable[str], funkcja: Callable[[Set[str]], None]):
+        """funkcja(zmienione_tagi) jest wolana, gdy inny proces zmienil ktorys z tagow"""
+        self._sluchacze.append((frozenset(tagi), funkcja))
+
+    def _przygotuj(self, engine: Engine):
+        tabela = models.WersjeDanych.__table__
+        with engine.connect() as conn:
+            istniejace = set(conn.scalars(select(tabela.c.tag)))
+        for tag in TAGI:
+            if tag not in istniejace:
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(insert(tabela).values(tag=tag, wersja=0))
+                except IntegrityError:
+                    # wiersz dodal rownolegle inny proces
+                    pass
+
+    def synchronizuj(self, engine: Engine) -> Set[str]:
+        """
+        Jedna wymiana z WersjeDanych: zapisuje podbicia tego procesu od poprzedniej wymiany
+        i zwraca tagi zmienione w tym czasie przez inne procesy (juz podbite lokalnie i przekazane
+        sluchaczom). Pierwsza wymiana tylko zapamietuje wersje z bazy.
+        """
+        with self._synchronizacja:
+            return self._synchronizuj(engine)
+
+    def _synchronizuj(self, engine: Engine) -> Set[str]:
+        if self._w_bazie is None:
+            self._przygotuj(engine)
+        tabela = models.WersjeDanych.__table__
+        with self._lock:
+            do_zapisu, self._do_zapisu = self._do_zapisu, set()
+        try:
+            with engine.begin() as conn:
+                if do_zapisu:
+                    conn.execute(
+                        update(tabela).where(tabela.c.tag.in_(sorted(do_zapisu))).values(wersja=tabela.c.wersja + 1)
+                    )
+                # odczyt po UPDATE w tej samej transakcji: wlasne podbicia sa dokladnie +1
+                w_bazie = dict(conn.execute(select(tabela.c.tag, tabela.c.wersja)).all())
+        except Exception:
+            with self._lock:
+                self._do_zapisu |= do_zapisu
+            raise
+
+        poprzednie, self._w_bazie = self._w_bazie, w_bazie
+        if poprzednie is None:
+            return set()
+        zmienione = {
+            tag for tag, wersja in w_bazie.items()
+            if wersja != poprzednie.get(tag, 0) + (tag in do_zapisu)
+        }
+        if zmienione:
+            with self._lock:
+                for tag in zmienione:
+                    self._wersje[tag] = self._wersje.get(tag, 0) + 1
+            for tagi, funkcja in self._sluchacze:
+                if tagi & zmienione:
+                    try:
+                        funkcja(zmienione)
+                    except Exception:
+                        logger.exception("Uniewaznienie po zmianie %s w innym procesie nie powiodlo sie", sorted(zmienione))
+        return zmienione
+
+    def start(self, engine: Engine, interwal: float):
+        """Pierwsza wymiana od razu (przed rozgrzaniem cache), kolejne w watku co `interwal` sekund"""
+        if interwal <= 0 or self._watek is not None:
+            return
+        try:
+            self.synchronizuj(engine)
+        except Exception as e:
+            logger.warning("WersjeDanych niedostepne (%s) - pierwsza udana wymiana uniewazni wszystko", e)
+            self._w_bazie = {}
+        self._stop.clear()
+        self._watek = threading.Thread(
+            target=self._synchronizuj_co, args=(engine, interwal), name="wersje-danych", daemon=True
+        )
+        self._watek.start()
+
+    def stop(self, engine: Engine):
+        """Zatrzymuje watek i zapisuje ostatnie podbicia tego procesu"""
+        if self._watek is None:
+            return
+        self._stop.set()
+        self._watek.join()
+        self._watek = None
+        try:
+            self.synchronizuj(engine)
+        except Exception:
+            logger.exception("Nie zapisano wersji danych przy zatrzymaniu")
+
+    def _synchronizuj_co(self, engine: Engine, interwal: float):
+        while not self._stop.wait(interwal):
+            try:
+                self.synchronizuj(engine)
+            except Exception:
+                logger.exception("Wymiana wersji danych nie powiodla sie - ponowienie za %s s", interwal)
+
+wersje = WersjeZasobow()
+wersje.nasluchuj(("kluby", "mecze"), lambda tagi: tabela_ligowa.invalidate())
+
+def _regula(reguly, sciezka: str):
+    for regula in reguly:
+        if sciezka.startswith(regula[0]):
+            return regula
+    return None
+
+def _klucz(sciezka: str, query_string: bytes) -> str:
+    parametry = sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+    return f"{sciezka}?{urlencode(parametry)}" if parametry else sciezka
+
+#cache odpowiedzi GET
+#(prefiks sciezki, TTL w sekundach, tagi danych, od ktorych zalezy odpowiedz)
+REGULY_CACHE = (
+    ("/raporty/ranking-strzelcow", 60, ("statystyki", "zawodnicy", "kluby")),
+    ("/raporty/forma-druzyny/", 60, ("mecze", "kluby")),
+    ("/raporty/porownanie-zawodnikow", 60, ("statystyki", "zawodnicy", "kluby")),
+    ("/raporty/skutecznosc-klubow", 60, ("mecze", "kluby")),
+    ("/raporty/analityka", 60, ("statystyki", "zawodnicy", "kluby")),
+    ("/pozycje/", 3600, ("slowniki",)),
+    ("/stadiony/", 3600, ("slowniki",)),
+    ("/menedzerowie/", 3600, ("slowniki",)),
+)
+
+MAKS_ROZMIAR_ODPOWIEDZI = 1 << 20
+
+class CacheOdpowiedzi:
+    """
+    LRU gotowych odpowiedzi GET, kluczowane sciezka + posortowanymi parametrami zapytania.
+    Wpis pamieta wersje swoich tagow (WersjeZasobow) z chwili rozpoczecia zadania: jest zapisywany
+    tylko, gdy w trakcie obslugi nie bylo zapisu, i odrzucany przy odczycie po kazdym pozniejszym zapisie.
+    """
+    def __init__(self, pojemnosc: int = 1024, reguly=REGULY_CACHE, wersje: WersjeZasobow = wersje):
+        self.pojemnosc = pojemnosc
+        self.reguly = reguly
+        self.wersje = wersje
+        self._lock = threading.Lock()
+        self._wpisy: "OrderedDict[str, tuple]" = OrderedDict()
+        self._statystyki: Dict[str, Dict[str, int]] = {}
+
+    def regula(self, sciezka: str):
+        return _regula(self.reguly, sciezka)
+
+    def klucz(self, sciezka: str, query_string: bytes) -> str:
+        return _klucz(sciezka, query_string)
+
+    def generacje(self, tagi) -> tuple:
+        return self.wersje.get(tagi)
+
+    def _licz(self, prefiks: str, zdarzenie: str):
+        statystyki = self._statystyki.setdefault(
+            prefiks, {"trafienia": 0, "chybienia": 0, "zapisy": 0, "odrzucone": 0}
+        )
+        statystyki[zdarzenie] += 1
+
+    def get(self, klucz: str, regula) -> Optional[tuple]:
+        prefiks, _, tagi = regula
+        with self._lock:
+            wpis = self._wpisy.get(klucz)
+            if wpis is not None:
+                wygasa, generacje, odpowiedz = wpis
+                if wygasa > time.monotonic() and generacje == self.generacje(tagi):
+                    self._wpisy.move_to_end(klucz)
+                    self._licz(prefiks, "trafienia")
+                    return odpowiedz
+                del self._wpisy[klucz]
+            self._licz(prefiks, "chybienia")
+            return None
+
+    def put(self, klucz: str, regula, generacje: tuple, odpowiedz: tuple):
+        prefiks, ttl, tagi = regula
+        with self._lock:
+            if generacje != self.generacje(tagi):
+                # w trakcie liczenia odpowiedzi byl zapis - wynik moze byc nieaktualny
+                self._licz(prefiks, "odrzucone")
+                return
+            self._wpisy[klucz] = (time.monotonic() + ttl, generacje, odpowiedz)
+            self._wpisy.move_to_end(klucz)
+            while len(self._wpisy) > self.pojemnosc:
+                self._wpisy.popitem(last=False)
+            self._licz(prefiks, "zapisy")
+
+    def clear(self):
+        with self._lock:
+            self._wpisy.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            trasy = {}
+            for prefiks, s in self._statystyki.items():
+                odczyty = s["trafienia"] + s["chybienia"]
+                trasy[prefiks] = {**s, "trafienia_proc": round(100 * s["trafienia"] / odczyty, 1) if odczyty else 0.0}
+            return {"wpisy": len(self._wpisy), "pojemnosc": self.pojemnosc, "trasy": trasy}
+
+odpowiedzi = CacheOdpowiedzi()
+
+class ResponseCacheMiddleware:
+    """
+    Middleware ASGI: odpowiedzi GET dla tras z REGULY_CACHE serwuje z CacheOdpowiedzi,
+    a odpowiedzi 200 zapisuje. Naglowek X-Cache mowi, czy odpowiedz pochodzi z cache.
+    """
+    def __init__(self, app, cache: CacheOdpowiedzi = odpowiedzi):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        regula = self.cache.regula(scope["path"]) if scope["type"] == "http" and scope["method"] == "GET" else None
+        if regula is None or (b"cache-control", b"no-cache") in scope["headers"]:
+            await self.app(scope, receive, send)
+            return
+
+        klucz = self.cache.klucz(scope["path"], scope["query_string"])
+        odpowiedz = self.cache.get(klucz, regula)
+        if odpowiedz is not None:
+            status, naglowki, tresc = odpowiedz
+            await send({"type": "http.response.start", "status": status, "headers": naglowki + [(b"x-cache", b"HIT")]})
+            await send({"type": "http.response.body", "body": tresc})
+            return
+
+        generacje = self.cache.generacje(regula[2])
+        start = {}
+        czesci = []
+
+        async def send_z_zapisem(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-cache", b"MISS")]}
+            elif message["type"] == "http.response.body" and start.get("status") == 200:
+                czesci.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    tresc = b"".join(czesci)
+                    if len(tresc) <= MAKS_ROZMIAR_ODPOWIEDZI:
+                        self.cache.put(klucz, regula, generacje, (200, list(start.get("headers", [])), tresc))
+            await send(message)
+
+        await self.app(scope, receive, send_z_zapisem)
+
+#ETagi
+#(prefiks lub dokladna sciezka, tagi danych); ETag = skrot(nonce procesu, sciezka + parametry, wersje tagow)
+REGULY_ETAG = (
+    ("/kluby/tabela/ligowa", ("kluby", "mecze")),
+    ("/raporty/ranking-strzelcow", ("statystyki", "zawodnicy", "kluby")),
+    ("/mecze/", ("mecze",)),
+)
+
+class ETagMiddleware:
+    """
+    Middleware ASGI: silne ETagi liczone z wersji zasobow, bez siegania do bazy.
+    Gdy If-None-Match zgadza sie z aktualnym ETagiem, zwraca 304 bez wywolania endpointu.
+    Nonce procesu sprawia, ze ETagi sprzed restartu (liczniki od zera) nie pasuja.
+    Zapisy innych procesow zmieniaja ETagi po najblizszej wymianie wersji (WersjeZasobow.synchronizuj).
+    """
+    def __init__(self, app, reguly=REGULY_ETAG, wersje: WersjeZasobow = wersje):
+        self.app = app
+        self.reguly = reguly
+        self.wersje = wersje
+        self.nonce = os.urandom(8).hex()
+
+    def _regula(self, sciezka: str):
+        # /mecze/ tylko jako lista - bez /mecze/{id}, /mecze/bulk itd.
+        for regula in self.reguly:
+            if sciezka == regula[0] or (not regula[0].endswith("/") and sciezka.startswith(regula[0])):
+                return regula
+        return None
+
+    def etag(self, klucz: str, tagi) -> bytes:
+        skrot = hashlib.sha1(f"{self.nonce}|{klucz}|{self.wersje.get(tagi)}".encode()).hexdigest()[:20]
+        return f'"{skrot}"'.encode()
+
+    async def __call__(self, scope, receive, send):
+        regula = self._regula(scope["path"]) if scope["type"] == "http" and scope["method"] == "GET" else None
+        if regula is None:
+            await self.app(scope, receive, send)
+            return
+
+        etag = self.etag(_klucz(scope["path"], scope["query_string"]), regula[1])
+        naglowki = [(b"etag", etag), (b"cache-control", b"no-cache")]
+        if_none_match = dict(scope["headers"]).get(b"if-none-match")
+        if if_none_match is not None and (
+            if_none_match.strip() == b"*"
+            or etag in (t.strip().removeprefix(b"W/") for t in if_none_match.split(b","))
+        ):
+            await send({"type": "http.response.start", "status": 304, "headers": naglowki})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_z_etagiem(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message = {**message, "headers": list(message.get("headers", [])) + naglowki}
+            await send(message)
+
+        await self.app(scope, receive, send_z_etagiem)
@@ -1,21 +1,74 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, case, desc, text
+from sqlalchemy.orm import Session, joinedload, aliased
+from sqlalchemy import func, case, desc, text, select, insert, update, delete, bindparam, or_, and_, union_all
+from sqlalchemy.dialects import mysql, sqlite, postgresql
+from pydantic import ValidationError
 from typing import List, Optional
-from app import models, schemas
-from datetime import datetime
+from collections import defaultdict
+from app import models, schemas, cache, search_index, standings, form_index, analytics, live
+from datetime import date, datetime
+
+#profile ladowania relacji - kazdy schemat z zagniezdzonymi obiektami dostaje swoje relacje
+#w tym samym zapytaniu, zamiast leniwych SELECT-ow podczas serializacji
+PROFILE_LADOWANIA = {
+    schemas.KlubDetale: (
+        joinedload(models.Kluby.stadion),
+        joinedload(models.Kluby.menedzer)
+    ),
+    schemas.ZawodnikDetale: (
+        joinedload(models.Zawodnicy.klub),
+        joinedload(models.Zawodnicy.pozycja)
+    ),
+    schemas.MeczDetale: (
+        joinedload(models.Mecze.klub_gospodarze),
+        joinedload(models.Mecze.klub_goscie)
+    ),
+    schemas.TransferDetale: (
+        joinedload(models.Transfery.zawodnik),
+        joinedload(models.Transfery.klub_z),
+        joinedload(models.Transfery.klub_do)
+    )
+}
+
+def _z_profilem(query, profil):
+    return query.options(*PROFILE_LADOWANIA[profil]) if profil is not None else query
+
+def _kolumny(schemat, model):
+    """
+    Kolumny modelu w kolejnosci pol schematu odpowiedzi - wiersze z select() tych kolumn
+    maja te same klucze co response_model (szybka sciezka JSON, FAST_JSON)
+    """
+    return [getattr(model, pole) for pole in schemat.model_fields]
 
 #kluby
-def get_kluby(db: Session, skip: int = 0, limit: int = 100):
+def get_kluby(db: Session, skip: int = 0, limit: int = 100, wiersze: bool = False):
+    """wiersze=True - krotki kolumn schemas.Klub zamiast obiektow ORM"""
+    if wiersze:
+        return db.execute(select(*_kolumny(schemas.Klub, models.Kluby)).offset(skip).limit(limit)).all()
     return db.query(models.Kluby).offset(skip).limit(limit).all()
 
-def get_klub(db: Session, klub_id: int):
-    return db.query(models.Kluby).filter(models.Kluby.id_klubu == klub_id).first()
+def get_tabela_ligowa(db: Session):
+    return db.query(models.Kluby).order_by(
+        models.Kluby.punkty.desc(),
+        models.Kluby.roznica_bramek.desc(),
+        models.Kluby.bramki_strzelone.desc(),
+        models.Kluby.nazwa_klubu
+    ).all()
+
+def get_tabela_ligowa_json(db: Session) -> bytes:
+    return cache.tabela_ligowa.get(lambda: get_tabela_ligowa(db))
+
+def get_klub(db: Session, klub_id: int, profil=None):
+    return _z_profilem(db.query(models.Kluby), profil).filter(models.Kluby.id_klubu == klub_id).first()
 
 def create_klub(db: Session, klub: schemas.KlubCreate):
     db_klub = models.Kluby(**klub.dict())
     db.add(db_klub)
     db.commit()
+    cache.tabela_ligowa.invalidate()
+    cache.wersje.podbij("kluby")
     db.refresh(db_klub)
+    #nazwa przeciwnika w indeksie formy dla meczow nowego klubu
+    form_index.indeks_formy.zmien_nazwe(db_klub.id_klubu, db_klub.nazwa_klubu)
     return db_klub
 
 def update_klub(db: Session, klub_id: int, klub: schemas.KlubUpdate):
@@ -24,14 +77,27 @@ def update_klub(db: Session, klub_id: int, klub: schemas.KlubUpdate):
         for key, value in klub.dict(exclude_unset=True).items():
             setattr(db_klub, key, value)
         db.commit()
+        cache.tabela_ligowa.invalidate()
+        cache.wersje.podbij("kluby")
+        if klub.nazwa_klubu is not None:
+            standings.historia_tabel.zmien_nazwe(klub_id, klub.nazwa_klubu)
+            form_index.indeks_formy.zmien_nazwe(klub_id, klub.nazwa_klubu)
+            analytics.analityka.invalidate()
         db.refresh(db_klub)
     return db_klub
 
 #zawodnicy
 def get_zawodnicy(db: Session, skip: int = 0, limit: int = 100, 
                   klub_id: Optional[int] = None, pozycja_id: Optional[int] = None,
-                  narodowosc: Optional[str] = None):
-    query = db.query(models.Zawodnicy)
+                  narodowosc: Optional[str] = None, po_id: Optional[int] = None, wiersze: bool = False):
+    """
+    Lista zawodnikow po kluczu glownym; po_id (kursor) zastepuje kosztowny OFFSET.
+    wiersze=True - krotki kolumn schemas.Zawodnik zamiast obiektow ORM
+    """
+    if wiersze:
+        query = select(*_kolumny(schemas.Zawodnik, models.Zawodnicy))
+    else:
+        query = db.query(models.Zawodnicy)
     
     if klub_id:
         query = query.filter(models.Zawodnicy.id_klubu == klub_id)
@@ -39,11 +105,16 @@ def get_zawodnicy(db: Session, skip: int = 0, limit: int = 100,
         query = query.filter(models.Zawodnicy.id_pozycji == pozycja_id)
     if narodowosc:
         query = query.filter(models.Zawodnicy.narodowosc == narodowosc)
+    if po_id is not None:
+        query = query.filter(models.Zawodnicy.id_zawodnika > po_id)
+    elif skip:
+        query = query.offset(skip)
     
-    return query.offset(skip).limit(limit).all()
+    query = query.order_by(models.Zawodnicy.id_zawodnika).limit(limit)
+    return db.execute(query).all() if wiersze else query.all()
 
-def get_zawodnik(db: Session, zawodnik_id: int):
-    return db.query(models.Zawodnicy).filter(
+def get_zawodnik(db: Session, zawodnik_id: int, profil=None):
+    return _z_profilem(db.query(models.Zawodnicy), profil).filter(
         models.Zawodnicy.id_zawodnika == zawodnik_id
     ).first()
 
@@ -51,7 +122,9 @@ def create_zawodnik(db: Session, zawodnik: schemas.ZawodnikCreate):
     db_zawodnik = models.Zawodnicy(**zawodnik.dict())
     db.add(db_zawodnik)
     db.commit()
+    cache.wersje.podbij("zawodnicy")
     db.refresh(db_zawodnik)
+    search_index.indeks_zawodnikow.add(db_zawodnik.id_zawodnika, db_zawodnik.imie, db_zawodnik.nazwisko)
     return db_zawodnik
 
 def update_zawodnik(db: Session, zawodnik_id: int, zawodnik: schemas.ZawodnikUpdate):
@@ -60,28 +133,210 @@ def update_zawodnik(db: Session, zawodnik_id: int, zawodnik: schemas.ZawodnikUpd
         for key, value in zawodnik.dict(exclude_unset=True).items():
             setattr(db_zawodnik, key, value)
         db.commit()
+        cache.wersje.podbij("zawodnicy")
         db.refresh(db_zawodnik)
+        search_index.indeks_zawodnikow.add(db_zawodnik.id_zawodnika, db_zawodnik.imie, db_zawodnik.nazwisko)
+        analytics.analityka.invalidate()
     return db_zawodnik
 
-def search_zawodnicy(db: Session, search: str):
-    return db.query(models.Zawodnicy).filter(
-        (models.Zawodnicy.imie.contains(search)) |
-        (models.Zawodnicy.nazwisko.contains(search))
-    ).all()
+def search_zawodnicy(db: Session, search: str, limit: int = 20):
+    """
+    Wyszukiwanie po imieniu lub nazwisku z indeksu w pamieci (bez LIKE '%q%' na calej tabeli);
+    z bazy pobierane sa tylko znalezione rekordy
+    """
+    indeks = search_index.indeks_zawodnikow
+    if not indeks.loaded:
+        generacja = indeks.generacja
+        indeks.load(db.query(
+            models.Zawodnicy.id_zawodnika, models.Zawodnicy.imie, models.Zawodnicy.nazwisko
+        ).all(), generacja)
+    
+    ids = indeks.search(search, limit)
+    if not ids:
+        return []
+    zawodnicy = {
+        z.id_zawodnika: z
+        for z in db.query(models.Zawodnicy).filter(models.Zawodnicy.id_zawodnika.in_(ids))
+    }
+    return [zawodnicy[i] for i in ids if i in zawodnicy]
 
 #mecze
-def get_mecze(db: Session, sezon: Optional[str] = None, kolejka: Optional[int] = None):
-    query = db.query(models.Mecze)
+def get_mecze(db: Session, sezon: Optional[str] = None, kolejka: Optional[int] = None,
+              po: Optional[tuple] = None, limit: int = 100, wiersze: bool = False):
+    """
+    Mecze od najnowszych; po = (data_meczu, id_meczu) ostatniego meczu poprzedniej strony.
+    wiersze=True - krotki kolumn schemas.Mecz zamiast obiektow ORM
+    """
+    if wiersze:
+        query = select(*_kolumny(schemas.Mecz, models.Mecze))
+    else:
+        query = db.query(models.Mecze)
     
     if sezon:
         query = query.filter(models.Mecze.sezon == sezon)
     if kolejka:
         query = query.filter(models.Mecze.kolejka == kolejka)
+    if po:
+        data_meczu, id_meczu = po
+        query = query.filter(or_(
+            models.Mecze.data_meczu < data_meczu,
+            and_(models.Mecze.data_meczu == data_meczu, models.Mecze.id_meczu < id_meczu)
+        ))
+    
+    query = query.order_by(models.Mecze.data_meczu.desc(), models.Mecze.id_meczu.desc()).limit(limit)
+    return db.execute(query).all() if wiersze else query.all()
+
+def get_mecz(db: Session, mecz_id: int, profil=None):
+    return _z_profilem(db.query(models.Mecze), profil).filter(models.Mecze.id_meczu == mecz_id).first()
+
+def _zmiana_licznikow(bramki_za: int, bramki_przeciw: int):
+    """
+    Przyrosty licznikow klubu wynikajace z jednego meczu
+    """
+    return {
+        "punkty": 3 if bramki_za > bramki_przeciw else 1 if bramki_za == bramki_przeciw else 0,
+        "mecze_rozegrane": 1,
+        "wygrane": int(bramki_za > bramki_przeciw),
+        "remisy": int(bramki_za == bramki_przeciw),
+        "przegrane": int(bramki_za < bramki_przeciw),
+        "bramki_strzelone": bramki_za,
+        "bramki_stracone": bramki_przeciw,
+        "roznica_bramek": bramki_za - bramki_przeciw
+    }
+
+LICZNIKI_KLUBU = tuple(_zmiana_licznikow(0, 0))
+
+def _zmiany_meczu(mecz):
+    """
+    Przyrosty licznikow obu klubow z meczu ({id_klubu: przyrosty})
+    """
+    return {
+        mecz.id_klubu_gospodarze: _zmiana_licznikow(mecz.bramki_gospodarze, mecz.bramki_goscie),
+        mecz.id_klubu_goscie: _zmiana_licznikow(mecz.bramki_goscie, mecz.bramki_gospodarze)
+    }
+
+def _aktualizuj_liczniki(db: Session, zmiany: dict):
+    """
+    Dodaje przyrosty do licznikow klubow relatywnym UPDATE (SET punkty = punkty + :p ...),
+    bez ladowania obiektow ORM. Kluby sa aktualizowane w stalej kolejnosci id,
+    zeby rownolegle zapisy nie blokowaly sie nawzajem.
+    """
+    kluby = models.Kluby.__table__
+    aktualizacja = update(kluby).where(
+        kluby.c.id_klubu == bindparam("b_id_klubu")
+    ).values({licznik: kluby.c[licznik] + bindparam(f"b_{licznik}") for licznik in LICZNIKI_KLUBU})
     
-    return query.order_by(models.Mecze.data_meczu.desc()).all()
+    db.execute(aktualizacja, [
+        {"b_id_klubu": id_klubu, **{f"b_{k}": zmiany[id_klubu][k] for k in LICZNIKI_KLUBU}}
+        for id_klubu in sorted(zmiany)
+    ])
+
+POLA_MECZU = (
+    "sezon", "kolejka", "data_meczu", "id_klubu_gospodarze", "id_klubu_goscie", "bramki_gospodarze", "bramki_goscie"
+)
+
+def _opublikuj_mecz(db_mecz, zmiana: str):
+    """Zdarzenia /live/stream po zapisie wyniku: mecz oraz tabela (liczniki i forma obu klubow)"""
+    kluby = (db_mecz.id_klubu_gospodarze, db_mecz.id_klubu_goscie)
+    live.kanal.opublikuj("mecz", {
+        "id_meczu": db_mecz.id_meczu, "zmiana": zmiana, **{pole: getattr(db_mecz, pole) for pole in POLA_MECZU}
+    }, kluby)
+    live.kanal.opublikuj("tabela", {"sezony": [db_mecz.sezon], "kluby": kluby}, kluby)
 
-def get_mecz(db: Session, mecz_id: int):
-    return db.query(models.Mecze).filter(models.Mecze.id_meczu == mecz_id).first()
+def _liczniki_z_meczow(sezon: Optional[str] = None):
+    """
+    Liczniki wszystkich klubow wyliczone z Mecze jednym zgrupowanym zapytaniem: mecze z perspektywy
+    gospodarzy i gosci (UNION ALL) zgrupowane po klubie, dolaczone do Kluby (kluby bez meczow - zera)
+    """
+    m = models.Mecze
+    gospodarze = select(
+        m.id_klubu_gospodarze.label("id_klubu"), m.bramki_gospodarze.label("za"), m.bramki_goscie.label("przeciw")
+    )
+    goscie = select(
+        m.id_klubu_goscie.label("id_klubu"), m.bramki_goscie.label("za"), m.bramki_gospodarze.label("przeciw")
+    )
+    if sezon:
+        gospodarze = gospodarze.where(m.sezon == sezon)
+        goscie = goscie.where(m.sezon == sezon)
+    wyniki = union_all(gospodarze, goscie).subquery()
+    
+    wygrana = case((wyniki.c.za > wyniki.c.przeciw, 1), else_=0)
+    remis = case((wyniki.c.za == wyniki.c.przeciw, 1), else_=0)
+    przegrana = case((wyniki.c.za < wyniki.c.przeciw, 1), else_=0)
+    agregat = select(
+        wyniki.c.id_klubu,
+        func.sum(3 * wygrana + remis).label("punkty"),
+        func.count().label("mecze_rozegrane"),
+        func.sum(wygrana).label("wygrane"),
+        func.sum(remis).label("remisy"),
+        func.sum(przegrana).label("przegrane"),
+        func.sum(wyniki.c.za).label("bramki_strzelone"),
+        func.sum(wyniki.c.przeciw).label("bramki_stracone"),
+        func.sum(wyniki.c.za - wyniki.c.przeciw).label("roznica_bramek")
+    ).group_by(wyniki.c.id_klubu).subquery()
+    
+    return select(
+        models.Kluby.id_klubu,
+        models.Kluby.nazwa_klubu,
+        *(models.Kluby.__table__.c[licznik].label(f"zapisane_{licznik}") for licznik in LICZNIKI_KLUBU),
+        *(func.coalesce(agregat.c[licznik], 0).label(licznik) for licznik in LICZNIKI_KLUBU)
+    ).outerjoin(agregat, agregat.c.id_klubu == models.Kluby.id_klubu).order_by(models.Kluby.id_klubu)
+
+def sprawdz_liczniki_klubow(db: Session, sezon: Optional[str] = None, napraw: bool = False):
+    """
+    Porownuje zdenormalizowane liczniki Kluby z wyliczonymi z Mecze i zwraca rozbieznosci.
+    Kluby trzymaja sumy ze wszystkich meczow w Mecze (tak jak je zwiekszaja T1, korekta wyniku
+    i /mecze/bulk), wiec `sezon` ma sens tylko dla bazy z meczami jednego sezonu - przy innych
+    sezonach w Mecze zglaszany jest ValueError zamiast falszywych rozbieznosci (i ich "naprawy").
+    Z napraw=True poprawia rozbieznosci jednym zbiorczym UPDATE; wiersze Kluby sa najpierw
+    blokowane (FOR UPDATE), wiec mecz zapisywany rownolegle przez T1 dolozy swoj przyrost
+    juz do poprawionych wartosci.
+    """
+    if sezon and db.scalar(select(models.Mecze.id_meczu).where(models.Mecze.sezon != sezon).limit(1)) is not None:
+        raise ValueError(
+            f"Kluby zawierają liczniki ze wszystkich sezonów, a w Mecze są mecze spoza sezonu {sezon} - sprawdź bez sezonu"
+        )
+    try:
+        if napraw:
+            db.execute(select(models.Kluby.id_klubu).with_for_update()).all()
+        wiersze = db.execute(_liczniki_z_meczow(sezon)).all()
+        
+        rozbieznosci = []
+        for w in wiersze:
+            pola = {
+                licznik: {"zapisane": getattr(w, f"zapisane_{licznik}"), "wyliczone": int(getattr(w, licznik))}
+                for licznik in LICZNIKI_KLUBU
+                if getattr(w, f"zapisane_{licznik}") != getattr(w, licznik)
+            }
+            if pola:
+                rozbieznosci.append({"id_klubu": w.id_klubu, "nazwa_klubu": w.nazwa_klubu, "pola": pola})
+        
+        if napraw and rozbieznosci:
+            do_naprawy = {r["id_klubu"] for r in rozbieznosci}
+            kluby = models.Kluby.__table__
+            db.execute(
+                update(kluby).where(kluby.c.id_klubu == bindparam("b_id_klubu"))
+                .values({licznik: bindparam(f"b_{licznik}") for licznik in LICZNIKI_KLUBU}),
+                [
+                    {"b_id_klubu": w.id_klubu, **{f"b_{licznik}": int(getattr(w, licznik)) for licznik in LICZNIKI_KLUBU}}
+                    for w in wiersze if w.id_klubu in do_naprawy
+                ]
+            )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+    
+    if napraw and rozbieznosci:
+        cache.tabela_ligowa.invalidate()
+        cache.wersje.podbij("kluby")
+        live.kanal.opublikuj("tabela", {"sezony": [sezon] if sezon else [], "kluby": sorted(do_naprawy)}, do_naprawy)
+    return {
+        "sezon": sezon,
+        "sprawdzone_kluby": len(wiersze),
+        "rozbieznosci": rozbieznosci,
+        "naprawione": napraw and bool(rozbieznosci)
+    }
 
 #T1: dodanie wyniku meczu
 def create_mecz_z_aktualizacja_statystyk(db: Session, mecz: schemas.MeczCreate):
@@ -93,139 +348,272 @@ def create_mecz_z_aktualizacja_statystyk(db: Session, mecz: schemas.MeczCreate):
         db.add(db_mecz)
         db.flush()
         
-        #home club
-        klub_gospodarze = db.query(models.Kluby).filter(
-            models.Kluby.id_klubu == mecz.id_klubu_gospodarze
-        ).first()
+        zmiany = _zmiany_meczu(mecz)
+        _aktualizuj_liczniki(db, zmiany)
         
-        if klub_gospodarze:
-            klub_gospodarze.mecze_rozegrane += 1
-            klub_gospodarze.bramki_strzelone += mecz.bramki_gospodarze
-            klub_gospodarze.bramki_stracone += mecz.bramki_goscie
-            klub_gospodarze.roznica_bramek += (mecz.bramki_gospodarze - mecz.bramki_goscie)
-            
-            if mecz.bramki_gospodarze > mecz.bramki_goscie:
-                klub_gospodarze.wygrane += 1
-                klub_gospodarze.punkty += 3
-            elif mecz.bramki_gospodarze == mecz.bramki_goscie:
-                klub_gospodarze.remisy += 1
-                klub_gospodarze.punkty += 1
-            else:
-                klub_gospodarze.przegrane += 1
+        db.commit()
+        cache.tabela_ligowa.invalidate()
+        cache.wersje.podbij("mecze", "kluby")
+        standings.historia_tabel.dodaj_mecz(db_mecz.id_meczu, mecz.sezon, mecz.kolejka, mecz.data_meczu, zmiany)
+        form_index.indeks_formy.dodaj_mecz(
+            db_mecz.id_meczu, mecz.data_meczu, mecz.sezon, mecz.id_klubu_gospodarze, mecz.id_klubu_goscie,
+            mecz.bramki_gospodarze, mecz.bramki_goscie
+        )
+        db.refresh(db_mecz)
+        _opublikuj_mecz(db_mecz, "dodany")
+        return db_mecz
         
-        #away club
-        klub_goscie = db.query(models.Kluby).filter(
-            models.Kluby.id_klubu == mecz.id_klubu_goscie
+    except Exception as e:
+        db.rollback()
+        raise e
+
+def update_wynik_meczu(db: Session, mecz_id: int, wynik: schemas.MeczUpdate):
+    """
+    Korekta wyniku meczu (np. po odwolaniu): liczniki obu klubow zmieniaja sie tylko o roznice
+    miedzy starym a nowym wynikiem, w jednej transakcji i bez przeliczania z Mecze.
+    Wiersz meczu jest blokowany (SELECT ... FOR UPDATE), wiec rownolegla korekta tego samego
+    meczu liczy roznice juz od poprawionego wyniku.
+    """
+    try:
+        db_mecz = db.scalars(
+            select(models.Mecze).where(models.Mecze.id_meczu == mecz_id)
+            .with_for_update().execution_options(populate_existing=True)
         ).first()
+        if db_mecz is None:
+            return None
         
-        if klub_goscie:
-            klub_goscie.mecze_rozegrane += 1
-            klub_goscie.bramki_strzelone += mecz.bramki_goscie
-            klub_goscie.bramki_stracone += mecz.bramki_gospodarze
-            klub_goscie.roznica_bramek += (mecz.bramki_goscie - mecz.bramki_gospodarze)
-            
-            if mecz.bramki_goscie > mecz.bramki_gospodarze:
-                klub_goscie.wygrane += 1
-                klub_goscie.punkty += 3
-            elif mecz.bramki_goscie == mecz.bramki_gospodarze:
-                klub_goscie.remisy += 1
-                klub_goscie.punkty += 1
-            else:
-                klub_goscie.przegrane += 1
+        stare = _zmiany_meczu(db_mecz)
+        db_mecz.bramki_gospodarze = wynik.bramki_gospodarze
+        db_mecz.bramki_goscie = wynik.bramki_goscie
+        nowe = _zmiany_meczu(db_mecz)
+        roznica = {
+            id_klubu: {licznik: nowe[id_klubu][licznik] - stare[id_klubu][licznik] for licznik in LICZNIKI_KLUBU}
+            for id_klubu in nowe
+        }
+        mecz = (db_mecz.id_meczu, db_mecz.data_meczu, db_mecz.sezon, db_mecz.kolejka,
+                db_mecz.id_klubu_gospodarze, db_mecz.id_klubu_goscie)
         
+        zmieniony = any(any(zmiana.values()) for zmiana in roznica.values())
+        if zmieniony:
+            _aktualizuj_liczniki(db, roznica)
         db.commit()
-        db.refresh(db_mecz)
-        return db_mecz
-        
     except Exception as e:
         db.rollback()
         raise e
+    
+    if zmieniony:
+        id_meczu, data_meczu, sezon, kolejka, id_gospodarzy, id_gosci = mecz
+        cache.tabela_ligowa.invalidate()
+        cache.wersje.podbij("mecze", "kluby")
+        standings.historia_tabel.popraw_mecz(id_meczu, sezon, kolejka, data_meczu, roznica)
+        form_index.indeks_formy.popraw_mecz(
+            id_meczu, data_meczu, sezon, id_gospodarzy, id_gosci, wynik.bramki_gospodarze, wynik.bramki_goscie
+        )
+    db.refresh(db_mecz)
+    if zmieniony:
+        _opublikuj_mecz(db_mecz, "korekta")
+    return db_mecz
+
+def _opis_bledu(e: ValidationError):
+    return "; ".join(
+        f"{'.'.join(str(l) for l in err['loc'])}: {err['msg']}" if err['loc'] else err['msg']
+        for err in e.errors()
+    )
+
+def create_mecze_bulk(db: Session, mecze: List[dict]):
+    """
+    Dodaje wiele meczow naraz: jeden wielowierszowy INSERT i jeden zagregowany UPDATE na klub,
+    wszystko w jednej transakcji. Niepoprawne wiersze sa pomijane i zwracane jako bledy.
+    """
+    bledy = []
+    poprawne = []
+    for indeks, dane in enumerate(mecze):
+        try:
+            poprawne.append((indeks, schemas.MeczCreate(**dane)))
+        except (ValidationError, TypeError) as e:
+            opis = _opis_bledu(e) if isinstance(e, ValidationError) else "Wiersz musi być obiektem"
+            bledy.append({"indeks": indeks, "blad": opis})
+    
+    id_klubow = {m.id_klubu_gospodarze for _, m in poprawne} | {m.id_klubu_goscie for _, m in poprawne}
+    istniejace = set(db.scalars(
+        select(models.Kluby.id_klubu).where(models.Kluby.id_klubu.in_(id_klubow))
+    )) if id_klubow else set()
+    
+    wiersze = []
+    zmiany = defaultdict(lambda: dict.fromkeys(LICZNIKI_KLUBU, 0))
+    for indeks, mecz in poprawne:
+        brakujace = {mecz.id_klubu_gospodarze, mecz.id_klubu_goscie} - istniejace
+        if brakujace:
+            bledy.append({"indeks": indeks, "blad": f"Klub nie istnieje: {', '.join(map(str, sorted(brakujace)))}"})
+            continue
+        wiersze.append(mecz.dict())
+        for id_klubu, zmiana in _zmiany_meczu(mecz).items():
+            for licznik, wartosc in zmiana.items():
+                zmiany[id_klubu][licznik] += wartosc
+    
+    bledy.sort(key=lambda b: b["indeks"])
+    if not wiersze:
+        return {"dodane": 0, "bledy": bledy}
+    
+    try:
+        db.execute(insert(models.Mecze.__table__), wiersze)
+        _aktualizuj_liczniki(db, zmiany)
+        db.commit()
+        cache.tabela_ligowa.invalidate()
+        cache.wersje.podbij("mecze", "kluby")
+        standings.historia_tabel.invalidate(*{w["sezon"] for w in wiersze})
+        form_index.indeks_formy.invalidate(*zmiany)
+    except Exception as e:
+        db.rollback()
+        raise e
+    
+    # bez id nowych meczow (INSERT wielowierszowy) - tylko zdarzenie tabeli
+    live.kanal.opublikuj("tabela", {"sezony": sorted({w["sezon"] for w in wiersze}), "kluby": sorted(zmiany)}, zmiany)
+    
+    return {"dodane": len(wiersze), "bledy": bledy}
+
+#tabele historyczne
+def _mecze_sezonu(db: Session, sezon: str):
+    """
+    Loader dla standings.historia_tabel: mecze sezonu z przyrostami licznikow i nazwy klubow
+    """
+    mecze = db.execute(select(
+        models.Mecze.id_meczu,
+        models.Mecze.kolejka,
+        models.Mecze.data_meczu,
+        models.Mecze.id_klubu_gospodarze,
+        models.Mecze.id_klubu_goscie,
+        models.Mecze.bramki_gospodarze,
+        models.Mecze.bramki_goscie
+    ).where(models.Mecze.sezon == sezon)).all()
+    
+    id_klubow = {m.id_klubu_gospodarze for m in mecze} | {m.id_klubu_goscie for m in mecze}
+    nazwy = dict(db.execute(
+        select(models.Kluby.id_klubu, models.Kluby.nazwa_klubu).where(models.Kluby.id_klubu.in_(id_klubow))
+    ).all()) if id_klubow else {}
+    return [(m.id_meczu, m.kolejka, m.data_meczu, _zmiany_meczu(m)) for m in mecze], nazwy
+
+def get_tabela_historyczna(db: Session, sezon: str, kolejka: Optional[int] = None, as_of: Optional[date] = None):
+    return standings.historia_tabel.tabela(sezon, lambda: _mecze_sezonu(db, sezon), kolejka=kolejka, as_of=as_of)
+
+def get_pozycje_w_czasie(db: Session, sezon: str, klub_id: Optional[int] = None):
+    return standings.historia_tabel.pozycje(sezon, lambda: _mecze_sezonu(db, sezon), id_klubu=klub_id)
 
 #T2: top strzelcy
 def get_ranking_strzelcow(db: Session, sezon: str, limit: int = 20):
     """
-    T2: Zwraca ranking najlepszych strzelcow w sezonie
+    T2: Zwraca ranking najlepszych strzelcow w sezonie (z agregatu StatystykiSezonowe)
     """
     query = db.query(
         models.Zawodnicy.imie,
         models.Zawodnicy.nazwisko,
         models.Kluby.nazwa_klubu,
-        func.sum(models.StatystykiIndywidualne.gole).label('suma_goli'),
-        func.sum(models.StatystykiIndywidualne.asysty).label('suma_asyst'),
-        func.sum(models.StatystykiIndywidualne.minuty_rozegrane).label('suma_minut'),
-        func.count(func.distinct(models.StatystykiIndywidualne.id_meczu)).label('liczba_meczy')
-    ).join(
-        models.StatystykiIndywidualne,
-        models.Zawodnicy.id_zawodnika == models.StatystykiIndywidualne.id_zawodnika
+        models.StatystykiSezonowe.gole.label('suma_goli'),
+        models.StatystykiSezonowe.asysty.label('suma_asyst'),
+        models.StatystykiSezonowe.minuty_rozegrane.label('suma_minut'),
+        models.StatystykiSezonowe.wystepy.label('liczba_meczy')
     ).join(
-        models.Mecze,
-        models.StatystykiIndywidualne.id_meczu == models.Mecze.id_meczu
+        models.StatystykiSezonowe,
+        models.Zawodnicy.id_zawodnika == models.StatystykiSezonowe.id_zawodnika
     ).join(
         models.Kluby,
         models.Zawodnicy.id_klubu == models.Kluby.id_klubu
     ).filter(
-        models.Mecze.sezon == sezon
-    ).group_by(
-        models.Zawodnicy.id_zawodnika,
-        models.Zawodnicy.imie,
-        models.Zawodnicy.nazwisko,
-        models.Kluby.nazwa_klubu
-    ).having(
-        func.sum(models.StatystykiIndywidualne.gole) > 0
+        models.StatystykiSezonowe.sezon == sezon,
+        models.StatystykiSezonowe.gole > 0
     ).order_by(
-        desc('suma_goli'),
-        desc('suma_asyst')
+        models.StatystykiSezonowe.gole.desc(),
+        models.StatystykiSezonowe.asysty.desc()
     ).limit(limit)
     
     return query.all()
 
 #T3: forma druzyny
-def get_forma_druzyny(db: Session, klub_id: int, limit: int = 5):
+def _forma_z_bazy(db: Session, klub_id: int, limit: int, sezon: Optional[str] = None):
     """
-    T3: Analizuje forme druzyny na podstawie ostatnich meczow
+    Ostatnie mecze klubu z bazy: osobno mecze u siebie i na wyjezdzie (kazda galaz
+    korzysta z indeksu (id_klubu_*, data_meczu) i czyta najwyzej `limit` wierszy),
+    polaczone przez UNION ALL i zlaczone z Kluby tylko raz - po przeciwniku.
     """
-    query = text("""
-        SELECT 
+    filtr_sezonu = "AND sezon = :sezon" if sezon is not None else ""
+    query = text(f"""
+        SELECT
             m.id_meczu,
             m.data_meczu,
-            CASE
-                WHEN m.id_klubu_gospodarze = :klub_id THEN 'gospodarze'
-                ELSE 'goscie'
-            END AS typ_meczu,
-            CASE
-                WHEN m.id_klubu_gospodarze = :klub_id THEN k2.nazwa_klubu
-                ELSE k1.nazwa_klubu
-            END AS przeciwnik,
-            CASE
-                WHEN m.id_klubu_gospodarze = :klub_id THEN m.bramki_gospodarze
-                ELSE m.bramki_goscie
-            END AS bramki_za,
-            CASE
-                WHEN m.id_klubu_gospodarze = :klub_id THEN m.bramki_goscie
-                ELSE m.bramki_gospodarze
-            END AS bramki_przeciw,
-            CASE
-                WHEN (m.id_klubu_gospodarze = :klub_id AND m.bramki_gospodarze > m.bramki_goscie) OR
-                     (m.id_klubu_goscie = :klub_id AND m.bramki_goscie > m.bramki_gospodarze)
-                THEN 'W'
-                WHEN m.bramki_gospodarze = m.bramki_goscie THEN 'R'
-                ELSE 'P'
-            END AS wynik
-        FROM Mecze m
-        JOIN Kluby k1 ON m.id_klubu_gospodarze = k1.id_klubu
-        JOIN Kluby k2 ON m.id_klubu_goscie = k2.id_klubu
-        WHERE m.id_klubu_gospodarze = :klub_id OR m.id_klubu_goscie = :klub_id
-        ORDER BY m.data_meczu DESC
+            m.sezon,
+            m.typ_meczu,
+            m.id_przeciwnika,
+            k.nazwa_klubu AS przeciwnik,
+            m.bramki_za,
+            m.bramki_przeciw
+        FROM (
+            SELECT * FROM (
+                SELECT id_meczu, data_meczu, sezon, 'gospodarze' AS typ_meczu,
+                       id_klubu_goscie AS id_przeciwnika,
+                       bramki_gospodarze AS bramki_za, bramki_goscie AS bramki_przeciw
+                FROM Mecze
+                WHERE id_klubu_gospodarze = :klub_id {filtr_sezonu}
+                ORDER BY data_meczu DESC, id_meczu DESC
+                LIMIT :limit
+            ) u_siebie
+            UNION ALL
+            SELECT * FROM (
+                SELECT id_meczu, data_meczu, sezon, 'goscie' AS typ_meczu,
+                       id_klubu_gospodarze AS id_przeciwnika,
+                       bramki_goscie AS bramki_za, bramki_gospodarze AS bramki_przeciw
+                FROM Mecze
+                WHERE id_klubu_goscie = :klub_id {filtr_sezonu}
+                ORDER BY data_meczu DESC, id_meczu DESC
+                LIMIT :limit
+            ) na_wyjezdzie
+        ) m
+        JOIN Kluby k ON k.id_klubu = m.id_przeciwnika
+        ORDER BY m.data_meczu DESC, m.id_meczu DESC
         LIMIT :limit
     """)
     
-    result = db.execute(query, {"klub_id": klub_id, "limit": limit})
-    return result.fetchall()
+    parametry = {"klub_id": klub_id, "limit": limit}
+    if sezon is not None:
+        parametry["sezon"] = sezon
+    wiersze = []
+    for r in db.execute(query, parametry).mappings():
+        w = dict(r)
+        if isinstance(w["data_meczu"], str):
+            w["data_meczu"] = datetime.fromisoformat(w["data_meczu"])
+        w["wynik"] = "W" if w["bramki_za"] > w["bramki_przeciw"] else "R" if w["bramki_za"] == w["bramki_przeciw"] else "P"
+        wiersze.append(w)
+    return wiersze
+
+def get_forma_druzyny(db: Session, klub_id: int, limit: int = 5, sezon: Optional[str] = None):
+    """
+    T3: Analizuje forme druzyny na podstawie ostatnich meczow
+    (z indeksu formy w pamieci; baza tylko przy pierwszym odczycie klubu lub dla duzego limitu)
+    """
+    indeks = form_index.indeks_formy
+    if limit > indeks.pojemnosc:
+        return _forma_z_bazy(db, klub_id, limit, sezon)
+    return indeks.get(klub_id, limit, sezon, loader=lambda: _forma_z_bazy(db, klub_id, indeks.pojemnosc, sezon))
+
+def zaladuj_indeks_formy(db: Session):
+    """
+    Wypelnia indeks formy wszystkimi meczami (przy starcie aplikacji)
+    """
+    mecze = db.execute(select(
+        models.Mecze.id_meczu,
+        models.Mecze.data_meczu,
+        models.Mecze.sezon,
+        models.Mecze.id_klubu_gospodarze,
+        models.Mecze.id_klubu_goscie,
+        models.Mecze.bramki_gospodarze,
+        models.Mecze.bramki_goscie
+    )).all()
+    nazwy = dict(db.execute(select(models.Kluby.id_klubu, models.Kluby.nazwa_klubu)).all())
+    form_index.indeks_formy.load(mecze, nazwy)
 
 #T4: porownanie zawodnikow
 def get_porownanie_zawodnikow(db: Session, pozycja_id: int, sezon: str):
     """
-    T4: Porownuje statystyki zawodnikow na tej samej pozycji
+    T4: Porownuje statystyki zawodnikow na tej samej pozycji (z agregatu StatystykiSezonowe)
     """
     query = text("""
         SELECT 
@@ -233,42 +621,71 @@ def get_porownanie_zawodnikow(db: Session, pozycja_id: int, sezon: str):
             z.nazwisko,
             k.nazwa_klubu,
             z.wartosc_rynkowa,
-            COUNT(DISTINCT si.id_meczu) AS mecze,
-            COALESCE(SUM(si.gole), 0) AS gole,
-            COALESCE(SUM(si.asysty), 0) AS asysty,
-            COALESCE(SUM(si.minuty_rozegrane), 0) AS minuty,
-            ROUND(COALESCE(SUM(si.gole), 0) / NULLIF(SUM(si.minuty_rozegrane), 0) * 90, 2) AS gole_na_90min,
-            ROUND(COALESCE(SUM(si.asysty), 0) / NULLIF(SUM(si.minuty_rozegrane), 0) * 90, 2) AS asysty_na_90min
+            COALESCE(s.wystepy, 0) AS mecze,
+            COALESCE(s.gole, 0) AS gole,
+            COALESCE(s.asysty, 0) AS asysty,
+            COALESCE(s.minuty_rozegrane, 0) AS minuty,
+            ROUND(s.gole / NULLIF(s.minuty_rozegrane, 0) * 90, 2) AS gole_na_90min,
+            ROUND(s.asysty / NULLIF(s.minuty_rozegrane, 0) * 90, 2) AS asysty_na_90min
         FROM Zawodnicy z
         JOIN Kluby k ON z.id_klubu = k.id_klubu
-        LEFT JOIN StatystykiIndywidualne si ON z.id_zawodnika = si.id_zawodnika
-        LEFT JOIN Mecze m ON si.id_meczu = m.id_meczu
+        LEFT JOIN StatystykiSezonowe s ON s.id_zawodnika = z.id_zawodnika AND s.sezon = :sezon
         WHERE z.id_pozycji = :pozycja_id
-        AND (m.sezon = :sezon OR m.sezon IS NULL)
-        GROUP BY z.id_zawodnika, z.imie, z.nazwisko, k.nazwa_klubu, z.wartosc_rynkowa
+        AND (s.id_zawodnika IS NOT NULL OR NOT EXISTS (
+            SELECT 1 FROM StatystykiSezonowe s2 WHERE s2.id_zawodnika = z.id_zawodnika
+        ))
         ORDER BY gole DESC, asysty DESC
     """)
     
     result = db.execute(query, {"pozycja_id": pozycja_id, "sezon": sezon})
     return result.fetchall()
 
+def _statystyki_do_analityki(db: Session, sezon: str):
+    """
+    Loader dla analytics.analityka: wiersze z kolumnami analytics.KOLUMNY
+    """
+    agregat = models.StatystykiSezonowe
+    return db.execute(select(
+        models.Zawodnicy.id_zawodnika,
+        models.Zawodnicy.imie,
+        models.Zawodnicy.nazwisko,
+        models.Kluby.nazwa_klubu,
+        models.Zawodnicy.id_pozycji,
+        agregat.wystepy,
+        agregat.minuty_rozegrane,
+        *(agregat.__table__.c[m] for m in analytics.METRYKI)
+    ).join(
+        agregat, agregat.id_zawodnika == models.Zawodnicy.id_zawodnika
+    ).outerjoin(
+        models.Kluby, models.Kluby.id_klubu == models.Zawodnicy.id_klubu
+    ).where(agregat.sezon == sezon)).all()
+
+def get_analityka(db: Session, sezon: str, metryki=analytics.METRYKI, pozycja_id: Optional[int] = None,
+                  min_minut: int = 0, sortuj: Optional[str] = None, limit: int = 100):
+    return analytics.analityka.raport(
+        sezon, lambda: _statystyki_do_analityki(db, sezon), metryki=metryki, pozycja_id=pozycja_id,
+        min_minut=min_minut, sortuj=sortuj, limit=limit
+    )
+
 #T5: historia transferow
 def get_historia_transferow(db: Session, zawodnik_id: int):
     """
     T5: Wyswietla pelna historie transferow zawodnika
     """
+    klub_z = aliased(models.Kluby)
+    klub_do = aliased(models.Kluby)
     return db.query(
         models.Transfery.data_transferu,
-        models.Kluby.nazwa_klubu.label('klub_z'),
-        models.Kluby.nazwa_klubu.label('klub_do'),
+        klub_z.nazwa_klubu.label('klub_z'),
+        klub_do.nazwa_klubu.label('klub_do'),
         models.Transfery.kwota_transferu,
         models.Transfery.typ_transferu
     ).outerjoin(
-        models.Kluby,
-        models.Transfery.id_klubu_z == models.Kluby.id_klubu
+        klub_z,
+        models.Transfery.id_klubu_z == klub_z.id_klubu
     ).join(
-        models.Kluby,
-        models.Transfery.id_klubu_do == models.Kluby.id_klubu
+        klub_do,
+        models.Transfery.id_klubu_do == klub_do.id_klubu
     ).filter(
         models.Transfery.id_zawodnika == zawodnik_id
     ).order_by(
@@ -300,22 +717,246 @@ def get_skutecznosc_klubow(db: Session):
     return result.fetchall()
 
 #staty indywidualne
+def _upsert(db: Session, tabela, wiersze: List[dict], klucz: tuple, kolumny: tuple, dodaj: bool = False):
+    """
+    INSERT wielu wierszy z aktualizacja przy konflikcie klucza. Przy dodaj=True
+    istniejace wartosci sa zwiekszane o nowe, w przeciwnym razie nadpisywane.
+    """
+    dialekt = db.get_bind().dialect.name
+    if dialekt == "mysql":
+        stmt = mysql.insert(tabela)
+        nowe = stmt.inserted
+    else:
+        stmt = (sqlite if dialekt == "sqlite" else postgresql).insert(tabela)
+        nowe = stmt.excluded
+    
+    zmiany = {k: tabela.c[k] + nowe[k] if dodaj else nowe[k] for k in kolumny}
+    if dialekt == "mysql":
+        stmt = stmt.on_duplicate_key_update(zmiany)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=list(klucz), set_=zmiany)
+    db.execute(stmt, wiersze)
+
+def _zmiana_statystyk(statystyki):
+    return {
+        "wystepy": 1,
+        "gole": statystyki.gole,
+        "asysty": statystyki.asysty,
+        "minuty_rozegrane": statystyki.minuty_rozegrane,
+        "zolte_kartki": statystyki.zolte_kartki,
+        "czerwone_kartki": statystyki.czerwone_kartki,
+        "czyste_konta": int(statystyki.czyste_konto)
+    }
+
+STATYSTYKI_SEZONOWE = (
+    "wystepy", "gole", "asysty", "minuty_rozegrane", "zolte_kartki", "czerwone_kartki", "czyste_konta"
+)
+
+def _aktualizuj_statystyki_sezonowe(db: Session, zmiany: dict):
+    """
+    Dodaje przyrosty {(id_zawodnika, sezon): {...}} do agregatu StatystykiSezonowe
+    w biezacej transakcji
+    """
+    _upsert(
+        db,
+        models.StatystykiSezonowe.__table__,
+        [
+            {"id_zawodnika": id_zawodnika, "sezon": sezon, **przyrosty}
+            for (id_zawodnika, sezon), przyrosty in sorted(zmiany.items())
+        ],
+        klucz=("id_zawodnika", "sezon"),
+        kolumny=STATYSTYKI_SEZONOWE,
+        dodaj=True
+    )
+
+def przebuduj_statystyki_sezonowe(db: Session, sezon: Optional[str] = None):
+    """
+    Odtwarza agregat StatystykiSezonowe od zera na podstawie StatystykiIndywidualne
+    """
+    si = models.StatystykiIndywidualne
+    agregat = models.StatystykiSezonowe.__table__
+    zrodlo = select(
+        si.id_zawodnika,
+        models.Mecze.sezon,
+        func.count(),
+        func.sum(si.gole),
+        func.sum(si.asysty),
+        func.sum(si.minuty_rozegrane),
+        func.sum(si.zolte_kartki),
+        func.sum(si.czerwone_kartki),
+        func.sum(case((si.czyste_konto, 1), else_=0))
+    ).join(
+        models.Mecze, si.id_meczu == models.Mecze.id_meczu
+    ).group_by(si.id_zawodnika, models.Mecze.sezon)
+    usun = delete(agregat)
+    
+    if sezon:
+        zrodlo = zrodlo.where(models.Mecze.sezon == sezon)
+        usun = usun.where(agregat.c.sezon == sezon)
+    
+    try:
+        db.execute(usun)
+        result = db.execute(insert(agregat).from_select(("id_zawodnika", "sezon") + STATYSTYKI_SEZONOWE, zrodlo))
+        db.commit()
+        analytics.analityka.invalidate(sezon)
+        cache.wersje.podbij("statystyki")
+        return result.rowcount
+    except Exception as e:
+        db.rollback()
+        raise e
+
 def create_statystyki(db: Session, statystyki: schemas.StatystykiIndywidualneCreate):
-    db_stat = models.StatystykiIndywidualne(**statystyki.dict())
-    db.add(db_stat)
-    db.commit()
-    db.refresh(db_stat)
-    return db_stat
+    try:
+        #blokada meczu jak w create_statystyki_bulk (ta sama kolejnosc blokad - bez zakleszczen)
+        mecz = db.execute(
+            select(models.Mecze.id_meczu, models.Mecze.sezon, models.Mecze.id_klubu_gospodarze, models.Mecze.id_klubu_goscie)
+            .where(models.Mecze.id_meczu == statystyki.id_meczu).with_for_update()
+        ).first()
+        sezon = mecz.sezon if mecz is not None else None
+        db_stat = models.StatystykiIndywidualne(**statystyki.dict())
+        db.add(db_stat)
+        db.flush()
+        
+        if sezon is not None:
+            _aktualizuj_statystyki_sezonowe(db, {
+                (statystyki.id_zawodnika, sezon): _zmiana_statystyk(statystyki)
+            })
+        
+        db.commit()
+        cache.wersje.podbij("statystyki")
+        if sezon is not None:
+            analytics.analityka.invalidate(sezon)
+            _opublikuj_statystyki([statystyki.dict()], {mecz.id_meczu: mecz})
+        db.refresh(db_stat)
+        return db_stat
+        
+    except Exception as e:
+        db.rollback()
+        raise e
 
-def get_statystyki_zawodnika(db: Session, zawodnik_id: int, sezon: Optional[str] = None):
+STATYSTYKI_MECZU = ("gole", "asysty", "zolte_kartki", "czerwone_kartki", "czyste_konto", "minuty_rozegrane")
+
+def _opublikuj_statystyki(wiersze: List[dict], mecze: dict):
+    """Zdarzenia /live/stream: jedno na mecz, z wierszami statystyk zapisanymi dla niego"""
+    po_meczu = defaultdict(list)
+    for w in wiersze:
+        po_meczu[w["id_meczu"]].append(w)
+    for id_meczu, wiersze_meczu in po_meczu.items():
+        mecz = mecze[id_meczu]
+        live.kanal.opublikuj(
+            "statystyki", {"id_meczu": id_meczu, "wiersze": wiersze_meczu},
+            (mecz.id_klubu_gospodarze, mecz.id_klubu_goscie)
+        )
+
+def create_statystyki_bulk(db: Session, wiersze: List[dict], czesciowe: bool = False):
+    """
+    Statystyki zawodnikow z jednego lub wielu meczow w jednej transakcji: jeden wielowierszowy
+    upsert po kluczu (id_zawodnika, id_meczu) - ponownie wyslany wiersz nadpisuje poprzednie wartosci -
+    i jeden upsert przyrostow do StatystykiSezonowe (dla nadpisanych wierszy: roznica nowe - stare).
+    Mecze z zadania sa blokowane (FOR UPDATE), wiec rownolegle wysylki tego samego meczu
+    nie policza wierszy podwojnie. Niepoprawne wiersze sa pomijane i zwracane jako bledy.
+    czesciowe=True - pola nieobecne w wierszu zostaja takie jak w bazie (aktualizacje na zywo)
+    """
+    statusy = ["blad"] * len(wiersze)
+    bledy = []
+    poprawne = {}
+    for indeks, dane in enumerate(wiersze):
+        try:
+            stat = schemas.StatystykiIndywidualneCreate(**dane)
+        except (ValidationError, TypeError) as e:
+            opis = _opis_bledu(e) if isinstance(e, ValidationError) else "Wiersz musi być obiektem"
+            bledy.append({"indeks": indeks, "blad": opis})
+            continue
+        klucz = (stat.id_zawodnika, stat.id_meczu)
+        if klucz in poprawne:
+            bledy.append({"indeks": indeks, "blad": f"Powtórzona para zawodnik-mecz (wiersz {poprawne[klucz][0]})"})
+            continue
+        poprawne[klucz] = (indeks, stat)
+    
+    try:
+        id_meczow = {id_meczu for _, id_meczu in poprawne}
+        id_zawodnikow = {id_zawodnika for id_zawodnika, _ in poprawne}
+        mecze = {m.id_meczu: m for m in db.execute(
+            select(models.Mecze.id_meczu, models.Mecze.sezon, models.Mecze.id_klubu_gospodarze, models.Mecze.id_klubu_goscie)
+            .where(models.Mecze.id_meczu.in_(id_meczow)).order_by(models.Mecze.id_meczu).with_for_update()
+        )} if id_meczow else {}
+        sezony = {id_meczu: m.sezon for id_meczu, m in mecze.items()}
+        istniejacy = set(db.scalars(
+            select(models.Zawodnicy.id_zawodnika).where(models.Zawodnicy.id_zawodnika.in_(id_zawodnikow))
+        )) if id_zawodnikow else set()
+        
+        for klucz, (indeks, stat) in list(poprawne.items()):
+            if stat.id_meczu not in sezony or stat.id_zawodnika not in istniejacy:
+                brak = "Mecz" if stat.id_meczu not in sezony else "Zawodnik"
+                bledy.append({"indeks": indeks, "blad": f"{brak} nie istnieje"})
+                del poprawne[klucz]
+        
+        si = models.StatystykiIndywidualne
+        stare = {
+            (w.id_zawodnika, w.id_meczu): w
+            for w in db.execute(
+                select(si.id_zawodnika, si.id_meczu, *(si.__table__.c[k] for k in STATYSTYKI_MECZU))
+                .where(si.id_meczu.in_(id_meczow), si.id_zawodnika.in_(id_zawodnikow))
+                .with_for_update()
+            )
+            if (w.id_zawodnika, w.id_meczu) in poprawne
+        } if poprawne else {}
+        
+        nowe = []
+        zmiany = defaultdict(lambda: dict.fromkeys(STATYSTYKI_SEZONOWE, 0))
+        for klucz, (indeks, stat) in poprawne.items():
+            poprzednie = stare.get(klucz)
+            if czesciowe and poprzednie is not None:
+                stat = schemas.StatystykiIndywidualneCreate(**{
+                    **{k: getattr(poprzednie, k) for k in STATYSTYKI_MECZU}, **stat.dict(exclude_unset=True)
+                })
+            if poprzednie is not None and all(getattr(poprzednie, k) == getattr(stat, k) for k in STATYSTYKI_MECZU):
+                statusy[indeks] = "bez_zmian"
+                continue
+            statusy[indeks] = "dodany" if poprzednie is None else "zaktualizowany"
+            nowe.append(stat.dict())
+            zmiana = zmiany[(stat.id_zawodnika, sezony[stat.id_meczu])]
+            for k, v in _zmiana_statystyk(stat).items():
+                zmiana[k] += v
+            if poprzednie is not None:
+                for k, v in _zmiana_statystyk(poprzednie).items():
+                    zmiana[k] -= v
+        
+        if nowe:
+            _upsert(db, si.__table__, nowe, klucz=("id_zawodnika", "id_meczu"), kolumny=STATYSTYKI_MECZU)
+            _aktualizuj_statystyki_sezonowe(db, zmiany)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+    
+    if nowe:
+        cache.wersje.podbij("statystyki")
+        for sezon in {sezon for _, sezon in zmiany}:
+            analytics.analityka.invalidate(sezon)
+        _opublikuj_statystyki(nowe, mecze)
+    
+    bledy.sort(key=lambda b: b["indeks"])
+    return {
+        "dodane": statusy.count("dodany"),
+        "zaktualizowane": statusy.count("zaktualizowany"),
+        "bez_zmian": statusy.count("bez_zmian"),
+        "statusy": statusy,
+        "bledy": bledy
+    }
+
+def get_statystyki_zawodnika(db: Session, zawodnik_id: int, sezon: Optional[str] = None,
+                             po_id: Optional[int] = None, limit: int = 100):
     query = db.query(models.StatystykiIndywidualne).filter(
         models.StatystykiIndywidualne.id_zawodnika == zawodnik_id
     )
     
     if sezon:
         query = query.join(models.Mecze).filter(models.Mecze.sezon == sezon)
+    if po_id is not None:
+        query = query.filter(models.StatystykiIndywidualne.id_statystyki > po_id)
     
-    return query.all()
+    return query.order_by(models.StatystykiIndywidualne.id_statystyki).limit(limit).all()
 
 #transfery
 def create_transfer(db: Session, transfer: schemas.TransferCreate):
@@ -328,7 +969,14 @@ def create_transfer(db: Session, transfer: schemas.TransferCreate):
         zawodnik.id_klubu = transfer.id_klubu_do
     
     db.commit()
+    analytics.analityka.invalidate()
+    cache.wersje.podbij("transfery", "zawodnicy")
     db.refresh(db_transfer)
+    live.kanal.opublikuj("transfer", {
+        pole: getattr(db_transfer, pole) for pole in (
+            "id_transferu", "id_zawodnika", "id_klubu_z", "id_klubu_do", "data_transferu", "kwota_transferu", "typ_transferu"
+        )
+    }, filter(None, (db_transfer.id_klubu_z, db_transfer.id_klubu_do)))
     return db_transfer
 
 #pozycje
@@ -0,0 +1,96 @@
+"""
+Asynchroniczne odpowiedniki funkcji odczytu z crud.
+
+Z AsyncSession (ASYNC_DATABASE=true) funkcja z crud jest wykonywana przez AsyncSession.run_sync:
+ten sam kod ORM dziala na polaczeniu async, a czekanie na baze oddaje petle zdarzen zamiast
+blokowac watek z puli Starlette. Ze zwykla Session funkcja trafia do puli watkow, jak dotad.
+Dzieki temu zapytania sa zdefiniowane tylko raz - w crud.
+"""
+from typing import Optional
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app import crud, analytics
+
+async def _wykonaj(db, funkcja, *args, **kwargs):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(funkcja, *args, **kwargs)
+    return await run_in_threadpool(funkcja, db, *args, **kwargs)
+
+#kluby
+async def get_kluby(db, skip: int = 0, limit: int = 100, wiersze: bool = False):
+    return await _wykonaj(db, crud.get_kluby, skip=skip, limit=limit, wiersze=wiersze)
+
+async def get_tabela_ligowa_json(db) -> bytes:
+    return await _wykonaj(db, crud.get_tabela_ligowa_json)
+
+async def get_klub(db, klub_id: int, profil=None):
+    return await _wykonaj(db, crud.get_klub, klub_id=klub_id, profil=profil)
+
+#zawodnicy
+async def get_zawodnicy(db, skip: int = 0, limit: int = 100, klub_id: Optional[int] = None,
+                        pozycja_id: Optional[int] = None, narodowosc: Optional[str] = None,
+                        po_id: Optional[int] = None, wiersze: bool = False):
+    return await _wykonaj(
+        db, crud.get_zawodnicy, skip=skip, limit=limit, klub_id=klub_id,
+        pozycja_id=pozycja_id, narodowosc=narodowosc, po_id=po_id, wiersze=wiersze
+    )
+
+async def get_zawodnik(db, zawodnik_id: int, profil=None):
+    return await _wykonaj(db, crud.get_zawodnik, zawodnik_id=zawodnik_id, profil=profil)
+
+async def search_zawodnicy(db, search: str, limit: int = 20):
+    return await _wykonaj(db, crud.search_zawodnicy, search=search, limit=limit)
+
+#mecze
+async def get_mecze(db, sezon: Optional[str] = None, kolejka: Optional[int] = None, po=None, limit: int = 100,
+                    wiersze: bool = False):
+    return await _wykonaj(db, crud.get_mecze, sezon=sezon, kolejka=kolejka, po=po, limit=limit, wiersze=wiersze)
+
+async def get_mecz(db, mecz_id: int, profil=None):
+    return await _wykonaj(db, crud.get_mecz, mecz_id=mecz_id, profil=profil)
+
+#tabele historyczne
+async def get_tabela_historyczna(db, sezon: str, kolejka: Optional[int] = None, as_of: Optional[date] = None):
+    return await _wykonaj(db, crud.get_tabela_historyczna, sezon=sezon, kolejka=kolejka, as_of=as_of)
+
+async def get_pozycje_w_czasie(db, sezon: str, klub_id: Optional[int] = None):
+    return await _wykonaj(db, crud.get_pozycje_w_czasie, sezon=sezon, klub_id=klub_id)
+
+#raporty
+async def get_ranking_strzelcow(db, sezon: str, limit: int = 20):
+    return await _wykonaj(db, crud.get_ranking_strzelcow, sezon=sezon, limit=limit)
+
+async def get_forma_druzyny(db, klub_id: int, limit: int = 5, sezon: Optional[str] = None):
+    return await _wykonaj(db, crud.get_forma_druzyny, klub_id=klub_id, limit=limit, sezon=sezon)
+
+async def get_porownanie_zawodnikow(db, pozycja_id: int, sezon: str):
+    return await _wykonaj(db, crud.get_porownanie_zawodnikow, pozycja_id=pozycja_id, sezon=sezon)
+
+async def get_analityka(db, sezon: str, metryki=analytics.METRYKI, pozycja_id: Optional[int] = None,
+                        min_minut: int = 0, sortuj: Optional[str] = None, limit: int = 100):
+    return await _wykonaj(
+        db, crud.get_analityka, sezon=sezon, metryki=metryki, pozycja_id=pozycja_id,
+        min_minut=min_minut, sortuj=sortuj, limit=limit
+    )
+
+async def get_historia_transferow(db, zawodnik_id: int):
+    return await _wykonaj(db, crud.get_historia_transferow, zawodnik_id=zawodnik_id)
+
+async def get_skutecznosc_klubow(db):
+    return await _wykonaj(db, crud.get_skutecznosc_klubow)
+
+#staty indywidualne
+async def get_statystyki_zawodnika(db, zawodnik_id: int, sezon: Optional[str] = None,
+                                   po_id: Optional[int] = None, limit: int = 100):
+    return await _wykonaj(db, crud.get_statystyki_zawodnika, zawodnik_id=zawodnik_id, sezon=sezon, po_id=po_id, limit=limit)
+
+#slowniki
+async def get_pozycje(db):
+    return await _wykonaj(db, crud.get_pozycje)
+
+async def get_menedzerowie(db):
+    return await _wykonaj(db, crud.get_menedzerowie)
+
+async def get_stadiony(db):
+    return await _wykonaj(db, crud.get_stadiony)
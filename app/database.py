@@ -1,18 +1,75 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Union
 from app.config import get_settings
+from app import instrumentation
+from app.replicas import SesjaRoutingu, pula
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=True
-)
+#sterowniki async odpowiadajace sterownikom z DATABASE_URL
+_STEROWNIKI_ASYNC = {"mysql": "aiomysql", "sqlite": "aiosqlite", "postgresql": "asyncpg"}
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def async_url(url: str):
+    """mysql+pymysql://... -> mysql+aiomysql://... (ten sam serwer i baza, sterownik async)"""
+    adres = make_url(url)
+    backend = adres.get_backend_name()
+    return adres.set(drivername=f"{backend}+{_STEROWNIKI_ASYNC[backend]}")
+
+def _silnik(url, nazwa: str, asynchroniczny: bool = False):
+    """
+    Silnik z pula wedlug ustawien (POOL_*) i telemetria puli pod nazwa (GET /health/db).
+    SQLite w pamieci ma wlasna pule (jedno polaczenie na watek), wiec tam ustawienia puli pomijamy.
+    """
+    opcje = {
+        "pool_pre_ping": settings.pool_pre_ping == "always",
+        "pool_recycle": settings.pool_recycle,
+        "echo": settings.database_echo
+    }
+    adres = make_url(url)
+    if adres.get_backend_name() != "sqlite" or adres.database not in (None, "", ":memory:"):
+        opcje.update(
+            poolclass=instrumentation.PulaAsyncZPomiarem if asynchroniczny else instrumentation.PulaZPomiarem,
+            pool_size=settings.pool_size,
+            max_overflow=settings.pool_max_overflow,
+            pool_timeout=settings.pool_timeout
+        )
+    silnik = (create_async_engine if asynchroniczny else create_engine)(url, **opcje)
+    synchroniczny = silnik.sync_engine if asynchroniczny else silnik
+    instrumentation.instrumentuj_pule(synchroniczny, nazwa, settings.pool_pre_ping, settings.pool_pre_ping_idle_s)
+    if settings.sql_metrics or settings.slow_query_ms:
+        instrumentation.instrumentuj(synchroniczny, slow_query_ms=settings.slow_query_ms)
+    return silnik
+
+engine = _silnik(settings.database_url, "glowna")
+
+#repliki do odczytu (DATABASE_REPLICA_URLS, po przecinku); bez nich wszystko idzie do bazy glownej
+replica_urls = [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()]
+pula.okno_po_zapisie = settings.read_after_write_s
+
+SessionLocal = sessionmaker(class_=SesjaRoutingu, autocommit=False, autoflush=False, bind=engine)
+#sesje odczytu moga trafic do repliki
+ReadSessionLocal = sessionmaker(class_=SesjaRoutingu, autocommit=False, autoflush=False, bind=engine,
+                                info={"odczyt": "sync"})
+if settings.sql_metrics:
+    instrumentation.instrumentuj_sesje(SesjaRoutingu)
+
+async_engine = None
+AsyncSessionLocal = None
+
+if settings.async_database:
+    async_engine = _silnik(settings.async_database_url or async_url(settings.database_url), "glowna_async", True)
+    AsyncSessionLocal = async_sessionmaker(async_engine, sync_session_class=SesjaRoutingu, autoflush=False,
+                                           expire_on_commit=False, info={"odczyt": "async"})
+
+for i, url in enumerate(replica_urls, 1):
+    pula.dodaj(
+        _silnik(url, f"replika_{i}"),
+        _silnik(async_url(url), f"replika_{i}_async", True) if settings.async_database else None
+    )
 
 Base = declarative_base()
 
@@ -21,4 +78,20 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_replica_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+#sesja dla endpointow odczytu: AsyncSession przy ASYNC_DATABASE=true, w przeciwnym razie zwykla Session;
+#obie moga czytac z repliki
+SesjaOdczytu = Union[Session, AsyncSession]
+get_read_db = get_async_db if settings.async_database else get_replica_db
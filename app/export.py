@@ -0,0 +1,124 @@
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, Optional
+from sqlalchemy import select
+from app import instrumentation, models
+from app.database import ReadSessionLocal
+
+#rozmiar partii czytanej z kursora po stronie serwera i wysylanej jednym kawalkiem
+ROZMIAR_PARTII = 1000
+
+FORMATY = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+def _wartosc(v):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return str(v)
+    if isinstance(v, enum.Enum):
+        return v.value
+    return v
+
+def zakres_sezonu(sezon: str):
+    """
+    "2024/25" -> (2024-07-01, 2025-07-01): okno, do ktorego zaliczamy transfery sezonu
+    """
+    try:
+        rok = int(sezon.split("/")[0])
+    except ValueError:
+        raise ValueError(f"Nieprawidłowy sezon: {sezon}")
+    return date(rok, 7, 1), date(rok + 1, 7, 1)
+
+def zapytanie_mecze(sezon: Optional[str] = None, kolejka: Optional[int] = None):
+    m = models.Mecze
+    query = select(
+        m.id_meczu, m.data_meczu, m.sezon, m.kolejka,
+        m.id_klubu_gospodarze, m.id_klubu_goscie, m.bramki_gospodarze, m.bramki_goscie
+    ).order_by(m.id_meczu)
+    if sezon is not None:
+        query = query.where(m.sezon == sezon)
+    if kolejka is not None:
+        query = query.where(m.kolejka == kolejka)
+    return query
+
+def zapytanie_statystyki(sezon: Optional[str] = None, zawodnik_id: Optional[int] = None):
+    s = models.StatystykiIndywidualne
+    query = select(
+        s.id_statystyki, s.id_zawodnika, s.id_meczu, models.Mecze.sezon,
+        s.gole, s.asysty, s.minuty_rozegrane, s.zolte_kartki, s.czerwone_kartki, s.czyste_konto
+    ).join(models.Mecze, models.Mecze.id_meczu == s.id_meczu).order_by(s.id_statystyki)
+    if sezon is not None:
+        query = query.where(models.Mecze.sezon == sezon)
+    if zawodnik_id is not None:
+        query = query.where(s.id_zawodnika == zawodnik_id)
+    return query
+
+def zapytanie_transfery(sezon: Optional[str] = None, zawodnik_id: Optional[int] = None):
+    t = models.Transfery
+    query = select(
+        t.id_transferu, t.id_zawodnika, t.id_klubu_z, t.id_klubu_do,
+        t.data_transferu, t.kwota_transferu, t.typ_transferu
+    ).order_by(t.id_transferu)
+    if sezon is not None:
+        od, do = zakres_sezonu(sezon)
+        query = query.where(t.data_transferu >= od, t.data_transferu < do)
+    if zawodnik_id is not None:
+        query = query.where(t.id_zawodnika == zawodnik_id)
+    return query
+
+def _ndjson(kolumny, partie) -> Iterator[bytes]:
+    for partia in partie:
+        yield "".join(
+            json.dumps(dict(zip(kolumny, map(_wartosc, wiersz))), ensure_ascii=False) + "\n"
+            for wiersz in partia
+        ).encode("utf-8")
+
+def _csv(kolumny, partie) -> Iterator[bytes]:
+    bufor = io.StringIO()
+    writer = csv.writer(bufor)
+    writer.writerow(kolumny)
+    for partia in partie:
+        writer.writerows([_wartosc(v) for v in wiersz] for wiersz in partia)
+        yield bufor.getvalue().encode("utf-8")
+        bufor.seek(0)
+        bufor.truncate()
+    if bufor.tell():
+        yield bufor.getvalue().encode("utf-8")
+
+def _gzip(kawalki: Iterator[bytes]) -> Iterator[bytes]:
+    kompresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for kawalek in kawalki:
+        dane = kompresor.compress(kawalek)
+        if dane:
+            yield dane
+    yield kompresor.flush()
+
+def _zliczaj(partie):
+    #wyniki yield_per omijaja licznik sesji, wiec wiersze eksportu doliczamy tutaj
+    for partia in partie:
+        instrumentation.zwrocono(len(partia))
+        yield partia
+
+def strumien(query, format: str = "ndjson", gzip: bool = False) -> Iterator[bytes]:
+    """
+    Eksport wyniku zapytania jako NDJSON albo CSV, kawalek po kawalku.
+    Wiersze sa czytane kursorem po stronie serwera (yield_per), wiec pamiec nie zalezy
+    od rozmiaru eksportu. Generator otwiera wlasna sesje odczytu (moze trafic do repliki), bo sesja z get_db jest
+    zamykana, zanim odpowiedz zacznie byc wysylana.
+    """
+    db = ReadSessionLocal()
+    try:
+        wynik = db.execute(query.execution_options(yield_per=ROZMIAR_PARTII))
+        kolumny = list(wynik.keys())
+        kawalki = (_csv if format == "csv" else _ndjson)(kolumny, _zliczaj(wynik.partitions()))
+        yield from (_gzip(kawalki) if gzip else kawalki)
+    finally:
+        db.close()
@@ -0,0 +1,160 @@
+import threading
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from app import cache
+from app.config import get_settings
+
+# (data_meczu, id_meczu, sezon, typ_meczu, id_przeciwnika, bramki_za, bramki_przeciw)
+Wynik = Tuple[datetime, int, str, str, int, int, int]
+
+def _wynik(za: int, przeciw: int) -> str:
+    return "W" if za > przeciw else "R" if za == przeciw else "P"
+
+def wyniki_meczu(id_meczu: int, data_meczu: datetime, sezon: str, id_gospodarzy: int, id_gosci: int,
+                 bramki_gospodarzy: int, bramki_gosci: int) -> Dict[int, Wynik]:
+    """Wpis meczu z perspektywy kazdego z klubow ({id_klubu: wynik})"""
+    return {
+        id_gospodarzy: (data_meczu, id_meczu, sezon, "gospodarze", id_gosci, bramki_gospodarzy, bramki_gosci),
+        id_gosci: (data_meczu, id_meczu, sezon, "goscie", id_gospodarzy, bramki_gosci, bramki_gospodarzy)
+    }
+
+class IndeksFormy:
+    """
+    Ostatnie wyniki kazdego klubu w pamieci procesu: dla klubu i dla pary (klub, sezon)
+    ograniczony bufor najnowszych meczow, posortowany po dacie. Nazwy przeciwnikow
+    sa trzymane w slowniku id -> nazwa, wiec zmiana nazwy klubu nie wymaga przebudowy.
+    Bufory sa wypelniane przy starcie (load) albo leniwie z bazy dla pojedynczego klucza.
+    Mecze i kluby zmienione w innych procesach (wymiana wersji w cache.wersje) czyszcza caly
+    indeks - bufory i nazwy sa potem doczytywane leniwie.
+    """
+    def __init__(self, pojemnosc: int = 38):
+        self.pojemnosc = pojemnosc
+        self._lock = threading.Lock()
+        self._bufory: Dict[Tuple[int, Optional[str]], Deque[Wynik]] = {}
+        self._wersje: Dict[int, int] = {}
+        self._generacja = 0
+        self._nazwy: Dict[int, str] = {}
+
+    def _bufor(self, klucz) -> Deque[Wynik]:
+        bufor = self._bufory.get(klucz)
+        if bufor is None:
+            bufor = self._bufory[klucz] = deque(maxlen=self.pojemnosc)
+        return bufor
+
+    def _wstaw(self, bufor: Deque[Wynik], wynik: Wynik):
+        if not bufor or wynik[:2] >= bufor[-1][:2]:
+            bufor.append(wynik)
+            return
+        if len(bufor) == bufor.maxlen:
+            if wynik[:2] < bufor[0][:2]:
+                return
+            bufor.popleft()
+        bufor.insert(bisect_right([w[:2] for w in bufor], wynik[:2]), wynik)
+
+    def load(self, mecze, nazwy: Dict[int, str]):
+        """
+        Buduje bufory wszystkich klubow z wierszy
+        (id_meczu, data_meczu, sezon, id_klubu_gospodarze, id_klubu_goscie, bramki_gospodarze, bramki_goscie)
+        """
+        with self._lock:
+            self._bufory = {}
+            self._nazwy = dict(nazwy)
+            for mecz in sorted(mecze, key=lambda m: (m[1], m[0])):
+                for id_klubu, wynik in wyniki_meczu(*mecz).items():
+                    self._bufor((id_klubu, None)).append(wynik)
+                    self._bufor((id_klubu, wynik[2])).append(wynik)
+
+    def dodaj_mecz(self, id_meczu: int, data_meczu: datetime, sezon: str, id_gospodarzy: int, id_gosci: int,
+                   bramki_gospodarzy: int, bramki_gosci: int):
+        """Dopisuje zapisany mecz do zaladowanych buforow obu klubow"""
+        with self._lock:
+            for id_klubu, wynik in wyniki_meczu(
+                id_meczu, data_meczu, sezon, id_gospodarzy, id_gosci, bramki_gospodarzy, bramki_gosci
+            ).items():
+                # trwajace leniwe ladowanie tego klubu moglo nie zobaczyc meczu
+                self._wersje[id_klubu] = self._wersje.get(id_klubu, 0) + 1
+                for klucz in ((id_klubu, None), (id_klubu, sezon)):
+                    bufor = self._bufory.get(klucz)
+                    if bufor is not None and all(w[1] != id_meczu for w in bufor):
+                        self._wstaw(bufor, wynik)
+
+    def popraw_mecz(self, id_meczu: int, data_meczu: datetime, sezon: str, id_gospodarzy: int, id_gosci: int,
+                    bramki_gospodarzy: int, bramki_gosci: int):
+        """Podmienia wynik meczu w buforach obu klubow (korekta wyniku - data i kolejnosc bez zmian)"""
+        with self._lock:
+            for id_klubu, wynik in wyniki_meczu(
+                id_meczu, data_meczu, sezon, id_gospodarzy, id_gosci, bramki_gospodarzy, bramki_gosci
+            ).items():
+                self._wersje[id_klubu] = self._wersje.get(id_klubu, 0) + 1
+                for klucz in ((id_klubu, None), (id_klubu, sezon)):
+                    bufor = self._bufory.get(klucz, ())
+                    for i, w in enumerate(bufor):
+                        if w[1] == id_meczu:
+                            bufor[i] = wynik
+
+    def invalidate(self, *kluby: int):
+        """Usuwa bufory podanych klubow - zostana doczytane z bazy przy nastepnym odczycie"""
+        with self._lock:
+            for id_klubu in kluby:
+                self._wersje[id_klubu] = self._wersje.get(id_klubu, 0) + 1
+            for klucz in [k for k in self._bufory if k[0] in kluby]:
+                del self._bufory[klucz]
+
+    def clear(self):
+        """Usuwa wszystkie bufory i nazwy (zmiany meczow lub klubow poza tym procesem)"""
+        with self._lock:
+            self._generacja += 1
+            self._bufory = {}
+            self._nazwy = {}
+
+    def zmien_nazwe(self, id_klubu: int, nazwa: str):
+        with self._lock:
+            self._nazwy[id_klubu] = nazwa
+
+    def get(self, id_klubu: int, limit: int, sezon: Optional[str] = None,
+            loader: Optional[Callable[[], List[dict]]] = None) -> List[dict]:
+        """
+        Ostatnie `limit` meczow klubu (od najnowszego), opcjonalnie tylko z sezonu.
+        loader zwraca do `pojemnosc` ostatnich meczow z bazy (slowniki jak w wyniku),
+        gdy bufora jeszcze nie ma.
+        """
+        if limit > self.pojemnosc:
+            raise ValueError(f"limit wiekszy niz pojemnosc indeksu ({self.pojemnosc})")
+        klucz = (id_klubu, sezon)
+        with self._lock:
+            bufor = self._bufory.get(klucz)
+            wersja = (self._generacja, self._wersje.get(id_klubu, 0))
+
+        if bufor is None:
+            wiersze = loader() if loader else []
+            with self._lock:
+                for w in wiersze:
+                    self._nazwy.setdefault(w["id_przeciwnika"], w["przeciwnik"])
+                if (self._generacja, self._wersje.get(id_klubu, 0)) != wersja or klucz in self._bufory:
+                    return wiersze[:limit]
+                bufor = self._bufor(klucz)
+                for w in reversed(wiersze):
+                    bufor.append((w["data_meczu"], w["id_meczu"], w["sezon"], w["typ_meczu"],
+                                  w["id_przeciwnika"], w["bramki_za"], w["bramki_przeciw"]))
+
+        with self._lock:
+            ostatnie = list(bufor)[:-limit - 1:-1] if limit else []
+            return [
+                {
+                    "id_meczu": id_meczu,
+                    "data_meczu": data_meczu,
+                    "sezon": sezon_meczu,
+                    "typ_meczu": typ_meczu,
+                    "id_przeciwnika": id_przeciwnika,
+                    "przeciwnik": self._nazwy.get(id_przeciwnika, ""),
+                    "bramki_za": za,
+                    "bramki_przeciw": przeciw,
+                    "wynik": _wynik(za, przeciw)
+                }
+                for data_meczu, id_meczu, sezon_meczu, typ_meczu, id_przeciwnika, za, przeciw in ostatnie
+            ]
+
+indeks_formy = IndeksFormy(get_settings().form_index_size)
+cache.wersje.nasluchuj(("mecze", "kluby"), lambda tagi: indeks_formy.clear())
@@ -0,0 +1,358 @@
+"""
+Generator syntetycznych danych ligi do testow obciazeniowych, np.:
+
+    python -m app.generator --sezony 20 --seed 42 --database-url sqlite:///liga.db --wyczysc
+
+Dane sa deterministyczne dla danego ziarna: te same argumenty daja identyczna baze.
+Kazdy sezon to pelny terminarz "kazdy z kazdym" (mecz i rewanz), a kazdy wystep
+ma wpis w SkladyMeczowe i StatystykiIndywidualne. Miedzy sezonami zawodnicy
+zmieniaja kluby (Transfery), a liczniki w Kluby to sumy ze wszystkich wygenerowanych
+meczow - tak jak po dodaniu tych meczow przez POST /mecze/.
+"""
+import argparse
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import bindparam, create_engine, delete, func, insert, select
+from sqlalchemy.orm import Session
+from app import cache, crud, models
+from app.database import Base
+
+POZYCJE = [
+    ("Bramkarz", "GK"), ("Lewy stoper", "RCB"), ("Prawy stoper", "LCB"), ("Prawy obronca", "RB"),
+    ("Lewy obronca", "LB"), ("Pomocnik defensywny", "CDM"), ("Srodkowy pomocnik", "CM"),
+    ("Pomocnik ofensywny", "CAM"), ("Prawy skrzydlowy", "RW"), ("Lewy skrzydlowy", "LW"),
+    ("Falszywa 9", "CF"), ("Napastnik", "ST")
+]
+# id pozycji (kolejnosc jak w POZYCJE) w podziale na formacje
+FORMACJE = {"GK": [1], "DEF": [2, 3, 4, 5], "MID": [6, 7, 8], "FWD": [9, 10, 11, 12]}
+SKLAD_KADRY = {"GK": 3, "DEF": 8, "MID": 8, "FWD": 6}
+USTAWIENIE = {"GK": 1, "DEF": 4, "MID": 4, "FWD": 2}
+WAGA_STRZELCA = {"GK": 0.0, "DEF": 0.6, "MID": 2.5, "FWD": 5.0}
+ZMIANY = 3
+
+KLUBY = [
+    "Manchester City", "Liverpool", "Arsenal", "Manchester United", "Chelsea", "Tottenham Hotspur",
+    "Newcastle United", "Aston Villa", "Brighton", "West Ham United", "Crystal Palace", "Fulham",
+    "Wolverhampton", "Everton", "Brentford", "Nottingham Forest", "Bournemouth", "Leicester City",
+    "Southampton", "Ipswich Town"
+]
+MIASTA = ["Manchester", "Liverpool", "Londyn", "Newcastle", "Birmingham", "Brighton", "Nottingham",
+          "Bournemouth", "Leicester", "Southampton", "Ipswich", "Wolverhampton"]
+IMIONA = ["Jan", "Łukasz", "Erling", "Kevin", "Mohamed", "Bukayo", "Martin", "Bruno", "Cole", "Son",
+          "Virgil", "Rúben", "Bernardo", "Declan", "Alexis", "Jérémy", "Dominik", "Ødegaard", "Jakub",
+          "Mateusz", "Raheem", "Phil", "Trent", "Diogo", "Rodrigo", "Ederson", "Alisson", "Gabriel",
+          "William", "Kai", "Ollie", "Jarrod", "Marc", "Pedro", "Joško", "Andrés", "Ivan", "Piotr"]
+NAZWISKA = ["Kowalski", "Fabiański", "Haaland", "De Bruyne", "Salah", "Saka", "Ødegaard", "Fernandes",
+            "Palmer", "Heung-min", "van Dijk", "Dias", "Silva", "Rice", "Mac Allister", "Doku",
+            "Szoboszlai", "Kiwior", "Moder", "Sterling", "Foden", "Alexander-Arnold", "Jota", "Núñez",
+            "Gvardiol", "Müller", "Håland", "Øvrebø", "Łęgowski", "Świderski", "Wójcik", "Martínez",
+            "García", "Rodríguez", "Watkins", "Bowen", "Guéhi", "Škriniar", "Dúbravka", "Mitoma"]
+NARODOWOSCI = ["Anglia", "Polska", "Norwegia", "Belgia", "Egipt", "Hiszpania", "Portugalia",
+               "Brazylia", "Francja", "Niemcy", "Holandia", "Argentyna", "Chorwacja", "Japonia"]
+
+ROZMIAR_PACZKI = 5000
+
+class Generator:
+    def __init__(self, seed: int, liczba_klubow: int):
+        self.rng = random.Random(seed)
+        self.liczba_klubow = liczba_klubow
+        self.id_zawodnika = 0
+        self.id_meczu = 0
+        self.id_skladu = 0
+        self.id_statystyki = 0
+        self.id_transferu = 0
+        self.zawodnicy = {}     # id -> wiersz Zawodnicy
+        self.kadry = {}         # id_klubu -> {formacja: [id_zawodnika]}
+        self.sila = {}          # id_klubu -> sila ataku
+
+    def _poisson(self, lam: float) -> int:
+        prog, k, p = math.exp(-lam), 0, 1.0
+        while True:
+            p *= self.rng.random()
+            if p <= prog:
+                return k
+            k += 1
+
+    def _nowy_zawodnik(self, id_klubu, formacja: str, rok: int, mlody: bool = False):
+        self.id_zawodnika += 1
+        wiek = self.rng.randint(17, 19) if mlody else self.rng.randint(18, 32)
+        wiersz = {
+            "id_zawodnika": self.id_zawodnika,
+            "imie": self.rng.choice(IMIONA),
+            "nazwisko": self.rng.choice(NAZWISKA),
+            "data_urodzenia": date(rok - wiek, self.rng.randint(1, 12), self.rng.randint(1, 28)),
+            "narodowosc": self.rng.choice(NARODOWOSCI),
+            "wzrost": self.rng.randint(168, 198),
+            "id_klubu": id_klubu,
+            "id_pozycji": self.rng.choice(FORMACJE[formacja]),
+            "wartosc_rynkowa": Decimal(self.rng.randint(100, 15000)) / 100,
+            "numer_koszulki": self.rng.randint(1, 99)
+        }
+        self.zawodnicy[self.id_zawodnika] = wiersz
+        self.kadry[id_klubu][formacja].append(self.id_zawodnika)
+        return self.id_zawodnika
+
+    def slowniki(self):
+        kluby = [KLUBY[i] if i < len(KLUBY) else f"Klub {i + 1}" for i in range(self.liczba_klubow)]
+        return {
+            models.Pozycje: [
+                {"id_pozycji": i + 1, "nazwa_pozycji": nazwa, "skrot": skrot}
+                for i, (nazwa, skrot) in enumerate(POZYCJE)
+            ],
+            models.Menedzerowie: [
+                {"id_menedzera": i + 1, "imie": self.rng.choice(IMIONA), "nazwisko": self.rng.choice(NAZWISKA),
+                 "narodowosc": self.rng.choice(NARODOWOSCI),
+                 "data_urodzenia": date(self.rng.randint(1960, 1985), self.rng.randint(1, 12), self.rng.randint(1, 28))}
+                for i in range(self.liczba_klubow)
+            ],
+            models.Stadiony: [
+                {"id_stadionu": i + 1, "nazwa_stadionu": f"Stadion {nazwa}", "pojemnosc": self.rng.randint(11000, 75000),
+                 "miasto": self.rng.choice(MIASTA), "rok_otwarcia": self.rng.randint(1880, 2020)}
+                for i, nazwa in enumerate(kluby)
+            ],
+            models.Kluby: [
+                {"id_klubu": i + 1, "nazwa_klubu": nazwa, "rok_zalozenia": self.rng.randint(1860, 1920),
+                 "id_stadionu": i + 1, "id_menedzera": i + 1}
+                for i, nazwa in enumerate(kluby)
+            ]
+        }
+
+    def pierwsze_kadry(self, rok: int):
+        for id_klubu in range(1, self.liczba_klubow + 1):
+            self.kadry[id_klubu] = {f: [] for f in SKLAD_KADRY}
+            self.sila[id_klubu] = self.rng.uniform(0.9, 1.9)
+            for formacja, liczba in SKLAD_KADRY.items():
+                for _ in range(liczba):
+                    self._nowy_zawodnik(id_klubu, formacja, rok)
+
+    def okno_transferowe(self, rok: int):
+        """Zmiany kadr przed sezonem: emerytury, transfery w lancuchu miedzy klubami, wychowankowie"""
+        transfery = []
+        for id_klubu, kadra in self.kadry.items():
+            for formacja, ids in kadra.items():
+                for id_zawodnika in list(ids):
+                    if rok - self.zawodnicy[id_zawodnika]["data_urodzenia"].year >= 35:
+                        ids.remove(id_zawodnika)
+                        self.zawodnicy[id_zawodnika]["id_klubu"] = None
+                while len(ids) < SKLAD_KADRY[formacja]:
+                    self._nowy_zawodnik(id_klubu, formacja, rok, mlody=True)
+            self.sila[id_klubu] = min(2.2, max(0.7, self.sila[id_klubu] + self.rng.uniform(-0.2, 0.2)))
+
+        kluby = sorted(self.kadry)
+        for formacja in SKLAD_KADRY:
+            # kazdy klub oddaje jednego zawodnika z formacji nastepnemu w wylosowanej kolejnosci,
+            # wiec liczebnosc kadr sie nie zmienia, a zawodnicy tworza lancuchy transferow
+            kolejnosc = kluby[:]
+            self.rng.shuffle(kolejnosc)
+            odchodzacy = [self.rng.choice(self.kadry[k][formacja]) for k in kolejnosc]
+            for i, id_z in enumerate(kolejnosc):
+                id_do = kolejnosc[(i + 1) % len(kolejnosc)]
+                id_zawodnika = odchodzacy[i]
+                self.kadry[id_z][formacja].remove(id_zawodnika)
+                self.kadry[id_do][formacja].append(id_zawodnika)
+                self.zawodnicy[id_zawodnika]["id_klubu"] = id_do
+
+                typ = self.rng.choices(["transfer", "wypozyczenie", "wolny_agent"], [7, 2, 1])[0]
+                self.id_transferu += 1
+                transfery.append({
+                    "id_transferu": self.id_transferu,
+                    "id_zawodnika": id_zawodnika,
+                    "id_klubu_z": id_z,
+                    "id_klubu_do": id_do,
+                    "data_transferu": date(rok, self.rng.choice([7, 8]), self.rng.randint(1, 31)),
+                    "kwota_transferu": None if typ == "wolny_agent" else Decimal(self.rng.randint(50, 12000)) / 100,
+                    "typ_transferu": models.TypTransferuEnum(typ)
+                })
+        return sorted(transfery, key=lambda t: (t["data_transferu"], t["id_transferu"]))
+
+    def terminarz(self):
+        """Terminarz metoda kolowa: n-1 kolejek w rundzie, druga runda z zamienionymi gospodarzami"""
+        kluby = list(range(1, self.liczba_klubow + 1))
+        self.rng.shuffle(kluby)
+        if len(kluby) % 2:
+            kluby.append(None)
+        runda = []
+        for k in range(len(kluby) - 1):
+            pary = []
+            for i in range(len(kluby) // 2):
+                a, b = kluby[i], kluby[-1 - i]
+                if a is not None and b is not None:
+                    pary.append((a, b) if (k + i) % 2 == 0 else (b, a))
+            runda.append(pary)
+            kluby = [kluby[0], kluby[-1]] + kluby[1:-1]
+        return runda + [[(b, a) for a, b in pary] for pary in runda]
+
+    def _sklad(self, id_klubu: int):
+        kadra = self.kadry[id_klubu]
+        podstawowi = []
+        for formacja, liczba in USTAWIENIE.items():
+            podstawowi += [(z, formacja) for z in self.rng.sample(kadra[formacja], liczba)]
+        wybrani = {z for z, _ in podstawowi}
+        rezerwowi = [(z, f) for f in ("DEF", "MID", "FWD") for z in kadra[f] if z not in wybrani]
+        return podstawowi, self.rng.sample(rezerwowi, ZMIANY)
+
+    def _wystepy(self, id_meczu: int, id_klubu: int, bramki_za: int, bramki_przeciw: int, sklady, statystyki):
+        podstawowi, rezerwowi = self._sklad(id_klubu)
+        minuty = {z: 90 for z, _ in podstawowi}
+        formacje = dict(podstawowi + rezerwowi)
+        schodzacy = self.rng.sample([z for z, f in podstawowi if f != "GK"], ZMIANY)
+        for (wchodzacy, _), schodzi in zip(rezerwowi, schodzacy):
+            minuta = self.rng.randint(55, 85)
+            minuty[schodzi] = minuta
+            minuty[wchodzacy] = 90 - minuta
+
+        gole = dict.fromkeys(minuty, 0)
+        asysty = dict.fromkeys(minuty, 0)
+        grajacy = list(minuty)
+        wagi = [WAGA_STRZELCA[formacje[z]] * minuty[z] for z in grajacy]
+        for _ in range(bramki_za):
+            strzelec = self.rng.choices(grajacy, wagi)[0]
+            gole[strzelec] += 1
+            if self.rng.random() < 0.7:
+                asystujacy = self.rng.choice([z for z in grajacy if z != strzelec and formacje[z] != "GK"])
+                asysty[asystujacy] += 1
+
+        podstawowi_ids = {z for z, _ in podstawowi}
+        for id_zawodnika in grajacy:
+            self.id_skladu += 1
+            sklady.append({
+                "id_skladu": self.id_skladu,
+                "id_meczu": id_meczu,
+                "id_zawodnika": id_zawodnika,
+                "id_klubu": id_klubu,
+                "w_podstawowym_skladzie": id_zawodnika in podstawowi_ids,
+                "minuty_rozegrane": minuty[id_zawodnika]
+            })
+            czerwona = int(self.rng.random() < 0.005)
+            self.id_statystyki += 1
+            statystyki.append({
+                "id_statystyki": self.id_statystyki,
+                "id_zawodnika": id_zawodnika,
+                "id_meczu": id_meczu,
+                "gole": gole[id_zawodnika],
+                "asysty": asysty[id_zawodnika],
+                "zolte_kartki": 0 if czerwona else int(self.rng.random() < 0.12),
+                "czerwone_kartki": czerwona,
+                "czyste_konto": bramki_przeciw == 0 and formacje[id_zawodnika] in ("GK", "DEF")
+                                and minuty[id_zawodnika] >= 60,
+                "minuty_rozegrane": minuty[id_zawodnika]
+            })
+
+    def sezon(self, rok: int):
+        sezon = f"{rok}/{(rok + 1) % 100:02d}"
+        poczatek = date(rok, 8, 8) + timedelta(days=(5 - date(rok, 8, 8).weekday()) % 7)
+        godziny = [(0, 12, 30), (0, 15, 0), (0, 17, 30), (1, 14, 0), (1, 16, 30)]
+        mecze, sklady, statystyki = [], [], []
+
+        for kolejka, pary in enumerate(self.terminarz(), start=1):
+            dzien = poczatek + timedelta(weeks=kolejka - 1)
+            for i, (gospodarze, goscie) in enumerate(pary):
+                przesuniecie, godzina, minuta = godziny[i % len(godziny)]
+                bramki_gospodarze = self._poisson(self.sila[gospodarze] * 1.15 / self.sila[goscie] ** 0.5)
+                bramki_goscie = self._poisson(self.sila[goscie] * 0.95 / self.sila[gospodarze] ** 0.5)
+                self.id_meczu += 1
+                mecze.append({
+                    "id_meczu": self.id_meczu,
+                    "data_meczu": datetime.combine(dzien + timedelta(days=przesuniecie), datetime.min.time())
+                                  .replace(hour=godzina, minute=minuta),
+                    "id_klubu_gospodarze": gospodarze,
+                    "id_klubu_goscie": goscie,
+                    "bramki_gospodarze": bramki_gospodarze,
+                    "bramki_goscie": bramki_goscie,
+                    "sezon": sezon,
+                    "kolejka": kolejka
+                })
+                self._wystepy(self.id_meczu, gospodarze, bramki_gospodarze, bramki_goscie, sklady, statystyki)
+                self._wystepy(self.id_meczu, goscie, bramki_goscie, bramki_gospodarze, sklady, statystyki)
+        return sezon, mecze, sklady, statystyki
+
+def _wstaw(conn, model, wiersze):
+    for i in range(0, len(wiersze), ROZMIAR_PACZKI):
+        conn.execute(insert(model.__table__), wiersze[i:i + ROZMIAR_PACZKI])
+
+def generuj(engine, sezony: int = 20, liczba_klubow: int = 20, seed: int = 42,
+            ostatni_sezon: int = 2024, wyczysc: bool = False, log=print):
+    """Generuje dane do bazy wskazanej przez engine i zwraca liczbe wierszy per tabela"""
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        if wyczysc:
+            for tabela in reversed(Base.metadata.sorted_tables):
+                # wersje danych musza rosnac - dzialajace API porownuje je z ostatnio widzianymi
+                if tabela is not models.WersjeDanych.__table__:
+                    conn.execute(delete(tabela))
+        elif conn.scalar(select(func.count()).select_from(models.Kluby.__table__)):
+            raise SystemExit("Baza nie jest pusta - uzyj --wyczysc, aby ja wyczyscic przed generowaniem")
+
+    gen = Generator(seed, liczba_klubow)
+    liczniki = {}
+    pierwszy = ostatni_sezon - sezony + 1
+    start = time.perf_counter()
+
+    with engine.begin() as conn:
+        for model, wiersze in gen.slowniki().items():
+            _wstaw(conn, model, wiersze)
+            liczniki[model.__tablename__] = len(wiersze)
+    gen.pierwsze_kadry(pierwszy)
+
+    transfery_wszystkie = 0
+    zapisani = 0
+    for rok in range(pierwszy, ostatni_sezon + 1):
+        transfery = gen.okno_transferowe(rok) if rok > pierwszy else []
+        sezon, mecze, sklady, statystyki = gen.sezon(rok)
+        with engine.begin() as conn:
+            # id zawodnikow sa nadawane rosnaco, wiec nowi to ci powyzej ostatnio zapisanego
+            _wstaw(conn, models.Zawodnicy, [gen.zawodnicy[i] for i in range(zapisani + 1, gen.id_zawodnika + 1)])
+            _wstaw(conn, models.Transfery, transfery)
+            _wstaw(conn, models.Mecze, mecze)
+            _wstaw(conn, models.SkladyMeczowe, sklady)
+            _wstaw(conn, models.StatystykiIndywidualne, statystyki)
+        zapisani = gen.id_zawodnika
+        transfery_wszystkie += len(transfery)
+        for tabela, n in (("Mecze", len(mecze)), ("SkladyMeczowe", len(sklady)),
+                          ("StatystykiIndywidualne", len(statystyki))):
+            liczniki[tabela] = liczniki.get(tabela, 0) + n
+        log(f"{sezon}: {len(mecze)} meczow, {len(statystyki)} wystepow, {len(transfery)} transferow "
+            f"({time.perf_counter() - start:.1f} s)")
+
+    # biezacy klub zawodnika moze sie zmienic w kolejnych oknach transferowych
+    zawodnicy = models.Zawodnicy.__table__
+    with engine.begin() as conn:
+        conn.execute(
+            zawodnicy.update().where(zawodnicy.c.id_zawodnika == bindparam("b_id")).values(id_klubu=bindparam("b_klub")),
+            [{"b_id": w["id_zawodnika"], "b_klub": w["id_klubu"]} for w in gen.zawodnicy.values()]
+        )
+
+    with Session(engine) as db:
+        # liczniki Kluby ze wszystkich sezonow, jednym zgrupowanym zapytaniem
+        crud.sprawdz_liczniki_klubow(db, napraw=True)
+        liczniki["StatystykiSezonowe"] = crud.przebuduj_statystyki_sezonowe(db)
+    # dzialajace procesy API porzucaja dane w pamieci przy najblizszej wymianie wersji
+    cache.wersje.podbij(*cache.TAGI)
+    cache.wersje.synchronizuj(engine)
+
+    liczniki["Zawodnicy"] = len(gen.zawodnicy)
+    liczniki["Transfery"] = transfery_wszystkie
+    log(f"Gotowe w {time.perf_counter() - start:.1f} s: " + ", ".join(f"{t}={n}" for t, n in liczniki.items()))
+    return liczniki
+
+def main(argv=None):
+    from app.config import get_settings
+
+    parser = argparse.ArgumentParser(prog="python -m app.generator", description="Generator syntetycznych danych ligi")
+    parser.add_argument("--sezony", type=int, default=20, help="Liczba sezonow (domyslnie 20)")
+    parser.add_argument("--kluby", type=int, default=20, help="Liczba klubow (domyslnie 20)")
+    parser.add_argument("--seed", type=int, default=42, help="Ziarno generatora (domyslnie 42)")
+    parser.add_argument("--ostatni-sezon", type=int, default=2024, help="Rok startu ostatniego sezonu (domyslnie 2024)")
+    parser.add_argument("--database-url", help="Docelowa baza (domyslnie DATABASE_URL z ustawien)")
+    parser.add_argument("--wyczysc", action="store_true", help="Usun istniejace dane przed generowaniem")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url or get_settings().database_url)
+    generuj(engine, sezony=args.sezony, liczba_klubow=args.kluby, seed=args.seed,
+            ostatni_sezon=args.ostatni_sezon, wyczysc=args.wyczysc)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app import crud
+from app.config import get_settings
+from app.database import SessionLocal
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger("app.ingest")
+
+Klucz = Tuple[int, int]
+
+def _zablokuj(plik, czekaj: bool = False) -> bool:
+    """Wylaczna blokada otwartego pliku (zwalniana przy zamknieciu); False, gdy trzyma ja inny proces"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(plik.fileno(), fcntl.LOCK_EX | (0 if czekaj else fcntl.LOCK_NB))
+        else:
+            msvcrt.locking(plik.fileno(), msvcrt.LK_LOCK if czekaj else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+class KolejkaPelna(Exception):
+    """Kolejka nie zwolnila miejsca w czasie INGEST_PUT_TIMEOUT_S - klient powinien ponowic"""
+
+class KolejkaStatystyk:
+    """
+    Zapis z opoznieniem (write-behind) aktualizacji statystyk na zywo.
+    Przyjeta aktualizacja jest dopisywana do dziennika na dysku i trafia do ograniczonej
+    kolejki asyncio; watek zapisujacy scala aktualizacje po parze (id_zawodnika, id_meczu)
+    - pozniejsze pola nadpisuja wczesniejsze - i zapisuje je partiami przez
+    crud.create_statystyki_bulk(czesciowe=True), gdy uzbiera sie `rozmiar_partii` par
+    albo najstarsza czeka dluzej niz `interwal` sekund.
+
+    Dziennik jest dzielony na segmenty: przy kazdym zapisie partii biezacy segment jest
+    zamykany i usuwany dopiero po zatwierdzeniu partii w bazie, wiec po awarii procesu
+    na dysku zostaje wszystko, czego baza moze nie miec. Aktualizacje niosa wartosci
+    (nie przyrosty), wiec ponowne odtworzenie zapisanych juz wpisow niczego nie zmienia.
+
+    Katalog moze byc wspolny dla wielu procesow (workerow): kazdy pisze segmenty
+    ingest-<id procesu>-<numer>.log i usuwa tylko wlasne, a przez caly czas dzialania trzyma
+    wylaczna blokade pliku ingest-<id procesu>.lock. start() odtwarza segmenty tylko tych
+    procesow, ktorych blokade da sie przejac - czyli zakonczonych albo przerwanych.
+    """
+    def __init__(self, katalog: str, pojemnosc: int = 10000, rozmiar_partii: int = 500,
+                 interwal: float = 0.2, timeout: float = 1.0, fsync: bool = False):
+        self.katalog = katalog
+        self.pojemnosc = pojemnosc
+        self.rozmiar_partii = rozmiar_partii
+        self.interwal = interwal
+        self.timeout = timeout
+        self.fsync = fsync
+        self._kolejka: Optional[asyncio.Queue] = None
+        self._zadanie: Optional[asyncio.Task] = None
+        self._zapis: Optional[asyncio.Future] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._oczekujace: Dict[Klucz, dict] = {}
+        self._najstarsza: Optional[float] = None
+        self._segment = 0
+        self._dziennik = None
+        self._id: Optional[str] = None
+        self._blokada = None
+        self.statystyki = dict.fromkeys(
+            ("przyjete", "scalone", "odrzucone", "partie", "zapisane_wiersze", "bledy_wierszy", "bledy_zapisu"), 0
+        )
+
+    #dziennik
+    def _sciezka(self, numer: int, id_procesu: Optional[str] = None) -> str:
+        return os.path.join(self.katalog, f"ingest-{id_procesu or self._id}-{numer:08d}.log")
+
+    def _blokada_procesu(self, id_procesu: str) -> str:
+        return os.path.join(self.katalog, f"ingest-{id_procesu}.lock")
+
+    def _pliki(self, rozszerzenie: str) -> List[List[str]]:
+        """Nazwy ingest-*<rozszerzenie> rozbite na czesci: [id, numer] i [id] albo [numer] (stare segmenty)"""
+        if not os.path.isdir(self.katalog):
+            return []
+        return [
+            nazwa[7:-len(rozszerzenie)].split("-") for nazwa in os.listdir(self.katalog)
+            if nazwa.startswith("ingest-") and nazwa.endswith(rozszerzenie)
+        ]
+
+    def _usun_blokade(self, id_procesu: str):
+        try:
+            os.remove(self._blokada_procesu(id_procesu))
+        except FileNotFoundError:
+            # usunal ja juz proces zatrzymywany w tym samym czasie
+            pass
+
+    def _segmenty(self, id_procesu: Optional[str] = None) -> List[int]:
+        id_procesu = id_procesu or self._id
+        return sorted(int(czesci[1]) for czesci in self._pliki(".log") if len(czesci) == 2 and czesci[0] == id_procesu)
+
+    def _nowy_segment(self):
+        if self._dziennik is not None:
+            self._dziennik.close()
+        self._segment += 1
+        self._dziennik = open(self._sciezka(self._segment), "a", encoding="utf-8")
+
+    def _dopisz(self, aktualizacje: List[dict]):
+        self._dziennik.write("".join(json.dumps(a, ensure_ascii=False) + "\n" for a in aktualizacje))
+        self._dziennik.flush()
+        if self.fsync:
+            os.fsync(self._dziennik.fileno())
+
+    def _odtworz(self, segmenty: List[str]):
+        """Zapisuje do bazy aktualizacje z segmentow (sciezek) pozostalych po zakonczonym procesie"""
+        scalone: Dict[Klucz, dict] = {}
+        for sciezka in segmenty:
+            with open(sciezka, encoding="utf-8") as f:
+                for linia in f:
+                    try:
+                        a = json.loads(linia)
+                    except ValueError:
+                        # urwana ostatnia linia - proces przerwany w trakcie zapisu
+                        continue
+                    scalone.setdefault((a["id_zawodnika"], a["id_meczu"]), {}).update(a)
+        if scalone:
+            self._zapisz_do_bazy(list(scalone.values()))
+            logger.info("Odtworzono %d aktualizacji statystyk z dziennika", len(scalone))
+        for sciezka in segmenty:
+            os.remove(sciezka)
+
+    def _odtworz_osierocone(self):
+        """Odtwarza dzienniki procesow, ktore juz nie dzialaja, i usuwa je"""
+        with open(os.path.join(self.katalog, "ingest.lock"), "a") as katalog:
+            # cudze dzienniki przeglada jeden startujacy proces naraz
+            _zablokuj(katalog, czekaj=True)
+            for (id_procesu,) in (c for c in self._pliki(".lock") if len(c) == 1 and c[0] != self._id):
+                with open(self._blokada_procesu(id_procesu), "a") as blokada:
+                    if not _zablokuj(blokada):
+                        # wlasciciel dziala
+                        continue
+                    self._odtworz([self._sciezka(n, id_procesu) for n in self._segmenty(id_procesu)])
+                self._usun_blokade(id_procesu)
+            # segmenty bez id procesu (ingest-<numer>.log) - zapisane przed wprowadzeniem blokad
+            self._odtworz([
+                os.path.join(self.katalog, f"ingest-{czesci[0]}.log")
+                for czesci in sorted(self._pliki(".log")) if len(czesci) == 1 and czesci[0].isdigit()
+            ])
+
+    #cykl zycia
+    async def start(self):
+        if self._zadanie is not None:
+            return
+        self._start_lock = self._start_lock or asyncio.Lock()
+        async with self._start_lock:
+            if self._zadanie is not None:
+                return
+            os.makedirs(self.katalog, exist_ok=True)
+            self._id = os.urandom(4).hex()
+            self._blokada = open(self._blokada_procesu(self._id), "a")
+            _zablokuj(self._blokada)
+            await run_in_threadpool(self._odtworz_osierocone)
+            self._segment = 0
+            self._nowy_segment()
+            self._kolejka = asyncio.Queue(self.pojemnosc)
+            self._zadanie = asyncio.create_task(self._petla())
+
+    async def stop(self):
+        """Zapisuje wszystko, co czeka; niezapisane zostaje w dzienniku do odtworzenia"""
+        if self._zadanie is None:
+            return
+        self._zadanie.cancel()
+        try:
+            await self._zadanie
+        except asyncio.CancelledError:
+            pass
+        self._zadanie = None
+        if self._zapis is not None:
+            # przerwana petla nie przerywa zapisu partii w toku
+            await self._zapis
+        await self._zapisz_partie()
+        self._dziennik.close()
+        self._dziennik = None
+        # pusty ostatni segment jest usuwany; niezapisane zostaja do odtworzenia przez nastepny proces
+        zostalo = False
+        for numer in self._segmenty():
+            if os.path.getsize(self._sciezka(numer)):
+                zostalo = True
+            else:
+                os.remove(self._sciezka(numer))
+        self._blokada.close()
+        self._blokada = None
+        if not zostalo:
+            self._usun_blokade(self._id)
+
+    #przyjmowanie
+    async def przyjmij(self, aktualizacje: List[dict]):
+        """
+        Dopisuje zwalidowane aktualizacje do dziennika i kolejki. Gdy kolejka jest pelna,
+        czeka na miejsce najwyzej `timeout` sekund, a potem zglasza KolejkaPelna (backpressure).
+        """
+        await self.start()
+        start = time.monotonic()
+        while self._kolejka.maxsize - self._kolejka.qsize() < len(aktualizacje):
+            if len(aktualizacje) > self._kolejka.maxsize or time.monotonic() - start >= self.timeout:
+                self.statystyki["odrzucone"] += len(aktualizacje)
+                raise KolejkaPelna()
+            await asyncio.sleep(0.005)
+        # dziennik i kolejka bez await pomiedzy: zapis partii widzi wszystko, co jest w segmencie
+        self._dopisz(aktualizacje)
+        for a in aktualizacje:
+            self._kolejka.put_nowait(a)
+        self.statystyki["przyjete"] += len(aktualizacje)
+
+    def _scal(self, a: dict):
+        klucz = (a["id_zawodnika"], a["id_meczu"])
+        poprzednia = self._oczekujace.get(klucz)
+        if poprzednia is None:
+            self._oczekujace[klucz] = dict(a)
+            if self._najstarsza is None:
+                self._najstarsza = time.monotonic()
+        else:
+            poprzednia.update(a)
+            self.statystyki["scalone"] += 1
+
+    def _oproznij_kolejke(self):
+        while not self._kolejka.empty():
+            self._scal(self._kolejka.get_nowait())
+
+    #zapis
+    async def _petla(self):
+        while True:
+            czekaj = None if self._najstarsza is None else max(0.0, self._najstarsza + self.interwal - time.monotonic())
+            try:
+                self._scal(await asyncio.wait_for(self._kolejka.get(), czekaj))
+                self._oproznij_kolejke()
+            except asyncio.TimeoutError:
+                pass
+            if self._oczekujace and (
+                len(self._oczekujace) >= self.rozmiar_partii or time.monotonic() - self._najstarsza >= self.interwal
+            ):
+                self._zapis = asyncio.ensure_future(self._zapisz_partie())
+                await asyncio.shield(self._zapis)
+                self._zapis = None
+
+    async def _zapisz_partie(self):
+        # kolejka oprozniana do konca przed zamknieciem segmentu: partia obejmuje caly zamykany segment
+        self._oproznij_kolejke()
+        if not self._oczekujace:
+            return
+        partia, self._oczekujace, self._najstarsza = self._oczekujace, {}, None
+        zamkniete = [n for n in self._segmenty() if n <= self._segment]
+        self._nowy_segment()
+        try:
+            await run_in_threadpool(self._zapisz_do_bazy, list(partia.values()))
+        except Exception:
+            logger.exception("Zapis partii statystyk nie powiodl sie - ponowienie przy nastepnej partii")
+            self.statystyki["bledy_zapisu"] += 1
+            # starsze wartosci pod nowszymi, ktore przyszly w trakcie zapisu; segmenty zostaja na dysku
+            for klucz, a in partia.items():
+                self._oczekujace[klucz] = {**a, **self._oczekujace.get(klucz, {})}
+            self._najstarsza = time.monotonic()
+            await asyncio.sleep(self.interwal)
+            return
+        for numer in zamkniete:
+            os.remove(self._sciezka(numer))
+
+    def _zapisz_do_bazy(self, wiersze: List[dict]):
+        db = SessionLocal()
+        try:
+            wynik = crud.create_statystyki_bulk(db, wiersze, czesciowe=True)
+        finally:
+            db.close()
+        self.statystyki["partie"] += 1
+        self.statystyki["zapisane_wiersze"] += wynik["dodane"] + wynik["zaktualizowane"]
+        self.statystyki["bledy_wierszy"] += len(wynik["bledy"])
+        for blad in wynik["bledy"]:
+            logger.warning("Odrzucona aktualizacja statystyk %s: %s", wiersze[blad["indeks"]], blad["blad"])
+
+    def snapshot(self) -> dict:
+        return {
+            **self.statystyki,
+            "w_kolejce": self._kolejka.qsize() if self._kolejka is not None else 0,
+            "oczekujace": len(self._oczekujace)
+        }
+
+_settings = get_settings()
+kolejka_statystyk = KolejkaStatystyk(
+    _settings.ingest_log_dir,
+    pojemnosc=_settings.ingest_queue_size,
+    rozmiar_partii=_settings.ingest_batch_size,
+    interwal=_settings.ingest_flush_ms / 1000,
+    timeout=_settings.ingest_put_timeout_s,
+    fsync=_settings.ingest_fsync
+)
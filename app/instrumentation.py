@@ -0,0 +1,321 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger("app.sql")
+
+class LicznikZapytan:
+    """
+    Zbiera zapytania SQL wyslane przez silnik w obrebie bloku `with`.
+    Uzycie w testach:
+
+        with licz_zapytania(engine) as licznik:
+            client.get("/mecze/1")
+        assert licznik.liczba == 1, licznik.zapytania
+    """
+    def __init__(self):
+        self.zapytania: List[str] = []
+
+    @property
+    def liczba(self) -> int:
+        return len(self.zapytania)
+
+    def _zapisz(self, conn, cursor, statement, parameters, context, executemany):
+        self.zapytania.append(statement)
+
+@contextmanager
+def licz_zapytania(engine: Engine):
+    licznik = LicznikZapytan()
+    event.listen(engine, "before_cursor_execute", licznik._zapisz)
+    try:
+        yield licznik
+    finally:
+        event.remove(engine, "before_cursor_execute", licznik._zapisz)
+
+class KosztZadania:
+    """Koszt SQL jednego zadania HTTP, zbierany przez zdarzenia silnika i sesji"""
+    __slots__ = ("zapytania", "czas_db", "wiersze_zwrocone", "wiersze_zmienione", "najwolniejsze_czas", "najwolniejsze_sql")
+
+    def __init__(self):
+        self.zapytania = 0
+        self.czas_db = 0.0
+        self.wiersze_zwrocone = 0
+        self.wiersze_zmienione = 0
+        self.najwolniejsze_czas = 0.0
+        self.najwolniejsze_sql: Optional[str] = None
+
+    def dodaj(self, statement: str, czas: float, wiersze_zmienione: int):
+        self.zapytania += 1
+        self.czas_db += czas
+        self.wiersze_zmienione += wiersze_zmienione
+        if czas >= self.najwolniejsze_czas:
+            self.najwolniejsze_czas = czas
+            self.najwolniejsze_sql = statement
+
+    def zwrocono(self, wiersze: int):
+        self.wiersze_zwrocone += wiersze
+
+_biezace_zadanie: ContextVar[Optional[KosztZadania]] = ContextVar("koszt_zadania", default=None)
+
+class MetrykiSQL:
+    """Agregaty kosztu SQL per trasa (szablon sciezki, np. /mecze/{mecz_id})"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._trasy: Dict[str, dict] = {}
+
+    def zapisz(self, trasa: str, koszt: KosztZadania):
+        with self._lock:
+            m = self._trasy.get(trasa)
+            if m is None:
+                m = self._trasy[trasa] = {
+                    "zadania": 0, "zapytania": 0, "maks_zapytan": 0, "czas_db_ms": 0.0,
+                    "wiersze_zwrocone": 0, "maks_wierszy": 0, "wiersze_zmienione": 0,
+                    "najwolniejsze_ms": 0.0, "najwolniejsze_sql": None
+                }
+            m["zadania"] += 1
+            m["zapytania"] += koszt.zapytania
+            m["maks_zapytan"] = max(m["maks_zapytan"], koszt.zapytania)
+            m["czas_db_ms"] += koszt.czas_db * 1000
+            m["wiersze_zwrocone"] += koszt.wiersze_zwrocone
+            m["maks_wierszy"] = max(m["maks_wierszy"], koszt.wiersze_zwrocone)
+            m["wiersze_zmienione"] += koszt.wiersze_zmienione
+            if koszt.najwolniejsze_czas * 1000 >= m["najwolniejsze_ms"] and koszt.najwolniejsze_sql:
+                m["najwolniejsze_ms"] = koszt.najwolniejsze_czas * 1000
+                m["najwolniejsze_sql"] = koszt.najwolniejsze_sql
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            wynik = {}
+            for trasa, m in sorted(self._trasy.items()):
+                wynik[trasa] = {
+                    **m,
+                    "czas_db_ms": round(m["czas_db_ms"], 3),
+                    "najwolniejsze_ms": round(m["najwolniejsze_ms"], 3),
+                    "srednio_zapytan": round(m["zapytania"] / m["zadania"], 2),
+                    "srednio_wierszy": round(m["wiersze_zwrocone"] / m["zadania"], 2),
+                    "srednio_czas_db_ms": round(m["czas_db_ms"] / m["zadania"], 3)
+                }
+            return wynik
+
+    def reset(self):
+        with self._lock:
+            self._trasy.clear()
+
+metryki_sql = MetrykiSQL()
+
+def instrumentuj(engine: Engine, slow_query_ms: float = 0):
+    """
+    Podpina pomiar czasu zapytan pod zdarzenia silnika. Koszt trafia do biezacego
+    zadania HTTP (jesli jest), a zapytania wolniejsze niz slow_query_ms sa logowane.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("czas_startu", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _koniec(conn, cursor, statement, parameters, context, executemany):
+        czas = time.perf_counter() - conn.info["czas_startu"].pop()
+        koszt = _biezace_zadanie.get()
+        if koszt is not None:
+            # rowcount jest wiarygodny tylko dla INSERT/UPDATE/DELETE - dla SELECT sterowniki
+            # zwracaja -1 (SQLite, kursory strumieniowe) albo liczbe zaleznie od buforowania
+            zmienione = max(cursor.rowcount, 0) if context is not None and (context.isinsert or context.isupdate or context.isdelete) else 0
+            koszt.dodaj(statement, czas, zmienione)
+        if slow_query_ms and czas * 1000 >= slow_query_ms:
+            logger.warning("Wolne zapytanie (%.1f ms): %s", czas * 1000, " ".join(statement.split()))
+
+    @event.listens_for(engine, "handle_error")
+    def _blad(context):
+        if context.connection is not None:
+            stos = context.connection.info.get("czas_startu")
+            if stos:
+                stos.pop()
+
+def zwrocono(wiersze: int):
+    """Dolicza do biezacego zadania wiersze odczytane strumieniowo (poza instrumentuj_sesje)"""
+    koszt = _biezace_zadanie.get()
+    if koszt is not None:
+        koszt.zwrocono(wiersze)
+
+def instrumentuj_sesje(klasa_sesji):
+    """
+    Liczy wiersze zwracane przez odczyty sesji (execute, scalars, query, leniwe ladowanie relacji)
+    do kosztu biezacego zadania. Kursor nie mowi, ile wierszy z niego pobrano, wiec wynik jest
+    buforowany (freeze) i liczony, zanim trafi do wywolujacego. Wyniki strumieniowane (yield_per,
+    stream_results) nie sa buforowane - ich konsument dolicza wiersze przez zwrocono().
+    """
+    @event.listens_for(klasa_sesji, "do_orm_execute")
+    def _wiersze(stan):
+        koszt = _biezace_zadanie.get()
+        if koszt is None or not stan.is_select:
+            return None
+        opcje = stan.execution_options
+        if opcje.get("yield_per") or opcje.get("stream_results"):
+            return None
+        wynik = stan.invoke_statement().freeze()
+        koszt.zwrocono(len(wynik.data))
+        return wynik()
+
+#progi histogramu czasu pobrania polaczenia z puli (ms); ostatni kubelek to wszystko powyzej
+PROGI_CZEKANIA_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+class StatystykiPuli:
+    """
+    Telemetria puli polaczen jednego silnika: liczniki ze zdarzen puli (polaczenia, wydania,
+    zwroty, uniewaznienia, nieudane pingi) i histogram czasu pobrania polaczenia
+    (czekanie na wolne polaczenie + ewentualne otwarcie nowego), razem z przekroczeniami pool_timeout
+    """
+    def __init__(self, engine: Engine, nazwa: str):
+        self.engine = engine
+        self.nazwa = nazwa
+        self._lock = threading.Lock()
+        self.liczniki = {"polaczenia": 0, "wydania": 0, "zwroty": 0, "uniewaznienia": 0, "nieudane_pingi": 0,
+                         "timeouty": 0}
+        self._kubelki = [0] * (len(PROGI_CZEKANIA_MS) + 1)
+        self._czekanie_suma = 0.0
+        self._czekanie_maks = 0.0
+
+    def zlicz(self, licznik: str):
+        with self._lock:
+            self.liczniki[licznik] += 1
+
+    def czekanie(self, czas: float, timeout: bool = False):
+        ms = czas * 1000
+        i = next((i for i, prog in enumerate(PROGI_CZEKANIA_MS) if ms <= prog), len(PROGI_CZEKANIA_MS))
+        with self._lock:
+            self._kubelki[i] += 1
+            self._czekanie_suma += ms
+            self._czekanie_maks = max(self._czekanie_maks, ms)
+            if timeout:
+                self.liczniki["timeouty"] += 1
+
+    def snapshot(self) -> dict:
+        pula = self.engine.pool
+        with self._lock:
+            pobrania = sum(self._kubelki)
+            wynik = {
+                "pula": type(pula).__name__,
+                **self.liczniki,
+                "wydane_teraz": self.liczniki["wydania"] - self.liczniki["zwroty"],
+                "czekanie_ms": {
+                    "pobrania": pobrania,
+                    "srednio": round(self._czekanie_suma / pobrania, 3) if pobrania else 0.0,
+                    "maks": round(self._czekanie_maks, 3),
+                    "histogram": {
+                        **{f"<={prog}": n for prog, n in zip(PROGI_CZEKANIA_MS, self._kubelki)},
+                        f">{PROGI_CZEKANIA_MS[-1]}": self._kubelki[-1]
+                    }
+                }
+            }
+        if isinstance(pula, QueuePool):
+            wynik.update(
+                rozmiar=pula.size(), wydane_teraz=pula.checkedout(), wolne=pula.checkedin(),
+                overflow=max(pula.overflow(), 0), maks_overflow=pula._max_overflow, timeout_s=pula.timeout(),
+                maks_polaczen=pula.size() + max(pula._max_overflow, 0)
+            )
+        return wynik
+
+class _PomiarPobrania:
+    """Domieszka do QueuePool: mierzy czas pobrania polaczenia (_do_get) dla StatystykiPuli"""
+    statystyki: Optional[StatystykiPuli] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            polaczenie = super()._do_get()
+        except exc.TimeoutError:
+            if self.statystyki is not None:
+                self.statystyki.czekanie(time.perf_counter() - start, timeout=True)
+            raise
+        if self.statystyki is not None:
+            self.statystyki.czekanie(time.perf_counter() - start)
+        return polaczenie
+
+    def recreate(self):
+        pula = super().recreate()
+        pula.statystyki = self.statystyki
+        return pula
+
+class PulaZPomiarem(_PomiarPobrania, QueuePool):
+    pass
+
+class PulaAsyncZPomiarem(_PomiarPobrania, AsyncAdaptedQueuePool):
+    pass
+
+#telemetria wszystkich pul procesu (baza glowna, async, repliki) dla GET /health/db
+pule: Dict[str, StatystykiPuli] = {}
+
+def _ping(dbapi_connection):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    finally:
+        cursor.close()
+
+def instrumentuj_pule(engine: Engine, nazwa: str, pre_ping: str = "always", pre_ping_idle_s: float = 30):
+    """
+    Podpina telemetrie pod zdarzenia puli silnika (dla async - pod engine.sync_engine).
+    pre_ping="idle" sprawdza polaczenie przy wydaniu tylko, gdy lezalo w puli dluzej niz
+    pre_ping_idle_s sekund (zamiast pool_pre_ping przy kazdym wydaniu); zerwane polaczenie
+    jest wtedy zastepowane nowym, jak przy pool_pre_ping.
+    """
+    statystyki = pule[nazwa] = StatystykiPuli(engine, nazwa)
+    if isinstance(engine.pool, _PomiarPobrania):
+        engine.pool.statystyki = statystyki
+
+    @event.listens_for(engine, "connect")
+    def _polaczenie(dbapi_connection, connection_record):
+        statystyki.zlicz("polaczenia")
+
+    @event.listens_for(engine, "checkout")
+    def _wydanie(dbapi_connection, connection_record, connection_proxy):
+        oddane = connection_record.info.get("oddane")
+        if pre_ping == "idle" and oddane is not None and time.monotonic() - oddane > pre_ping_idle_s:
+            try:
+                _ping(dbapi_connection)
+            except Exception:
+                statystyki.zlicz("nieudane_pingi")
+                #pula zamknie to polaczenie i sprobuje wydac inne
+                raise exc.DisconnectionError()
+        statystyki.zlicz("wydania")
+
+    @event.listens_for(engine, "checkin")
+    def _zwrot(dbapi_connection, connection_record):
+        connection_record.info["oddane"] = time.monotonic()
+        statystyki.zlicz("zwroty")
+
+    @event.listens_for(engine, "invalidate")
+    def _uniewaznienie(dbapi_connection, connection_record, exception):
+        statystyki.zlicz("uniewaznienia")
+
+    return statystyki
+
+class SQLMetricsMiddleware:
+    """
+    Middleware ASGI: otwiera licznik kosztu SQL na czas zadania i po odpowiedzi
+    zapisuje go pod szablonem trasy w metryki_sql
+    """
+    def __init__(self, app, metryki: MetrykiSQL = metryki_sql):
+        self.app = app
+        self.metryki = metryki
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        koszt = KosztZadania()
+        token = _biezace_zadanie.set(koszt)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _biezace_zadanie.reset(token)
+            trasa = scope.get("route")
+            sciezka = getattr(trasa, "path", None) or "(nieznana trasa)"
+            self.metryki.zapisz(f"{scope['method']} {sciezka}", koszt)
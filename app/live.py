@@ -0,0 +1,174 @@
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import AsyncIterator, Iterable, Optional, Set
+import orjson
+from app.config import get_settings
+
+# typy zdarzen: mecz (nowy wynik lub korekta), tabela (zmienione liczniki klubow - tabela i forma),
+# statystyki (wiersze statystyk zawodnikow), transfer
+TYPY = ("mecz", "tabela", "statystyki", "transfer")
+
+class _Zdarzenie:
+    __slots__ = ("id", "typ", "kluby", "ramka")
+
+    def __init__(self, id_zdarzenia: int, typ: str, kluby: frozenset, ramka: bytes):
+        self.id = id_zdarzenia
+        self.typ = typ
+        self.kluby = kluby
+        self.ramka = ramka
+
+# ostatnia ramka dla odrzuconego subskrybenta: klient pobiera stan od nowa i laczy sie ponownie
+RESET = b"event: reset\ndata: {}\n\n"
+
+class Subskrybent:
+    def __init__(self, typy: frozenset, klub_id: Optional[int], bufor: int, ostatnie_id: int):
+        self.typy = typy
+        self.klub_id = klub_id
+        self.kolejka: asyncio.Queue = asyncio.Queue(bufor)
+        self.ostatnie_id = ostatnie_id
+
+    def chce(self, z: _Zdarzenie) -> bool:
+        return z.id > self.ostatnie_id and z.typ in self.typy and (self.klub_id is None or self.klub_id in z.kluby)
+
+class KanalNaZywo:
+    """
+    Pub/sub w pamieci procesu dla GET /live/stream (Server-Sent Events).
+    crud po zatwierdzeniu zapisu wola opublikuj() - z dowolnego watku: zdarzenie jest raz
+    kodowane do gotowej ramki SSE, a rozsylka do subskrybentow odbywa sie w petli zdarzen
+    (call_soon_threadsafe), wiec zapis nie czeka na klientow.
+    Kazdy subskrybent ma ograniczony bufor; kto go zapelni (wolny klient), dostaje ramke reset
+    i zostaje rozlaczony zamiast spowalniac pozostalych albo zuzywac pamiec.
+    Ostatnie `historia` zdarzen sluzy do wznowienia po Last-Event-ID (ponowne polaczenie EventSource).
+    Zdarzenia sa lokalne dla procesu - kazdy worker rozsyla zapisy, ktore sam wykonal.
+    """
+    def __init__(self, bufor: int = 256, historia: int = 1000, heartbeat: float = 15,
+                 maks_subskrybentow: int = 10000):
+        self.bufor = bufor
+        self.heartbeat = heartbeat
+        self.maks_subskrybentow = maks_subskrybentow
+        self._lock = threading.Lock()
+        self._petla: Optional[asyncio.AbstractEventLoop] = None
+        self._subskrybenci: Set[Subskrybent] = set()
+        self._historia: deque = deque(maxlen=historia)
+        self._ostatnie_id = 0
+        # id zdarzen "<epoka>:<numer>": Last-Event-ID z innego procesu (restart, inny worker) daje reset
+        self.epoka = os.urandom(4).hex().encode()
+        self.statystyki = dict.fromkeys(("opublikowane", "dostarczone", "odrzuceni"), 0)
+
+    def opublikuj(self, typ: str, dane: dict, kluby: Iterable[int] = ()):
+        """Wywolywane po commit; bez subskrybentow koszt to tylko zakodowanie zdarzenia do historii"""
+        with self._lock:
+            self._ostatnie_id += 1
+            z = _Zdarzenie(
+                self._ostatnie_id, typ, frozenset(kluby),
+                b"id: %s:%d\nevent: %s\ndata: %s\n\n" % (
+                    self.epoka, self._ostatnie_id, typ.encode(), orjson.dumps(dane, default=str)
+                )
+            )
+            self._historia.append(z)
+            self.statystyki["opublikowane"] += 1
+            petla = self._petla if self._subskrybenci else None
+        if petla is not None:
+            try:
+                petla.call_soon_threadsafe(self._rozeslij, z)
+            except RuntimeError:
+                # petla zamknieta (koniec procesu)
+                pass
+
+    def _rozeslij(self, z: _Zdarzenie):
+        for s in list(self._subskrybenci):
+            if not s.chce(z):
+                continue
+            try:
+                s.kolejka.put_nowait(z.ramka)
+            except asyncio.QueueFull:
+                self._odrzuc(s)
+                continue
+            s.ostatnie_id = z.id
+            self.statystyki["dostarczone"] += 1
+
+    def _odrzuc(self, s: Subskrybent):
+        self.odlacz(s)
+        self.statystyki["odrzuceni"] += 1
+        while not s.kolejka.empty():
+            s.kolejka.get_nowait()
+        s.kolejka.put_nowait(RESET)
+
+    def _numer(self, last_event_id: str) -> Optional[int]:
+        epoka, _, numer = last_event_id.encode().partition(b":")
+        return int(numer) if epoka == self.epoka and numer.isdigit() else None
+
+    def podlacz(self, typy: Iterable[str] = TYPY, klub_id: Optional[int] = None,
+                last_event_id: Optional[str] = None) -> Optional[Subskrybent]:
+        """
+        Nowy subskrybent (w petli zdarzen); None, gdy osiagnieto maks_subskrybentow.
+        Z last_event_id bufor startuje od zdarzen z historii po tym id - albo od ramki reset,
+        gdy czesc z nich wypadla juz z historii lub id pochodzi z innego procesu.
+        """
+        with self._lock:
+            if len(self._subskrybenci) >= self.maks_subskrybentow:
+                return None
+            self._petla = asyncio.get_running_loop()
+            s = Subskrybent(frozenset(typy), klub_id, self.bufor, self._ostatnie_id)
+            ostatnie_id = None if last_event_id is None else self._numer(last_event_id)
+            if last_event_id is not None and (ostatnie_id is None or ostatnie_id > self._ostatnie_id):
+                s.kolejka.put_nowait(RESET)
+                return s
+            if ostatnie_id is not None and ostatnie_id < self._ostatnie_id:
+                zalegle = [z for z in self._historia if z.id > ostatnie_id]
+                if not zalegle or zalegle[0].id != ostatnie_id + 1:
+                    s.kolejka.put_nowait(RESET)
+                    return s
+                s.ostatnie_id = ostatnie_id
+                for z in zalegle:
+                    if s.chce(z):
+                        if s.kolejka.full():
+                            s.kolejka.get_nowait()
+                            s.kolejka.put_nowait(RESET)
+                            return s
+                        s.kolejka.put_nowait(z.ramka)
+                s.ostatnie_id = self._ostatnie_id
+            # zdarzenia z historii moga jeszcze czekac na _rozeslij - chce() pomija je po ostatnie_id
+            self._subskrybenci.add(s)
+        return s
+
+    def odlacz(self, s: Subskrybent):
+        with self._lock:
+            self._subskrybenci.discard(s)
+
+    async def strumien(self, s: Subskrybent) -> AsyncIterator[bytes]:
+        """
+        Ramki SSE subskrybenta; co `heartbeat` sekund bez zdarzen komentarz ": ping",
+        ktory utrzymuje polaczenie przez proxy i pozwala wykryc rozlaczonego klienta.
+        Kilka zdarzen czekajacych w buforze wychodzi jednym zapisem do gniazda.
+        """
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    ramka = await asyncio.wait_for(s.kolejka.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                ramki = [ramka]
+                while ramka is not RESET and not s.kolejka.empty():
+                    ramka = s.kolejka.get_nowait()
+                    ramki.append(ramka)
+                yield b"".join(ramki)
+                if ramka is RESET:
+                    return
+        finally:
+            self.odlacz(s)
+
+    def snapshot(self) -> dict:
+        return {**self.statystyki, "subskrybenci": len(self._subskrybenci), "ostatnie_id": self._ostatnie_id}
+
+_settings = get_settings()
+kanal = KanalNaZywo(
+    bufor=_settings.live_buffer,
+    historia=_settings.live_history,
+    heartbeat=_settings.live_heartbeat_s,
+    maks_subskrybentow=_settings.live_max_subscribers
+)
@@ -0,0 +1,63 @@
+"""
+Polecenia serwisowe uruchamiane z linii komend, np.:
+
+    python -m app.maintenance przebuduj-statystyki --sezon 2024/25
+    python -m app.maintenance sprawdz-liczniki --sezon 2024/25 --napraw
+"""
+import argparse
+import sys
+import time
+from app import cache, crud
+from app.database import SessionLocal, engine
+
+def przebuduj_statystyki(args):
+    db = SessionLocal()
+    try:
+        wiersze = crud.przebuduj_statystyki_sezonowe(db, sezon=args.sezon)
+    finally:
+        db.close()
+    zakres = f"sezonu {args.sezon}" if args.sezon else "wszystkich sezonów"
+    print(f"Przebudowano StatystykiSezonowe dla {zakres}: {wiersze} wierszy")
+
+def sprawdz_liczniki(args):
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        wynik = crud.sprawdz_liczniki_klubow(db, sezon=args.sezon, napraw=args.napraw)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        db.close()
+    czas = time.perf_counter() - start
+    
+    zakres = f"sezonu {args.sezon}" if args.sezon else "wszystkich meczów"
+    for r in wynik["rozbieznosci"]:
+        pola = ", ".join(f"{licznik} {p['zapisane']} -> {p['wyliczone']}" for licznik, p in r["pola"].items())
+        print(f"{r['id_klubu']:5} {r['nazwa_klubu']:30} {pola}")
+    print(f"Sprawdzono {wynik['sprawdzone_kluby']} klubów względem {zakres} w {czas:.2f} s: "
+          f"{len(wynik['rozbieznosci'])} z rozbieżnościami" + (", naprawiono" if wynik["naprawione"] else ""))
+    # kod 1 - rozbieznosci zostaly w bazie (do uzycia w cronie / CI)
+    return 1 if wynik["rozbieznosci"] and not wynik["naprawione"] else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance", description="Polecenia serwisowe bazy Premier League")
+    polecenia = parser.add_subparsers(dest="polecenie", required=True)
+    
+    statystyki = polecenia.add_parser("przebuduj-statystyki", help="Odtwarza agregat StatystykiSezonowe z StatystykiIndywidualne")
+    statystyki.add_argument("--sezon", help="Przebuduj tylko wskazany sezon, np. 2024/25")
+    statystyki.set_defaults(func=przebuduj_statystyki)
+    
+    liczniki = polecenia.add_parser("sprawdz-liczniki", help="Porównuje liczniki Kluby z wyliczonymi z Mecze")
+    liczniki.add_argument("--sezon", help="Tylko dla bazy z meczami jednego sezonu, np. 2024/25 (domyślnie wszystkie mecze)")
+    liczniki.add_argument("--napraw", action="store_true", help="Zapisz wyliczone wartości w Kluby")
+    liczniki.set_defaults(func=sprawdz_liczniki)
+    
+    args = parser.parse_args(argv)
+    kod = args.func(args)
+    # zmiany trafiaja do WersjeDanych - dzialajace API uniewaznia cache po najblizszej wymianie wersji
+    cache.wersje.synchronizuj(engine)
+    return kod
+
+if __name__ == "__main__":
+    sys.exit(main())
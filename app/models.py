@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, DECIMAL, ForeignKey, Enum, CheckConstraint
+from sqlalchemy import BigInteger, Column, Integer, String, Date, DateTime, Boolean, DECIMAL, ForeignKey, Enum, CheckConstraint, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.database import Base
 import enum
@@ -129,9 +129,28 @@ class StatystykiIndywidualne(Base):
     czyste_konto = Column(Boolean, default=False)
     minuty_rozegrane = Column(Integer, default=0)
     
+    __table_args__ = (
+        UniqueConstraint('id_zawodnika', 'id_meczu', name='unique_player_match'),
+    )
+    
     zawodnik = relationship("Zawodnicy", back_populates="statystyki")
     mecz = relationship("Mecze", back_populates="statystyki")
 
+class StatystykiSezonowe(Base):
+    __tablename__ = "StatystykiSezonowe"
+    
+    id_zawodnika = Column(Integer, ForeignKey("Zawodnicy.id_zawodnika", ondelete="CASCADE"), primary_key=True)
+    sezon = Column(String(20), primary_key=True)
+    wystepy = Column(Integer, nullable=False, default=0)
+    gole = Column(Integer, nullable=False, default=0)
+    asysty = Column(Integer, nullable=False, default=0)
+    minuty_rozegrane = Column(Integer, nullable=False, default=0)
+    zolte_kartki = Column(Integer, nullable=False, default=0)
+    czerwone_kartki = Column(Integer, nullable=False, default=0)
+    czyste_konta = Column(Integer, nullable=False, default=0)
+    
+    zawodnik = relationship("Zawodnicy")
+
 class Transfery(Base):
     __tablename__ = "Transfery"
     
@@ -145,4 +164,10 @@ class Transfery(Base):
     
     zawodnik = relationship("Zawodnicy", back_populates="transfery")
     klub_z = relationship("Kluby", foreign_keys=[id_klubu_z])
-    klub_do = relationship("Kluby", foreign_keys=[id_klubu_do])
\ No newline at end of file
+    klub_do = relationship("Kluby", foreign_keys=[id_klubu_do])
+
+class WersjeDanych(Base):
+    __tablename__ = "WersjeDanych"
+    
+    tag = Column(String(30), primary_key=True)
+    wersja = Column(BigInteger, nullable=False, default=0)
\ No newline at end of file
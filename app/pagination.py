@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+DOMYSLNY_ROZMIAR_STRONY = 100
+MAKS_ROZMIAR_STRONY = 1000
+
+def encode_cursor(*wartosci) -> str:
+    """
+    Koduje klucz ostatniego elementu strony jako nieprzezroczysty kursor
+    """
+    dane = [w.isoformat() if isinstance(w, datetime) else w for w in wartosci]
+    return base64.urlsafe_b64encode(json.dumps(dane, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(kursor: str, *typy) -> tuple:
+    """
+    Odwraca encode_cursor; typy wskazuja oczekiwany typ kazdej skladowej klucza.
+    Niepoprawny kursor konczy sie ValueError.
+    """
+    try:
+        dane = json.loads(base64.urlsafe_b64decode(kursor + "=" * (-len(kursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Nieprawidłowy kursor") from e
+    
+    if not isinstance(dane, list) or len(dane) != len(typy):
+        raise ValueError("Nieprawidłowy kursor")
+    
+    wynik = []
+    for wartosc, typ in zip(dane, typy):
+        if typ is datetime and isinstance(wartosc, str):
+            wynik.append(datetime.fromisoformat(wartosc))
+        elif typ is int and isinstance(wartosc, int) and not isinstance(wartosc, bool):
+            wynik.append(wartosc)
+        else:
+            raise ValueError("Nieprawidłowy kursor")
+    return tuple(wynik)
+
+def paginate(wiersze: list, limit: int, klucz: Callable) -> Tuple[List, Optional[str]]:
+    """
+    Przycina wynik zapytania pobrany z limitem limit + 1 do jednej strony
+    i zwraca kursor nastepnej strony (albo None, gdy to ostatnia strona)
+    """
+    if len(wiersze) <= limit:
+        return wiersze, None
+    strona = wiersze[:limit]
+    return strona, encode_cursor(*klucz(strona[-1]))
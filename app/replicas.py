@@ -0,0 +1,135 @@
+import itertools
+import logging
+import threading
+import time
+from typing import List, Optional
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger("app.replicas")
+
+class Replika:
+    """Silnik repliki (i jego odpowiednik async) ze stanem ostatniego sprawdzenia"""
+    def __init__(self, engine: Engine, async_engine=None):
+        self.engine = engine
+        self.async_engine = async_engine
+        self.zdrowa = True
+        self.blad: Optional[str] = None
+        for silnik in filter(None, (engine, async_engine and async_engine.sync_engine)):
+            event.listen(silnik, "handle_error", self._blad_polaczenia)
+
+    @property
+    def nazwa(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def _blad_polaczenia(self, context):
+        # zerwane polaczenie w trakcie zadania - replika wraca do puli po udanym sprawdzeniu
+        if context.is_disconnect:
+            self.oznacz(False, str(context.original_exception))
+
+    def oznacz(self, zdrowa: bool, blad: Optional[str] = None):
+        if zdrowa != self.zdrowa:
+            logger.warning("replika %s: %s", self.nazwa, "dostępna" if zdrowa else f"niedostępna ({blad})")
+        self.zdrowa = zdrowa
+        self.blad = blad
+
+    def sprawdz(self):
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception as e:
+            self.oznacz(False, str(e))
+        else:
+            self.oznacz(True)
+
+class PulaReplik:
+    """
+    Repliki do odczytu wybierane po kolei (round-robin) z pominieciem niedostepnych.
+    Niedostepnosc wykrywa watek sprawdzajacy (SELECT 1 co `interwal` sekund) oraz bledy
+    polaczen zgloszone przez silnik repliki w trakcie zadania.
+    Przez `okno_po_zapisie` sekund od zatwierdzenia zapisu wszystkie odczyty ida do bazy
+    glownej - replika moze jeszcze nie miec zapisu, a odczyty zasilaja tez cache w pamieci procesu.
+    """
+    def __init__(self):
+        self.repliki: List[Replika] = []
+        self.okno_po_zapisie = 0.0
+        self._licznik = itertools.count()
+        self._ostatni_zapis = float("-inf")
+        self._stop = threading.Event()
+        self._watek: Optional[threading.Thread] = None
+
+    def dodaj(self, engine: Engine, async_engine=None):
+        self.repliki.append(Replika(engine, async_engine))
+
+    def wybierz(self) -> Optional[Replika]:
+        """Nastepna dostepna replika albo None (czytamy z bazy glownej)"""
+        n = len(self.repliki)
+        if not n or self.po_zapisie():
+            return None
+        start = next(self._licznik)
+        for i in range(n):
+            replika = self.repliki[(start + i) % n]
+            if replika.zdrowa:
+                return replika
+        return None
+
+    def zapisano(self):
+        self._ostatni_zapis = time.monotonic()
+
+    def po_zapisie(self) -> bool:
+        return time.monotonic() - self._ostatni_zapis < self.okno_po_zapisie
+
+    def start(self, interwal: float):
+        if not self.repliki or self._watek is not None:
+            return
+        self._stop.clear()
+        self._watek = threading.Thread(target=self._sprawdzaj, args=(interwal,), name="repliki", daemon=True)
+        self._watek.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watek is not None:
+            self._watek.join()
+            self._watek = None
+
+    def _sprawdzaj(self, interwal: float):
+        while True:
+            for replika in self.repliki:
+                replika.sprawdz()
+            if self._stop.wait(interwal):
+                return
+
+    def stan(self) -> List[dict]:
+        return [{"replika": r.nazwa, "zdrowa": r.zdrowa, "blad": r.blad} for r in self.repliki]
+
+pula = PulaReplik()
+
+class SesjaRoutingu(Session):
+    """
+    Sesja, ktora kieruje zapytania do repliki albo bazy glownej (bind sesjomakera).
+    Do repliki trafiaja tylko sesje odczytu (info["odczyt"] = "sync" albo "async"), i to
+    dopoki sesja niczego nie zapisala. Replika jest wybierana raz na sesje, zeby jedno zadanie
+    widzialo spojny stan jednej bazy.
+    """
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["zapis"] = True
+        tryb = self.info.get("odczyt")
+        if not tryb or self.info.get("zapis"):
+            return super().get_bind(mapper, clause=clause, **kw)
+        bind = self.info.get("bind")
+        if bind is None:
+            replika = pula.wybierz()
+            if replika is None:
+                bind = super().get_bind(mapper, clause=clause, **kw)
+            else:
+                bind = replika.engine if tryb == "sync" else replika.async_engine.sync_engine
+            self.info["bind"] = bind
+        return bind
+
+@event.listens_for(SesjaRoutingu, "after_commit")
+def _po_zatwierdzeniu(session):
+    if session.info.pop("zapis", False):
+        pula.zapisano()
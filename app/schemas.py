@@ -82,6 +82,31 @@ class KlubDetale(Klub):
     stadion: Optional[Stadion] = None
     menedzer: Optional[Menedzer] = None
 
+#tabele historyczne
+class PozycjaTabeli(BaseModel):
+    pozycja: int
+    id_klubu: int
+    nazwa_klubu: str
+    punkty: int
+    mecze_rozegrane: int
+    wygrane: int
+    remisy: int
+    przegrane: int
+    bramki_strzelone: int
+    bramki_stracone: int
+    roznica_bramek: int
+
+class PozycjeKlubu(BaseModel):
+    id_klubu: int
+    nazwa_klubu: str
+    pozycje: List[int]
+    punkty: List[int]
+
+class PozycjeWCzasie(BaseModel):
+    sezon: str
+    kolejki: List[int]
+    kluby: List[PozycjeKlubu]
+
 #zawodnicy
 class ZawodnikBase(BaseModel):
     imie: str
@@ -136,9 +161,23 @@ class MeczCreate(MeczBase):
             raise ValueError('Klub nie może grać sam ze sobą')
         return v
 
+class BladWiersza(BaseModel):
+    indeks: int
+    blad: str
+
+class MeczeBulkWynik(BaseModel):
+    dodane: int
+    bledy: List[BladWiersza] = []
+
 class MeczUpdate(BaseModel):
     bramki_gospodarze: int
     bramki_goscie: int
+    
+    @validator('bramki_gospodarze', 'bramki_goscie')
+    def validate_bramki(cls, v):
+        if v < 0:
+            raise ValueError('Liczba bramek nie może być ujemna')
+        return v
 
 class Mecz(MeczBase):
     id_meczu: int
@@ -174,6 +213,18 @@ class StatystykiIndywidualneCreate(StatystykiIndywidualneBase):
             raise ValueError('Wartość nie może być ujemna')
         return v
 
+class StatystykiBulkWynik(BaseModel):
+    dodane: int
+    zaktualizowane: int
+    bez_zmian: int
+    #status kazdego wiersza w kolejnosci zadania: dodany / zaktualizowany / bez_zmian / blad
+    statusy: List[str]
+    bledy: List[BladWiersza] = []
+
+class StatystykiLiveWynik(BaseModel):
+    przyjete: int
+    bledy: List[BladWiersza] = []
+
 class StatystykiIndywidualne(StatystykiIndywidualneBase):
     id_statystyki: int
     
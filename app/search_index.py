@@ -0,0 +1,193 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from app import cache
+
+# litery, ktore nie rozkladaja sie w NFKD na litere bazowa i znak diakrytyczny
+_LITERY_ZLOZONE = str.maketrans({
+    "ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "đ": "d", "Đ": "D", "ð": "d", "Ð": "D",
+    "æ": "ae", "Æ": "AE", "œ": "oe", "Œ": "OE", "ß": "ss", "þ": "th", "Þ": "TH", "ı": "i"
+})
+_SEPARATORY = re.compile(r"[^\w]+")
+
+def normalizuj(tekst: str) -> str:
+    """
+    Sprowadza tekst do postaci bez znakow diakrytycznych i bez wielkosci liter
+    ("Łukasz Fabiański" -> "lukasz fabianski")
+    """
+    tekst = unicodedata.normalize("NFKD", tekst.translate(_LITERY_ZLOZONE))
+    return "".join(z for z in tekst if not unicodedata.combining(z)).casefold()
+
+def _tokeny(tekst: str) -> List[str]:
+    return [t for t in _SEPARATORY.split(normalizuj(tekst)) if t]
+
+def _trigramy(token: str) -> Set[str]:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+class IndeksZawodnikow:
+    """
+    Indeks nazwisk zawodnikow w pamieci procesu: posortowana lista tokenow do wyszukiwania
+    po prefiksie oraz indeks trigramow do dopasowan w srodku slowa.
+    Wyniki sa rangowane: cale slowo > prefiks > fragment.
+    Zmiany zawodnikow w innych procesach (wymiana wersji w cache.wersje) oznaczaja indeks
+    jako niezaladowany - nastepne wyszukiwanie buduje go od nowa z bazy.
+    """
+    PROG_TRIGRAMOW = 0.6
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._zaladowany = False
+        self._generacja = 0
+        self._tokeny_zawodnika: Dict[int, Set[str]] = {}
+        self._tokeny: List[Tuple[str, int]] = []
+        self._trigramy: Dict[str, Set[int]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._zaladowany
+
+    @property
+    def generacja(self) -> int:
+        return self._generacja
+
+    def load(self, wiersze, generacja: Optional[int] = None):
+        """
+        Buduje indeks od zera z wierszy (id_zawodnika, imie, nazwisko).
+        generacja - wartosc sprzed odczytu wierszy; jesli w miedzyczasie byl invalidate(),
+        indeks jest zbudowany, ale zostaje niezaladowany i kolejne wyszukiwanie wczyta go ponownie.
+        """
+        with self._lock:
+            self._tokeny_zawodnika, self._trigramy = {}, {}
+            tokeny = []
+            for id_zawodnika, imie, nazwisko in wiersze:
+                tokeny.extend(self._dodaj(id_zawodnika, imie, nazwisko))
+            tokeny.sort()
+            self._tokeny = tokeny
+            self._zaladowany = generacja is None or generacja == self._generacja
+
+    def invalidate(self):
+        """Oznacza indeks jako nieaktualny (zmiany zawodnikow poza tym procesem)"""
+        with self._lock:
+            self._generacja += 1
+            self._zaladowany = False
+
+    def add(self, id_zawodnika: int, imie: str, nazwisko: str):
+        """Dodaje zawodnika albo odswieza jego wpis po zmianie imienia/nazwiska"""
+        with self._lock:
+            self.remove(id_zawodnika)
+            for wpis in self._dodaj(id_zawodnika, imie, nazwisko):
+                insort(self._tokeny, wpis)
+
+    def remove(self, id_zawodnika: int):
+        with self._lock:
+            for token in self._tokeny_zawodnika.pop(id_zawodnika, ()):
+                i = bisect_left(self._tokeny, (token, id_zawodnika))
+                if i < len(self._tokeny) and self._tokeny[i] == (token, id_zawodnika):
+                    del self._tokeny[i]
+                for trigram in _trigramy(token):
+                    ids = self._trigramy.get(trigram)
+                    if ids is not None:
+                        ids.discard(id_zawodnika)
+                        if not ids:
+                            del self._trigramy[trigram]
+
+    def search(self, fraza: str, limit: int = 20) -> List[int]:
+        """
+        Zwraca id najlepiej dopasowanych zawodnikow; kazde slowo frazy musi pasowac.
+        Kandydatow dostarcza najbardziej selektywne slowo, pozostale sa sprawdzane
+        na tokenach kandydata.
+        """
+        tokeny = set(_tokeny(fraza))
+        if not tokeny:
+            return []
+
+        with self._lock:
+            glowny = min(tokeny, key=lambda t: (self._rozmiar_prefiksu(t), -len(t)))
+            reszta = tokeny - {glowny}
+            wyniki = []
+            najlepsze = []
+            widziane = set()
+            for id_zawodnika, punkty in self._kandydaci(glowny):
+                # kolejni kandydaci maja coraz nizsze punkty - gdy nawet pelne dopasowanie
+                # pozostalych slow nie pobije obecnej czolowki, mozna skonczyc
+                if len(najlepsze) >= limit and punkty + 3.0 * len(reszta) <= najlepsze[0]:
+                    break
+                if id_zawodnika in widziane:
+                    continue
+                widziane.add(id_zawodnika)
+                for token in reszta:
+                    dopasowanie = self._dopasuj(id_zawodnika, token)
+                    if not dopasowanie:
+                        break
+                    punkty += dopasowanie
+                else:
+                    wyniki.append((id_zawodnika, punkty))
+                    if len(najlepsze) < limit:
+                        heapq.heappush(najlepsze, punkty)
+                    else:
+                        heapq.heappushpop(najlepsze, punkty)
+
+            ranking = heapq.nsmallest(limit, enumerate(wyniki), key=lambda w: (-w[1][1], w[0]))
+            return [id_zawodnika for _, (id_zawodnika, _) in ranking]
+
+    def _dodaj(self, id_zawodnika: int, imie: str, nazwisko: str) -> List[Tuple[str, int]]:
+        tokeny = set(_tokeny(imie or "")) | set(_tokeny(nazwisko or ""))
+        self._tokeny_zawodnika[id_zawodnika] = tokeny
+        for token in tokeny:
+            for trigram in _trigramy(token):
+                self._trigramy.setdefault(trigram, set()).add(id_zawodnika)
+        return [(token, id_zawodnika) for token in tokeny]
+
+    def _rozmiar_prefiksu(self, token: str) -> int:
+        return bisect_left(self._tokeny, (token + "\uffff",)) - bisect_left(self._tokeny, (token,))
+
+    def _kandydaci(self, token: str) -> Iterator[Tuple[int, float]]:
+        """Kandydaci w kolejnosci rankingu: cale slowo, prefiks (alfabetycznie), fragment"""
+        i = bisect_left(self._tokeny, (token,))
+        while i < len(self._tokeny) and self._tokeny[i][0].startswith(token):
+            kandydat, id_zawodnika = self._tokeny[i]
+            yield id_zawodnika, 3.0 if kandydat == token else 2.0
+            i += 1
+
+        trigramy = _trigramy(token)
+        if trigramy:
+            # kandydat musi miec co najmniej `wymagane` trigramow frazy, wiec wystarczy
+            # zebrac go z len - wymagane + 1 najrzadszych list (reszte sprawdzamy w zbiorach)
+            listy = sorted((self._trigramy.get(t, set()) for t in trigramy), key=len)
+            wymagane = math.ceil(self.PROG_TRIGRAMOW * len(listy))
+            rzadkie, czeste = listy[:len(listy) - wymagane + 1], listy[len(listy) - wymagane + 1:]
+            trafienia = Counter()
+            for ids in rzadkie:
+                trafienia.update(ids)
+            for id_zawodnika in trafienia:
+                trafienia[id_zawodnika] += sum(id_zawodnika in ids for ids in czeste)
+            for id_zawodnika, liczba in sorted(trafienia.items(), key=lambda t: -t[1]):
+                if liczba < wymagane:
+                    break
+                yield id_zawodnika, liczba / len(listy)
+
+    def _dopasuj(self, id_zawodnika: int, token: str) -> float:
+        najlepsze = 0.0
+        trigramy = None
+        for kandydat in self._tokeny_zawodnika.get(id_zawodnika, ()):
+            if kandydat == token:
+                return 3.0
+            if kandydat.startswith(token):
+                najlepsze = 2.0
+            elif najlepsze < 1.0 and len(token) >= 3:
+                if token in kandydat:
+                    najlepsze = 1.0
+                    continue
+                trigramy = trigramy or _trigramy(token)
+                wynik = len(trigramy & _trigramy(kandydat)) / len(trigramy)
+                if wynik >= self.PROG_TRIGRAMOW and wynik > najlepsze:
+                    najlepsze = wynik
+        return najlepsze
+
+indeks_zawodnikow = IndeksZawodnikow()
+cache.wersje.nasluchuj(("zawodnicy",), lambda tagi: indeks_zawodnikow.invalidate())
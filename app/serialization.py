@@ -0,0 +1,31 @@
+from decimal import Decimal
+from typing import Sequence
+import orjson
+from fastapi import Response
+
+def _domyslna(v):
+    # jak Pydantic w trybie JSON: Decimal jako tekst, bez utraty precyzji
+    if isinstance(v, Decimal):
+        return str(v)
+    raise TypeError(f"Typ {type(v).__name__} nie jest serializowalny do JSON")
+
+def wiersze_json(wiersze: Sequence) -> bytes:
+    """
+    Lista wierszy select() (Row) jako tablica obiektow JSON {kolumna: wartosc}.
+    Klucze i format wartosci sa takie same jak w response_model (daty ISO 8601, Decimal jako tekst).
+    """
+    if not wiersze:
+        return b"[]"
+    pola = wiersze[0]._fields
+    return orjson.dumps([dict(zip(pola, w)) for w in wiersze], default=_domyslna)
+
+class OdpowiedzWierszy(Response):
+    """
+    Odpowiedz szybkiej sciezki (FAST_JSON): wiersze kodowane od razu do bajtow,
+    z pominieciem obiektow ORM i walidacji response_model. Schemat w OpenAPI
+    pozostaje ten z response_model trasy.
+    """
+    media_type = "application/json"
+
+    def __init__(self, wiersze: Sequence, **kwargs):
+        super().__init__(wiersze_json(wiersze), **kwargs)
@@ -0,0 +1,182 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from app import cache
+
+# kolejnosc licznikow w migawkach; nazwy jak w Kluby i schemas.Klub
+LICZNIKI = (
+    "punkty", "mecze_rozegrane", "wygrane", "remisy", "przegrane",
+    "bramki_strzelone", "bramki_stracone", "roznica_bramek"
+)
+_K = len(LICZNIKI)
+
+# (id_meczu, kolejka, data_meczu, {id_klubu: {licznik: przyrost}})
+WierszMeczu = Tuple[int, int, datetime, Dict[int, dict]]
+
+class _Migawki:
+    """
+    Narastajace liczniki wszystkich klubow sezonu po kolejnych kluczach (kolejka albo dzien).
+    Kazda migawka to plaska tablica [klub0.punkty, klub0.mecze_rozegrane, ..., klub1.punkty, ...].
+    """
+    def __init__(self, liczba_klubow: int):
+        self.klucze: list = []
+        self.stany: List[array] = []
+        self._zero = array("i", bytes(4 * _K * liczba_klubow))
+
+    def dodaj(self, klucz, przyrosty: List[Tuple[int, int]]):
+        """Dodaje przyrosty do migawki klucza i wszystkich pozniejszych - O(klubow) dla nowego klucza na koncu"""
+        i = bisect_left(self.klucze, klucz)
+        if i == len(self.klucze) or self.klucze[i] != klucz:
+            self.klucze.insert(i, klucz)
+            self.stany.insert(i, array("i", self.stany[i - 1] if i else self._zero))
+        for stan in self.stany[i:]:
+            for pole, wartosc in przyrosty:
+                stan[pole] += wartosc
+
+    def stan(self, klucz=None) -> array:
+        """Liczniki po ostatnim kluczu <= klucz (None - po calym sezonie)"""
+        i = len(self.stany) if klucz is None else bisect_right(self.klucze, klucz)
+        return self.stany[i - 1] if i else self._zero
+
+class _Sezon:
+    def __init__(self, kluby: Iterable[int]):
+        self.kluby = sorted(kluby)
+        self.indeks = {id_klubu: i for i, id_klubu in enumerate(self.kluby)}
+        self.po_kolejce = _Migawki(len(self.kluby))
+        self.po_dniu = _Migawki(len(self.kluby))
+        self.mecze = set()
+
+    def dodaj(self, id_meczu: int, kolejka: int, data_meczu: datetime, zmiany: Dict[int, dict]):
+        self.popraw(kolejka, data_meczu, zmiany)
+        self.mecze.add(id_meczu)
+
+    def popraw(self, kolejka: int, data_meczu: datetime, zmiany: Dict[int, dict]):
+        """Dodaje przyrosty (lub roznice po korekcie wyniku) do migawek od kolejki / dnia meczu"""
+        przyrosty = [
+            (self.indeks[id_klubu] * _K + pole, zmiana[licznik])
+            for id_klubu, zmiana in zmiany.items()
+            for pole, licznik in enumerate(LICZNIKI)
+            if zmiana[licznik]
+        ]
+        self.po_kolejce.dodaj(kolejka, przyrosty)
+        self.po_dniu.dodaj(data_meczu.date() if isinstance(data_meczu, datetime) else data_meczu, przyrosty)
+
+class HistoriaTabel:
+    """
+    Tabele ligowe z przeszlosci: dla kazdego sezonu narastajace liczniki klubow po kazdej kolejce
+    i po kazdym dniu meczowym, budowane raz z Mecze i trzymane w pamieci procesu.
+    Odczyt tabeli po dowolnej kolejce lub na dowolny dzien to wyszukiwanie binarne i sortowanie
+    klubow sezonu. Nowy mecz dopisuje przyrosty do migawek (bez przebudowy), a zapis,
+    ktorego nie da sie dopisac (np. nowy klub w sezonie), uniewaznia tylko swoj sezon.
+    Mecze i kluby zmienione w innych procesach (wymiana wersji w cache.wersje) uniewazniaja wszystkie sezony.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sezony: Dict[str, _Sezon] = {}
+        self._wersje: Dict[str, int] = {}
+        self._nazwy: Dict[int, str] = {}
+
+    def _sezon(self, sezon: str, loader: Callable[[], Tuple[List[WierszMeczu], Dict[int, str]]]) -> Optional[_Sezon]:
+        s = self._sezony.get(sezon)
+        if s is not None:
+            return s
+
+        with self._lock:
+            wersja = self._wersje.get(sezon, 0)
+        mecze, nazwy = loader()
+        if not mecze:
+            return None
+
+        s = _Sezon({id_klubu for *_, zmiany in mecze for id_klubu in zmiany})
+        for wiersz in mecze:
+            s.dodaj(*wiersz)
+
+        with self._lock:
+            self._nazwy.update(nazwy)
+            # zapis, ktory przyszedl w trakcie ladowania, uniewaznia ten wynik
+            if self._wersje.get(sezon, 0) == wersja and sezon not in self._sezony:
+                self._sezony[sezon] = s
+            return self._sezony.get(sezon, s)
+
+    def dodaj_mecz(self, id_meczu: int, sezon: str, kolejka: int, data_meczu: datetime, zmiany: Dict[int, dict]):
+        """Dopisuje zapisany (zatwierdzony) mecz do migawek jego sezonu"""
+        with self._lock:
+            s = self._sezony.get(sezon)
+            if s is None or any(id_klubu not in s.indeks for id_klubu in zmiany):
+                self._uniewaznij(sezon)
+            elif id_meczu not in s.mecze:
+                s.dodaj(id_meczu, kolejka, data_meczu, zmiany)
+
+    def popraw_mecz(self, id_meczu: int, sezon: str, kolejka: int, data_meczu: datetime, roznica: Dict[int, dict]):
+        """
+        Korekta wyniku zatwierdzonego meczu: roznica licznikow (nowy wynik - stary) trafia do migawek
+        od kolejki i dnia meczu, bez przebudowy sezonu
+        """
+        with self._lock:
+            s = self._sezony.get(sezon)
+            if s is None or id_meczu not in s.mecze:
+                # trwajace ladowanie sezonu moglo przeczytac stary wynik
+                self._uniewaznij(sezon)
+            else:
+                s.popraw(kolejka, data_meczu, roznica)
+
+    def zmien_nazwe(self, id_klubu: int, nazwa: str):
+        with self._lock:
+            if id_klubu in self._nazwy:
+                self._nazwy[id_klubu] = nazwa
+
+    def _uniewaznij(self, sezon: str):
+        self._sezony.pop(sezon, None)
+        self._wersje[sezon] = self._wersje.get(sezon, 0) + 1
+
+    def invalidate(self, *sezony: str):
+        """Uniewaznia podane sezony (bez argumentow - wszystkie)"""
+        with self._lock:
+            for sezon in sezony or list(self._sezony):
+                self._uniewaznij(sezon)
+
+    def _wiersze(self, s: _Sezon, stan: array) -> List[dict]:
+        wiersze = [
+            {"id_klubu": id_klubu, "nazwa_klubu": self._nazwy.get(id_klubu, ""),
+             **dict(zip(LICZNIKI, stan[i * _K:(i + 1) * _K]))}
+            for i, id_klubu in enumerate(s.kluby)
+        ]
+        wiersze.sort(key=lambda w: (-w["punkty"], -w["roznica_bramek"], -w["bramki_strzelone"], w["nazwa_klubu"]))
+        for pozycja, w in enumerate(wiersze, 1):
+            w["pozycja"] = pozycja
+        return wiersze
+
+    def tabela(self, sezon: str, loader, kolejka: Optional[int] = None,
+               as_of: Optional[date] = None) -> Optional[List[dict]]:
+        """
+        Tabela sezonu po podanej kolejce albo po wszystkich meczach rozegranych do dnia as_of
+        (bez obu - tabela koncowa / biezaca). None, gdy w sezonie nie ma zadnego meczu.
+        """
+        s = self._sezon(sezon, loader)
+        if s is None:
+            return None
+        with self._lock:
+            stan = s.po_dniu.stan(as_of) if as_of is not None else s.po_kolejce.stan(kolejka)
+            return self._wiersze(s, stan)
+
+    def pozycje(self, sezon: str, loader, id_klubu: Optional[int] = None) -> Optional[dict]:
+        """Miejsce i punkty klubow po kazdej kolejce sezonu (wykres "pozycja w czasie")"""
+        s = self._sezon(sezon, loader)
+        if s is None:
+            return None
+        with self._lock:
+            kolejki = list(s.po_kolejce.klucze)
+            kluby = {i: {"id_klubu": i, "nazwa_klubu": self._nazwy.get(i, ""), "pozycje": [], "punkty": []}
+                     for i in s.kluby if id_klubu is None or i == id_klubu}
+            for stan in s.po_kolejce.stany:
+                for w in self._wiersze(s, stan):
+                    k = kluby.get(w["id_klubu"])
+                    if k is not None:
+                        k["pozycje"].append(w["pozycja"])
+                        k["punkty"].append(w["punkty"])
+        return {"sezon": sezon, "kolejki": kolejki, "kluby": list(kluby.values())}
+
+historia_tabel = HistoriaTabel()
+cache.wersje.nasluchuj(("mecze", "kluby"), lambda tagi: historia_tabel.invalidate())
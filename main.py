@@ -1,26 +1,89 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, Body, Header
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import ValidationError
+from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app import models, schemas, crud
-from app.database import engine, get_db
+from typing import List, Optional, Any
+from datetime import date, datetime
+from app import models, schemas, crud, crud_async, cache, pagination, export, replicas, serialization, ingest, live
+from app.config import get_settings
+from app.database import engine, get_db, get_read_db, SesjaOdczytu, SessionLocal
+from app.instrumentation import SQLMetricsMiddleware, metryki_sql, pule
 
 models.Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #wersje danych wspolne z innymi procesami - przed rozgrzaniem, zeby nie przegapic zapisow w trakcie
+    cache.wersje.start(engine, get_settings().cache_sync_s)
+    #rozgrzanie indeksu formy druzyn - pierwsze odczyty nie ida do bazy
+    db = SessionLocal()
+    try:
+        crud.zaladuj_indeks_formy(db)
+    finally:
+        db.close()
+    replicas.pula.start(get_settings().replica_check_interval)
+    #odtworzenie niezapisanych aktualizacji statystyk z dziennika i start zapisu partiami
+    await ingest.kolejka_statystyk.start()
+    yield
+    await ingest.kolejka_statystyk.stop()
+    replicas.pula.stop()
+    cache.wersje.stop(engine)
+
 app = FastAPI(
     title="Premier League Statistics API",
     description="System statystyk zawodników i klubów Premier League",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+#ostatnio dodany middleware jest najbardziej zewnetrzny: CORS -> ETag -> cache odpowiedzi -> metryki SQL,
+#wiec odpowiedzi 304 i trafienia w cache nie sa liczone jako zadania do bazy, a naglowki CORS dotycza kazdej odpowiedzi
+if get_settings().sql_metrics:
+    app.add_middleware(SQLMetricsMiddleware)
+
+if get_settings().response_cache:
+    cache.odpowiedzi.pojemnosc = get_settings().response_cache_size
+    app.add_middleware(cache.ResponseCacheMiddleware)
+
+app.add_middleware(cache.ETagMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Cache", "ETag"],
 )
 
+def _kursor(after: Optional[str], *typy):
+    if after is None:
+        return None
+    try:
+        return pagination.decode_cursor(after, *typy)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Nieprawidłowy kursor")
+
+#szybka sciezka list (FAST_JSON): wiersze select() kodowane przez orjson zamiast obiektow ORM + response_model
+_FAST_JSON = get_settings().fast_json
+
+def _strona(response: Response, wiersze: list, limit: int, klucz, szybko: bool = False):
+    """szybko=True - wiersze select() zwracane od razu jako JSON (OdpowiedzWierszy)"""
+    strona, next_cursor = pagination.paginate(wiersze, limit, klucz)
+    if szybko:
+        response = serialization.OdpowiedzWierszy(strona)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response if szybko else strona
+
+_ROZMIAR_STRONY = Query(
+    pagination.DOMYSLNY_ROZMIAR_STRONY, ge=1, le=pagination.MAKS_ROZMIAR_STRONY,
+    description="Rozmiar strony"
+)
+_KURSOR = Query(None, description="Kursor następnej strony z nagłówka X-Next-Cursor")
+
 @app.get("/")
 def root():
     return {
@@ -31,15 +94,15 @@ def root():
 
 #kluby
 @app.get("/kluby/", response_model=List[schemas.Klub], tags=["Kluby"])
-def read_kluby(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def read_kluby(skip: int = 0, limit: int = 100, db: SesjaOdczytu = Depends(get_read_db)):
     """Pobiera listę wszystkich klubów"""
-    kluby = crud.get_kluby(db, skip=skip, limit=limit)
-    return kluby
+    kluby = await crud_async.get_kluby(db, skip=skip, limit=limit, wiersze=_FAST_JSON)
+    return serialization.OdpowiedzWierszy(kluby) if _FAST_JSON else kluby
 
 @app.get("/kluby/{klub_id}", response_model=schemas.KlubDetale, tags=["Kluby"])
-def read_klub(klub_id: int, db: Session = Depends(get_db)):
+async def read_klub(klub_id: int, db: SesjaOdczytu = Depends(get_read_db)):
     """Pobiera szczegóły klubu (WF.05)"""
-    klub = crud.get_klub(db, klub_id=klub_id)
+    klub = await crud_async.get_klub(db, klub_id=klub_id, profil=schemas.KlubDetale)
     if klub is None:
         raise HTTPException(status_code=404, detail="Klub nie znaleziony")
     return klub
@@ -58,48 +121,101 @@ def update_klub(klub_id: int, klub: schemas.KlubUpdate, db: Session = Depends(ge
     return updated
 
 @app.get("/kluby/tabela/ligowa", response_model=List[schemas.Klub], tags=["Kluby"])
-def read_tabela_ligowa(db: Session = Depends(get_db)):
-    """Pobiera aktualną tabelę ligową posortowaną według punktów (WF.04)"""
-    return crud.get_kluby(db, skip=0, limit=100)
+async def read_tabela_ligowa(db: SesjaOdczytu = Depends(get_read_db)):
+    """
+    Pobiera aktualną tabelę ligową (WF.04)
+    
+    Kolejność: punkty, różnica bramek, bramki strzelone.
+    Tabela jest serwowana z pamięci i odświeżana po każdym zapisie meczu lub zmianie klubu.
+    """
+    tresc = await crud_async.get_tabela_ligowa_json(db)
+    return Response(content=tresc, media_type="application/json")
+
+#tabele historyczne
+@app.get("/tabela", response_model=List[schemas.PozycjaTabeli], tags=["Kluby"])
+async def read_tabela_historyczna(
+    sezon: str = Query(..., description="Sezon (np. 2024/25)"),
+    kolejka: Optional[int] = Query(None, ge=1, description="Tabela po tej kolejce"),
+    as_of: Optional[date] = Query(None, description="Tabela po meczach rozegranych do tego dnia włącznie"),
+    db: SesjaOdczytu = Depends(get_read_db)
+):
+    """
+    Tabela ligowa sezonu po wybranej kolejce albo na wybrany dzień
+    
+    Bez kolejki i daty zwraca tabelę po wszystkich rozegranych meczach sezonu.
+    Migawki sezonu są budowane raz z tabeli Mecze i uzupełniane przy każdym nowym meczu.
+    """
+    if kolejka is not None and as_of is not None:
+        raise HTTPException(status_code=400, detail="Podaj kolejkę albo datę, nie oba parametry")
+    tabela = await crud_async.get_tabela_historyczna(db, sezon=sezon, kolejka=kolejka, as_of=as_of)
+    if tabela is None:
+        raise HTTPException(status_code=404, detail="Brak meczów w sezonie")
+    return tabela
+
+@app.get("/tabela/pozycje", response_model=schemas.PozycjeWCzasie, tags=["Kluby"])
+async def read_pozycje_w_czasie(
+    sezon: str = Query(..., description="Sezon (np. 2024/25)"),
+    klub_id: Optional[int] = Query(None, description="Tylko wybrany klub"),
+    db: SesjaOdczytu = Depends(get_read_db)
+):
+    """
+    Miejsce w tabeli i punkty klubów po każdej kolejce sezonu (wykres "pozycja w czasie")
+    """
+    pozycje = await crud_async.get_pozycje_w_czasie(db, sezon=sezon, klub_id=klub_id)
+    if pozycje is None:
+        raise HTTPException(status_code=404, detail="Brak meczów w sezonie")
+    return pozycje
 
 #zawodnicy
 @app.get("/zawodnicy/", response_model=List[schemas.Zawodnik], tags=["Zawodnicy"])
-def read_zawodnicy(
+async def read_zawodnicy(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100,
+    limit: int = _ROZMIAR_STRONY,
+    after: Optional[str] = _KURSOR,
     klub_id: Optional[int] = Query(None, description="Filtruj według klubu"),
     pozycja_id: Optional[int] = Query(None, description="Filtruj według pozycji"),
     narodowosc: Optional[str] = Query(None, description="Filtruj według narodowości"),
-    db: Session = Depends(get_db)
+    db: SesjaOdczytu = Depends(get_read_db)
 ):
     """
     Pobiera listę zawodników z możliwością filtrowania (WF.06, WF.07)
     - klub_id: ID klubu
     - pozycja_id: ID pozycji
     - narodowosc: narodowość zawodnika
+    - after: kursor następnej strony (nagłówek X-Next-Cursor), zalecany zamiast skip
     """
-    zawodnicy = crud.get_zawodnicy(
+    po = _kursor(after, int)
+    zawodnicy = await crud_async.get_zawodnicy(
         db, 
         skip=skip, 
-        limit=limit,
+        limit=limit + 1,
         klub_id=klub_id,
         pozycja_id=pozycja_id,
-        narodowosc=narodowosc
+        narodowosc=narodowosc,
+        po_id=po[0] if po else None,
+        wiersze=_FAST_JSON
     )
-    return zawodnicy
+    return _strona(response, zawodnicy, limit, lambda z: (z.id_zawodnika,), szybko=_FAST_JSON)
 
 @app.get("/zawodnicy/search/", response_model=List[schemas.Zawodnik], tags=["Zawodnicy"])
-def search_zawodnicy(
+async def search_zawodnicy(
     q: str = Query(..., description="Szukaj po imieniu lub nazwisku"),
-    db: Session = Depends(get_db)
+    limit: int = Query(20, ge=1, le=100, description="Maksymalna liczba wyników"),
+    db: SesjaOdczytu = Depends(get_read_db)
 ):
-    """Wyszukuje zawodników po imieniu lub nazwisku (WF.07)"""
-    return crud.search_zawodnicy(db, search=q)
+    """
+    Wyszukuje zawodników po imieniu lub nazwisku (WF.07)
+    
+    Wielkość liter i znaki diakrytyczne są ignorowane ("lukasz" znajdzie "Łukasz").
+    Kolejność: całe słowo, początek słowa, fragment słowa.
+    """
+    return await crud_async.search_zawodnicy(db, search=q, limit=limit)
 
 @app.get("/zawodnicy/{zawodnik_id}", response_model=schemas.ZawodnikDetale, tags=["Zawodnicy"])
-def read_zawodnik(zawodnik_id: int, db: Session = Depends(get_db)):
+async def read_zawodnik(zawodnik_id: int, db: SesjaOdczytu = Depends(get_read_db)):
     """Pobiera szczegółowy profil zawodnika (WF.01)"""
-    zawodnik = crud.get_zawodnik(db, zawodnik_id=zawodnik_id)
+    zawodnik = await crud_async.get_zawodnik(db, zawodnik_id=zawodnik_id, profil=schemas.ZawodnikDetale)
     if zawodnik is None:
         raise HTTPException(status_code=404, detail="Zawodnik nie znaleziony")
     return zawodnik
@@ -123,22 +239,29 @@ def update_zawodnik(
 
 #mecze
 @app.get("/mecze/", response_model=List[schemas.Mecz], tags=["Mecze"])
-def read_mecze(
+async def read_mecze(
+    response: Response,
     sezon: Optional[str] = Query(None, description="Filtruj według sezonu"),
     kolejka: Optional[int] = Query(None, description="Filtruj według kolejki"),
-    db: Session = Depends(get_db)
+    limit: int = _ROZMIAR_STRONY,
+    after: Optional[str] = _KURSOR,
+    db: SesjaOdczytu = Depends(get_read_db)
 ):
     """
-    Pobiera listę meczów z możliwością filtrowania (WF.08)
+    Pobiera listę meczów z możliwością filtrowania (WF.08), od najnowszych
     - sezon: np. "2024/25"
     - kolejka: numer kolejki
+    - after: kursor następnej strony (nagłówek X-Next-Cursor)
     """
-    return crud.get_mecze(db, sezon=sezon, kolejka=kolejka)
+    mecze = await crud_async.get_mecze(
+        db, sezon=sezon, kolejka=kolejka, po=_kursor(after, datetime, int), limit=limit + 1, wiersze=_FAST_JSON
+    )
+    return _strona(response, mecze, limit, lambda m: (m.data_meczu, m.id_meczu), szybko=_FAST_JSON)
 
 @app.get("/mecze/{mecz_id}", response_model=schemas.MeczDetale, tags=["Mecze"])
-def read_mecz(mecz_id: int, db: Session = Depends(get_db)):
+async def read_mecz(mecz_id: int, db: SesjaOdczytu = Depends(get_read_db)):
     """Pobiera szczegóły meczu (WF.09)"""
-    mecz = crud.get_mecz(db, mecz_id=mecz_id)
+    mecz = await crud_async.get_mecz(db, mecz_id=mecz_id, profil=schemas.MeczDetale)
     if mecz is None:
         raise HTTPException(status_code=404, detail="Mecz nie znaleziony")
     return mecz
@@ -156,12 +279,39 @@ def create_mecz(mecz: schemas.MeczCreate, db: Session = Depends(get_db)):
     """
     return crud.create_mecz_z_aktualizacja_statystyk(db=db, mecz=mecz)
 
+@app.post("/mecze/bulk", response_model=schemas.MeczeBulkWynik, tags=["Mecze"])
+def create_mecze_bulk(
+    mecze: List[Any] = Body(..., description="Lista meczów w formacie MeczCreate"),
+    db: Session = Depends(get_db)
+):
+    """
+    Dodaje całą kolejkę (lub sezon) meczów w jednej transakcji
+    
+    - wszystkie poprawne mecze zapisywane jednym wielowierszowym INSERT
+    - statystyki każdego klubu aktualizowane jednym zagregowanym UPDATE
+    - błędne wiersze są pomijane i zwracane w polu "bledy" wraz z indeksem
+    """
+    return crud.create_mecze_bulk(db=db, mecze=mecze)
+
+@app.put("/mecze/{mecz_id}/wynik", response_model=schemas.Mecz, tags=["Mecze"])
+def update_wynik_meczu(mecz_id: int, wynik: schemas.MeczUpdate, db: Session = Depends(get_db)):
+    """
+    Korekta wyniku meczu (np. po odwołaniu)
+    
+    Statystyki obu klubów zmieniają się tylko o różnicę między starym a nowym wynikiem,
+    w jednej transakcji; tabele historyczne i forma drużyn są poprawiane bez przeliczania sezonu.
+    """
+    mecz = crud.update_wynik_meczu(db, mecz_id=mecz_id, wynik=wynik)
+    if mecz is None:
+        raise HTTPException(status_code=404, detail="Mecz nie znaleziony")
+    return mecz
+
 #transakcje/raporty
 @app.get("/raporty/ranking-strzelcow", tags=["Raporty"])
-def read_ranking_strzelcow(
+async def read_ranking_strzelcow(
     sezon: str = Query(..., description="Sezon np. '2024/25'"),
     limit: int = Query(20, description="Liczba wyników"),
-    db: Session = Depends(get_db)
+    db: SesjaOdczytu = Depends(get_read_db)
 ):
     """
     T2: Ranking najlepszych strzelców w sezonie (WF.15)
@@ -174,7 +324,7 @@ def read_ranking_strzelcow(
     - Liczba meczów
     - Suma minut
     """
-    results = crud.get_ranking_strzelcow(db, sezon=sezon, limit=limit)
+    results = await crud_async.get_ranking_strzelcow(db, sezon=sezon, limit=limit)
     return [
         {
             "imie": r.imie,
@@ -189,10 +339,11 @@ def read_ranking_strzelcow(
     ]
 
 @app.get("/raporty/forma-druzyny/{klub_id}", tags=["Raporty"])
-def read_forma_druzyny(
+async def read_forma_druzyny(
     klub_id: int,
-    limit: int = Query(5, description="Liczba ostatnich meczów"),
-    db: Session = Depends(get_db)
+    limit: int = Query(5, ge=0, description="Liczba ostatnich meczów"),
+    sezon: Optional[str] = Query(None, description="Tylko mecze z sezonu"),
+    db: SesjaOdczytu = Depends(get_read_db)
 ):
     """
     T3: Forma drużyny na podstawie ostatnich meczów
@@ -203,25 +354,25 @@ def read_forma_druzyny(
     - Wynik (W/R/P)
     - Bramki za/przeciw
     """
-    results = crud.get_forma_druzyny(db, klub_id=klub_id, limit=limit)
+    results = await crud_async.get_forma_druzyny(db, klub_id=klub_id, limit=limit, sezon=sezon)
     return [
         {
-            "id_meczu": r[0],
-            "data_meczu": r[1],
-            "typ_meczu": r[2],
-            "przeciwnik": r[3],
-            "bramki_za": r[4],
-            "bramki_przeciw": r[5],
-            "wynik": r[6]
+            "id_meczu": r["id_meczu"],
+            "data_meczu": r["data_meczu"],
+            "typ_meczu": r["typ_meczu"],
+            "przeciwnik": r["przeciwnik"],
+            "bramki_za": r["bramki_za"],
+            "bramki_przeciw": r["bramki_przeciw"],
+            "wynik": r["wynik"]
         }
         for r in results
     ]
 
 @app.get("/raporty/porownanie-zawodnikow", tags=["Raporty"])
-def read_porownanie_zawodnikow(
+async def read_porownanie_zawodnikow(
     pozycja_id: int = Query(..., description="ID pozycji"),
     sezon: str = Query(..., description="Sezon np. '2024/25'"),
-    db: Session = Depends(get_db)
+    db: SesjaOdczytu = Depends(get_read_db)
 ):
     """
     T4: Porównanie zawodników na tej samej pozycji
@@ -233,7 +384,7 @@ def read_porownanie_zawodnikow(
     - Statystyki (gole, asysty, minuty)
     - Średnie per 90 minut
     """
-    results = crud.get_porownanie_zawodnikow(db, pozycja_id=pozycja_id, sezon=sezon)
+    results = await crud_async.get_porownanie_zawodnikow(db, pozycja_id=pozycja_id, sezon=sezon)
     return [
         {
             "imie": r[0],
@@ -251,7 +402,7 @@ def read_porownanie_zawodnikow(
     ]
 
 @app.get("/raporty/skutecznosc-klubow", tags=["Raporty"])
-def read_skutecznosc_klubow(db: Session = Depends(get_db)):
+async def read_skutecznosc_klubow(db: SesjaOdczytu = Depends(get_read_db)):
     """
     T6: Ranking klubów pod względem skuteczności ofensywnej i defensywnej
     
@@ -260,7 +411,7 @@ def read_skutecznosc_klubow(db: Session = Depends(get_db)):
     - Punkty i statystyki meczowe
     - Średnie (gole, stracone, punkty na mecz)
     """
-    results = crud.get_skutecznosc_klubow(db)
+    results = await crud_async.get_skutecznosc_klubow(db)
     return [
         {
             "nazwa_klubu": r[0],
@@ -276,6 +427,34 @@ def read_skutecznosc_klubow(db: Session = Depends(get_db)):
         for r in results
     ]
 
+@app.get("/raporty/analityka", tags=["Raporty"])
+async def read_analityka(
+    sezon: str = Query(..., description="Sezon (np. 2024/25)"),
+    metryki: List[str] = Query(
+        ["gole", "asysty"],
+        description="Metryki: gole, asysty, zolte_kartki, czerwone_kartki, czyste_konta"
+    ),
+    pozycja_id: Optional[int] = Query(None, description="Tylko zawodnicy z tej pozycji"),
+    min_minut: int = Query(0, ge=0, description="Minimalna liczba rozegranych minut"),
+    sortuj: Optional[str] = Query(None, description="Pole sortowania, np. gole_na_90, asysty_percentyl"),
+    limit: int = Query(100, ge=1, le=5000),
+    db: SesjaOdczytu = Depends(get_read_db)
+):
+    """
+    Analityka zawodników: wartości na 90 minut, percentyle i z-score w obrębie pozycji
+    
+    Dla każdej metryki zwraca pola: <metryka>, <metryka>_na_90, <metryka>_percentyl, <metryka>_z.
+    Percentyle i z-score są liczone wśród zawodników tej samej pozycji spełniających min_minut.
+    Dane sezonu są trzymane w pamięci jako tablice NumPy i liczone wektorowo.
+    """
+    try:
+        return await crud_async.get_analityka(
+            db, sezon=sezon, metryki=metryki, pozycja_id=pozycja_id,
+            min_minut=min_minut, sortuj=sortuj, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 #staty indywidualne
 @app.post("/statystyki/", response_model=schemas.StatystykiIndywidualne, tags=["Statystyki"])
 def create_statystyki(
@@ -285,14 +464,61 @@ def create_statystyki(
     """Dodaje statystyki zawodnika z meczu"""
     return crud.create_statystyki(db=db, statystyki=statystyki)
 
-@app.get("/statystyki/zawodnik/{zawodnik_id}", tags=["Statystyki"])
-def read_statystyki_zawodnika(
+@app.post("/statystyki/bulk", response_model=schemas.StatystykiBulkWynik, tags=["Statystyki"])
+def create_statystyki_bulk(
+    statystyki: List[Any] = Body(..., description="Lista statystyk w formacie StatystykiIndywidualneCreate"),
+    db: Session = Depends(get_db)
+):
+    """
+    Dodaje statystyki zawodników z całego meczu (lub wielu meczów) w jednej transakcji
+    
+    - wszystkie wiersze zapisywane jednym wielowierszowym upsertem po parze (zawodnik, mecz)
+    - ponownie wysłany wiersz nadpisuje poprzednie wartości, a agregat sezonowy zmienia się o różnicę
+    - "statusy" podaje wynik każdego wiersza w kolejności żądania (dodany / zaktualizowany / bez_zmian / blad),
+      a błędne wiersze są opisane w polu "bledy"
+    """
+    return crud.create_statystyki_bulk(db=db, wiersze=statystyki)
+
+@app.post("/statystyki/live", response_model=schemas.StatystykiLiveWynik, status_code=202, tags=["Statystyki"])
+async def create_statystyki_live(
+    aktualizacje: List[Any] = Body(..., description="Aktualizacje statystyk (id_zawodnika, id_meczu + zmienione pola)")
+):
+    """
+    Przyjmuje aktualizacje statystyk na żywo (gol, kartka, minuty) do zapisu partiami
+    
+    - wiersz zawiera id_zawodnika, id_meczu i tylko pola, które się zmieniły (bieżące wartości, nie przyrosty)
+    - aktualizacje tej samej pary (zawodnik, mecz) są scalane i zapisywane partiami w tle
+    - przyjęte aktualizacje trafiają do dziennika na dysku i są odtwarzane po restarcie
+    - przy pełnej kolejce odpowiedź 503 z nagłówkiem Retry-After
+    """
+    przyjete, bledy = [], []
+    for indeks, dane in enumerate(aktualizacje):
+        try:
+            przyjete.append(schemas.StatystykiIndywidualneCreate(**dane).dict(exclude_unset=True))
+        except (ValidationError, TypeError) as e:
+            opis = crud._opis_bledu(e) if isinstance(e, ValidationError) else "Wiersz musi być obiektem"
+            bledy.append({"indeks": indeks, "blad": opis})
+    try:
+        await ingest.kolejka_statystyk.przyjmij(przyjete)
+    except ingest.KolejkaPelna:
+        raise HTTPException(status_code=503, detail="Kolejka aktualizacji pełna", headers={"Retry-After": "1"})
+    return {"przyjete": len(przyjete), "bledy": bledy}
+
+@app.get("/statystyki/zawodnik/{zawodnik_id}", response_model=List[schemas.StatystykiIndywidualne], tags=["Statystyki"])
+async def read_statystyki_zawodnika(
+    response: Response,
     zawodnik_id: int,
     sezon: Optional[str] = Query(None, description="Filtruj według sezonu"),
-    db: Session = Depends(get_db)
+    limit: int = _ROZMIAR_STRONY,
+    after: Optional[str] = _KURSOR,
+    db: SesjaOdczytu = Depends(get_read_db)
 ):
-    """Pobiera statystyki zawodnika z podziałem na sezony (WF.02)"""
-    return crud.get_statystyki_zawodnika(db, zawodnik_id=zawodnik_id, sezon=sezon)
+    """Pobiera statystyki zawodnika z podziałem na sezony (WF.02), stronicowane kursorem"""
+    po = _kursor(after, int)
+    statystyki = await crud_async.get_statystyki_zawodnika(
+        db, zawodnik_id=zawodnik_id, sezon=sezon, po_id=po[0] if po else None, limit=limit + 1
+    )
+    return _strona(response, statystyki, limit, lambda s: (s.id_statystyki,))
 
 #transfery
 @app.post("/transfery/", response_model=schemas.Transfer, tags=["Transfery"])
@@ -304,7 +530,7 @@ def create_transfer(transfer: schemas.TransferCreate, db: Session = Depends(get_
     return crud.create_transfer(db=db, transfer=transfer)
 
 @app.get("/transfery/zawodnik/{zawodnik_id}", tags=["Transfery"])
-def read_historia_transferow(zawodnik_id: int, db: Session = Depends(get_db)):
+async def read_historia_transferow(zawodnik_id: int, db: SesjaOdczytu = Depends(get_read_db)):
     """
     T5: Historia transferów zawodnika (WF.03, WF.19)
     
@@ -314,24 +540,133 @@ def read_historia_transferow(zawodnik_id: int, db: Session = Depends(get_db)):
     - Kwota transferu
     - Typ transferu
     """
-    results = crud.get_historia_transferow(db, zawodnik_id=zawodnik_id)
-    return results
+    results = await crud_async.get_historia_transferow(db, zawodnik_id=zawodnik_id)
+    return [
+        {
+            "data_transferu": r.data_transferu,
+            "klub_z": r.klub_z,
+            "klub_do": r.klub_do,
+            "kwota_transferu": float(r.kwota_transferu) if r.kwota_transferu is not None else None,
+            "typ_transferu": r.typ_transferu.value
+        }
+        for r in results
+    ]
+
+#eksport
+_FORMAT = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson albo csv")
+
+def _eksport(request: Request, query, format: str, nazwa: str):
+    gzip = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Content-Disposition": f'attachment; filename="{nazwa}.{format}"', "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(export.strumien(query, format, gzip), media_type=export.FORMATY[format], headers=headers)
+
+@app.get("/export/mecze", tags=["Eksport"])
+def export_mecze(
+    request: Request,
+    sezon: Optional[str] = None,
+    kolejka: Optional[int] = None,
+    format: str = _FORMAT
+):
+    """
+    Strumieniowy eksport meczów (NDJSON lub CSV)
+    
+    Wiersze są czytane kursorem po stronie serwera i wysyłane partiami, więc zużycie pamięci
+    nie zależy od rozmiaru eksportu. Z nagłówkiem Accept-Encoding: gzip odpowiedź jest kompresowana.
+    """
+    return _eksport(request, export.zapytanie_mecze(sezon, kolejka), format, "mecze")
+
+@app.get("/export/statystyki", tags=["Eksport"])
+def export_statystyki(
+    request: Request,
+    sezon: Optional[str] = None,
+    zawodnik_id: Optional[int] = None,
+    format: str = _FORMAT
+):
+    """
+    Strumieniowy eksport statystyk indywidualnych (NDJSON lub CSV), z sezonem meczu
+    """
+    return _eksport(request, export.zapytanie_statystyki(sezon, zawodnik_id), format, "statystyki")
+
+@app.get("/export/transfery", tags=["Eksport"])
+def export_transfery(
+    request: Request,
+    sezon: Optional[str] = Query(None, description="Transfery od 1 lipca do 30 czerwca sezonu (np. 2024/25)"),
+    zawodnik_id: Optional[int] = None,
+    format: str = _FORMAT
+):
+    """
+    Strumieniowy eksport transferów (NDJSON lub CSV)
+    """
+    try:
+        query = export.zapytanie_transfery(sezon, zawodnik_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _eksport(request, query, format, "transfery")
+
+#na zywo
+@app.get("/live/stream", tags=["Na żywo"])
+async def live_stream(
+    typy: List[str] = Query(list(live.TYPY), description="Typy zdarzeń: mecz, tabela, statystyki, transfer"),
+    klub_id: Optional[int] = Query(None, description="Tylko zdarzenia dotyczące klubu"),
+    last_event_id: Optional[str] = Header(None, description="Id ostatniego odebranego zdarzenia (wznowienie)")
+):
+    """
+    Strumień zmian (Server-Sent Events) zamiast odpytywania /mecze/, /kluby/tabela/ligowa i /raporty/forma-druzyny
+    
+    - mecz: nowy wynik albo korekta wyniku
+    - tabela: zmienione liczniki klubów (tabela ligowa i forma tych klubów)
+    - statystyki: zapisane statystyki zawodników z jednego meczu
+    - transfer: nowy transfer
+    - co LIVE_HEARTBEAT_S sekund bez zdarzeń komentarz ": ping"
+    - event: reset - klient nie nadążał albo wznowienie jest niemożliwe: pobierz stan od nowa i połącz się ponownie
+    """
+    nieznane = set(typy) - set(live.TYPY)
+    if nieznane:
+        raise HTTPException(status_code=400, detail=f"Nieznane typy zdarzeń: {', '.join(sorted(nieznane))}")
+    subskrybent = live.kanal.podlacz(typy, klub_id, last_event_id)
+    if subskrybent is None:
+        raise HTTPException(status_code=503, detail="Za dużo subskrybentów", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        live.kanal.strumien(subskrybent), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 #slowniki
 @app.get("/pozycje/", response_model=List[schemas.Pozycja], tags=["Słowniki"])
-def read_pozycje(db: Session = Depends(get_db)):
+async def read_pozycje(db: SesjaOdczytu = Depends(get_read_db)):
     """Pobiera listę wszystkich pozycji"""
-    return crud.get_pozycje(db)
+    return await crud_async.get_pozycje(db)
 
 @app.get("/menedzerowie/", response_model=List[schemas.Menedzer], tags=["Słowniki"])
-def read_menedzerowie(db: Session = Depends(get_db)):
+async def read_menedzerowie(db: SesjaOdczytu = Depends(get_read_db)):
     """Pobiera listę wszystkich menedżerów"""
-    return crud.get_menedzerowie(db)
+    return await crud_async.get_menedzerowie(db)
 
 @app.get("/stadiony/", response_model=List[schemas.Stadion], tags=["Słowniki"])
-def read_stadiony(db: Session = Depends(get_db)):
+async def read_stadiony(db: SesjaOdczytu = Depends(get_read_db)):
     """Pobiera listę wszystkich stadionów"""
-    return crud.get_stadiony(db)
+    return await crud_async.get_stadiony(db)
+
+#administracja
+@app.post("/admin/kluby/sprawdz-liczniki", tags=["Admin"])
+def sprawdz_liczniki_klubow(
+    sezon: Optional[str] = Query(None, description="Tylko dla bazy z meczami jednego sezonu (domyślnie wszystkie mecze)"),
+    napraw: bool = Query(False, description="Zapisz wyliczone wartości w Kluby"),
+    db: Session = Depends(get_db)
+):
+    """
+    Sprawdza spójność liczników klubów (punkty, W/R/P, bramki) z tabelą Mecze
+    
+    Liczniki klubów to sumy ze wszystkich meczów w Mecze; są wyliczane jednym zgrupowanym
+    zapytaniem i porównywane z zapisanymi. Zwraca kluby z rozbieżnościami; z napraw=true
+    poprawia je jednym zbiorczym UPDATE. Sezon, gdy w bazie są mecze innych sezonów - błąd 400.
+    """
+    try:
+        return crud.sprawdz_liczniki_klubow(db, sezon=sezon, napraw=napraw)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 #health check
 @app.get("/health", tags=["Health"])
@@ -339,6 +674,39 @@ def health_check():
     """Sprawdza status aplikacji"""
     return {"status": "healthy", "message": "API is running"}
 
+@app.get("/health/db", tags=["Health"])
+def health_db():
+    """
+    Statystyki pul połączeń do bazy (główna, async, repliki) od startu procesu
+    
+    Dla każdej puli: rozmiar, wydane i wolne połączenia, overflow, liczniki zdarzeń puli
+    (połączenia, wydania, zwroty, unieważnienia, nieudane pingi, przekroczenia POOL_TIMEOUT)
+    i histogram czasu pobrania połączenia w ms. maks_polaczen × liczba workerów
+    nie powinno przekraczać max_connections serwera MySQL.
+    """
+    return {"pule": {nazwa: statystyki.snapshot() for nazwa, statystyki in pule.items()}}
+
+@app.get("/metrics", tags=["Health"])
+def read_metrics():
+    """
+    Koszt SQL per trasa od startu procesu oraz skuteczność cache odpowiedzi
+    
+    Dla każdej trasy: liczba żądań i zapytań, łączny czas bazy, wiersze zwrócone przez odczyty
+    (wiersze_zwrocone, srednio_wierszy, maks_wierszy), wiersze zmienione przez INSERT/UPDATE/DELETE
+    (wiersze_zmienione) oraz najwolniejsze zapytanie.
+    Dla cache: trafienia, chybienia, zapisy i odpowiedzi odrzucone z powodu zapisu w trakcie.
+    Dla replik: dostępność według ostatniego sprawdzenia.
+    Dla kolejki statystyk na żywo: przyjęte, scalone i zapisane aktualizacje, partie i błędy.
+    Dla /live/stream: subskrybenci, opublikowane i dostarczone zdarzenia, odrzuceni (wolni) klienci.
+    """
+    return {
+        "sql": metryki_sql.snapshot(),
+        "cache": cache.odpowiedzi.snapshot(),
+        "repliki": replicas.pula.stan(),
+        "ingest": ingest.kolejka_statystyk.snapshot(),
+        "live": live.kanal.snapshot()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
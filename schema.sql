@@ -5,6 +5,8 @@ CREATE DATABASE IF NOT EXISTS premier_league CHARACTER SET utf8mb4 COLLATE utf8m
 USE premier_league;
 
 -- 3. Now drop existing tables (if they exist)
+DROP TABLE IF EXISTS WersjeDanych;
+DROP TABLE IF EXISTS StatystykiSezonowe;
 DROP TABLE IF EXISTS StatystykiIndywidualne;
 DROP TABLE IF EXISTS SkladyMeczowe;
 DROP TABLE IF EXISTS Transfery;
@@ -119,6 +121,29 @@ CREATE TABLE StatystykiIndywidualne (
     UNIQUE KEY unique_player_match (id_zawodnika, id_meczu)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Tabela StatystykiSezonowe (agregat StatystykiIndywidualne per zawodnik i sezon)
+CREATE TABLE StatystykiSezonowe (
+    id_zawodnika INT NOT NULL,
+    sezon VARCHAR(20) NOT NULL,
+    wystepy INT NOT NULL DEFAULT 0,
+    gole INT NOT NULL DEFAULT 0,
+    asysty INT NOT NULL DEFAULT 0,
+    minuty_rozegrane INT NOT NULL DEFAULT 0,
+    zolte_kartki INT NOT NULL DEFAULT 0,
+    czerwone_kartki INT NOT NULL DEFAULT 0,
+    czyste_konta INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_zawodnika, sezon),
+    FOREIGN KEY (id_zawodnika) REFERENCES Zawodnicy(id_zawodnika) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Tabela WersjeDanych (wersje danych wspolne dla procesow API - uniewaznianie cache w pamieci)
+CREATE TABLE WersjeDanych (
+    tag VARCHAR(30) PRIMARY KEY,
+    wersja BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO WersjeDanych (tag) VALUES ('kluby'), ('mecze'), ('zawodnicy'), ('statystyki'), ('transfery'), ('slowniki');
+
 -- Tabela Transfery
 CREATE TABLE Transfery (
     id_transferu INT AUTO_INCREMENT PRIMARY KEY,
@@ -138,9 +163,13 @@ CREATE INDEX idx_zawodnicy_klub ON Zawodnicy(id_klubu);
 CREATE INDEX idx_zawodnicy_pozycja ON Zawodnicy(id_pozycji);
 CREATE INDEX idx_mecze_sezon ON Mecze(sezon);
 CREATE INDEX idx_mecze_data ON Mecze(data_meczu);
+CREATE INDEX idx_mecze_sezon_data ON Mecze(sezon, data_meczu);
+CREATE INDEX idx_mecze_gospodarze_data ON Mecze(id_klubu_gospodarze, data_meczu);
+CREATE INDEX idx_mecze_goscie_data ON Mecze(id_klubu_goscie, data_meczu);
 CREATE INDEX idx_statystyki_zawodnik ON StatystykiIndywidualne(id_zawodnika);
 CREATE INDEX idx_statystyki_mecz ON StatystykiIndywidualne(id_meczu);
 CREATE INDEX idx_sklady_mecz ON SkladyMeczowe(id_meczu);
+CREATE INDEX idx_statystyki_sezonowe_gole ON StatystykiSezonowe(sezon, gole);
 CREATE INDEX idx_transfery_zawodnik ON Transfery(id_zawodnika);
 
 -- Show confirmation
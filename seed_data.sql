@@ -113,6 +113,14 @@ INSERT INTO StatystykiIndywidualne (id_zawodnika, id_meczu, gole, asysty, zolte_
 (9, 5, 1, 1, 0, 0, FALSE, 90),
 (6, 5, 0, 0, 0, 0, TRUE, 90);
 
+-- StatystykiSezonowe (agregat przeliczany z StatystykiIndywidualne)
+INSERT INTO StatystykiSezonowe (id_zawodnika, sezon, wystepy, gole, asysty, minuty_rozegrane, zolte_kartki, czerwone_kartki, czyste_konta)
+SELECT si.id_zawodnika, m.sezon, COUNT(*), SUM(si.gole), SUM(si.asysty), SUM(si.minuty_rozegrane),
+       SUM(si.zolte_kartki), SUM(si.czerwone_kartki), SUM(si.czyste_konto)
+FROM StatystykiIndywidualne si
+JOIN Mecze m ON si.id_meczu = m.id_meczu
+GROUP BY si.id_zawodnika, m.sezon;
+
 -- Transfery
 INSERT INTO Transfery (id_zawodnika, id_klubu_z, id_klubu_do, data_transferu, kwota_transferu, typ_transferu) VALUES
 (4, NULL, 1, '2022-07-01', 60.00, 'transfer'),
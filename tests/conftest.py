@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+#ustawienia sa czytane przy imporcie app.config/app.database - baza i dziennik testow
+#musza byc ustawione, zanim ktorykolwiek test zaimportuje main; TEST_DATABASE_URL (pusta baza MySQL)
+#pozwala uruchomic testy wspolbieznosci na serwerze z blokadami wierszy zamiast SQLite
+_katalog = tempfile.mkdtemp(prefix="premier_league_testy_")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(_katalog, 'testy.db')}"
+os.environ["INGEST_LOG_DIR"] = os.path.join(_katalog, "ingest_log")
+os.environ["ASYNC_DATABASE"] = "false"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+#bez watku wymiany wersji danych - testy wolaja cache.wersje.synchronizuj() same
+os.environ["CACHE_SYNC_S"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    with TestClient(main.app) as c:
+        yield c
+
+@pytest.fixture(scope="session")
+def kluby(client):
+    """Kilka klubow wspolnych dla testow"""
+    ids = []
+    for i in range(4):
+        odp = client.post("/kluby/", json={"nazwa_klubu": f"Klub Testowy {i}", "rok_zalozenia": 1900 + i})
+        assert odp.status_code == 200, odp.text
+        ids.append(odp.json()["id_klubu"])
+    return ids
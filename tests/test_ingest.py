@@ -0,0 +1,54 @@
+import asyncio
+import os
+from app import models
+from app.database import SessionLocal
+from app.ingest import KolejkaStatystyk
+
+def _statystyki(id_zawodnika, id_meczu):
+    db = SessionLocal()
+    try:
+        return db.query(models.StatystykiIndywidualne).filter_by(id_zawodnika=id_zawodnika, id_meczu=id_meczu).one()
+    finally:
+        db.close()
+
+def test_workery_we_wspolnym_katalogu_dziennika(client, kluby, tmp_path):
+    """
+    Dwa procesy (tu: dwie kolejki) pisza do jednego katalogu: zapis partii jednego nie usuwa
+    niezapisanego dziennika drugiego, a po przerwaniu drugiego jego dziennik odtwarza dopiero
+    nastepny startujacy proces - nie ten, ktory dziala obok.
+    """
+    zawodnik = client.post("/zawodnicy/", json={"imie": "Jan", "nazwisko": "Dziennikowy", "id_klubu": kluby[0]}).json()
+    mecz = client.post("/mecze/", json={
+        "data_meczu": "2177-08-01T15:00:00", "id_klubu_gospodarze": kluby[0], "id_klubu_goscie": kluby[1],
+        "sezon": "2177/78", "kolejka": 1, "bramki_gospodarze": 1, "bramki_goscie": 0
+    }).json()
+    para = {"id_zawodnika": zawodnik["id_zawodnika"], "id_meczu": mecz["id_meczu"]}
+    katalog = str(tmp_path)
+
+    async def scenariusz():
+        pierwszy = KolejkaStatystyk(katalog, rozmiar_partii=1000, interwal=3600)
+        drugi = KolejkaStatystyk(katalog, rozmiar_partii=1000, interwal=3600)
+        await pierwszy.start()
+        await drugi.start()
+        await pierwszy.przyjmij([{**para, "minuty_rozegrane": 90, "gole": 2}])
+        await drugi.przyjmij([{**para, "minuty_rozegrane": 90, "asysty": 1}])
+        await asyncio.sleep(0)
+        await drugi._zapisz_partie()
+        assert pierwszy._segmenty() == [1]
+
+        # przerwanie pierwszego procesu bez zapisu partii
+        pierwszy._zadanie.cancel()
+        pierwszy._dziennik.close()
+        pierwszy._blokada.close()
+
+        trzeci = KolejkaStatystyk(katalog, rozmiar_partii=1000, interwal=3600)
+        await trzeci.start()
+        assert not os.path.exists(pierwszy._sciezka(1))
+        await drugi.stop()
+        await trzeci.stop()
+
+    asyncio.run(scenariusz())
+
+    wiersz = _statystyki(para["id_zawodnika"], para["id_meczu"])
+    assert (wiersz.gole, wiersz.asysty, wiersz.minuty_rozegrane) == (2, 1, 90)
+    assert sorted(os.listdir(katalog)) == ["ingest.lock"]
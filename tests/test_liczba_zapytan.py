@@ -0,0 +1,77 @@
+import pytest
+from app import models
+from app.database import SessionLocal, engine
+from app.instrumentation import licz_zapytania, metryki_sql
+
+#cache odpowiedzi pominiety - liczymy zapytania samego endpointu
+BEZ_CACHE = {"cache-control": "no-cache"}
+
+@pytest.fixture(scope="module")
+def dane(client):
+    """Klub ze stadionem i menedzerem, zawodnik z pozycja i mecz - wszystkie relacje profili wypelnione"""
+    db = SessionLocal()
+    try:
+        stadion = models.Stadiony(nazwa_stadionu="Stadion Zapytan", pojemnosc=30000, miasto="Leeds")
+        menedzer = models.Menedzerowie(imie="Jan", nazwisko="Zapytalski")
+        pozycja = models.Pozycje(nazwa_pozycji="Napastnik Testowy", skrot="NT")
+        db.add_all([stadion, menedzer, pozycja])
+        db.commit()
+        ids = (stadion.id_stadionu, menedzer.id_menedzera, pozycja.id_pozycji)
+    finally:
+        db.close()
+    id_stadionu, id_menedzera, id_pozycji = ids
+
+    gospodarze = client.post("/kluby/", json={
+        "nazwa_klubu": "Zapytania United", "id_stadionu": id_stadionu, "id_menedzera": id_menedzera
+    }).json()["id_klubu"]
+    goscie = client.post("/kluby/", json={"nazwa_klubu": "Zapytania City"}).json()["id_klubu"]
+    zawodnik = client.post("/zawodnicy/", json={
+        "imie": "Adam", "nazwisko": "Licznik", "id_klubu": gospodarze, "id_pozycji": id_pozycji, "numer_koszulki": 9
+    }).json()["id_zawodnika"]
+    mecz = client.post("/mecze/", json={
+        "data_meczu": "2031-08-10T15:00:00", "id_klubu_gospodarze": gospodarze, "id_klubu_goscie": goscie,
+        "sezon": "2031/32", "kolejka": 1, "bramki_gospodarze": 2, "bramki_goscie": 1
+    }).json()["id_meczu"]
+    return {"klub": gospodarze, "zawodnik": zawodnik, "mecz": mecz}
+
+#endpoint -> liczba zapytan SQL; detale laduja relacje przez PROFILE_LADOWANIA (joinedload) w tym samym
+#zapytaniu, wiec zgubiony profil albo leniwe ladowanie przy serializacji podnosi liczbe i test to wylapuje
+ZAPYTANIA = [
+    ("/kluby/{klub}", 1),
+    ("/zawodnicy/{zawodnik}", 1),
+    ("/mecze/{mecz}", 1),
+    ("/kluby/", 1),
+    ("/zawodnicy/", 1),
+    ("/mecze/", 1)
+]
+
+@pytest.mark.parametrize("sciezka,liczba", ZAPYTANIA)
+def test_liczba_zapytan(client, dane, sciezka, liczba):
+    with licz_zapytania(engine) as licznik:
+        odp = client.get(sciezka.format(**dane), headers=BEZ_CACHE)
+    assert odp.status_code == 200, odp.text
+    assert licznik.liczba == liczba, licznik.zapytania
+
+def test_detale_zawieraja_relacje(client, dane):
+    """Relacje z profili musza byc w odpowiedzi - inaczej liczba zapytan niczego nie dowodzi"""
+    klub = client.get(f"/kluby/{dane['klub']}", headers=BEZ_CACHE).json()
+    assert klub["stadion"]["nazwa_stadionu"] == "Stadion Zapytan"
+    assert klub["menedzer"]["nazwisko"] == "Zapytalski"
+    zawodnik = client.get(f"/zawodnicy/{dane['zawodnik']}", headers=BEZ_CACHE).json()
+    assert zawodnik["klub"]["id_klubu"] == dane["klub"]
+    assert zawodnik["pozycja"]["skrot"] == "NT"
+    mecz = client.get(f"/mecze/{dane['mecz']}", headers=BEZ_CACHE).json()
+    assert mecz["klub_gospodarze"]["nazwa_klubu"] == "Zapytania United"
+    assert mecz["klub_goscie"]["nazwa_klubu"] == "Zapytania City"
+
+def test_metryki_wierszy(client, dane):
+    """Odczyty raportuja wiersze zwrocone, zapisy wiersze zmienione - osobno"""
+    metryki_sql.reset()
+    kluby = client.get("/kluby/", headers=BEZ_CACHE).json()
+    client.get(f"/kluby/{dane['klub']}", headers=BEZ_CACHE)
+    client.put(f"/kluby/{dane['klub']}", json={"nazwa_klubu": "Zapytania Rovers"})
+    trasy = metryki_sql.snapshot()
+    assert trasy["GET /kluby/"]["wiersze_zwrocone"] == len(kluby)
+    assert trasy["GET /kluby/"]["wiersze_zmienione"] == 0
+    assert trasy["GET /kluby/{klub_id}"]["wiersze_zwrocone"] == 1
+    assert trasy["PUT /kluby/{klub_id}"]["wiersze_zmienione"] >= 1
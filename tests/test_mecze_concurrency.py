@@ -0,0 +1,79 @@
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from app import crud
+from app.database import SessionLocal, engine, get_db
+
+WATKI = 8
+LICZBA_MECZOW = 38 * WATKI
+
+def test_rownolegle_mecze_nie_gubia_licznikow(client, kluby):
+    """
+    T1 z wielu watkow naraz: przyrosty licznikow Kluby nie moga sie nadpisywac, wiec po
+    wszystkim liczniki zgadzaja sie z Mecze.
+    SQLite blokuje caly plik od pierwszego zapisu transakcji, co ukrywa zgubione aktualizacje,
+    dlatego zadania ida w trybie AUTOCOMMIT (kazde zapytanie to osobna transakcja - jak odczyt
+    bez blokady w InnoDB), a bariera przed UPDATE "Kluby" wymusza, ze wszystkie zadania rundy
+    zdazyly przeczytac kluby, zanim ktorekolwiek zapisze. Odczyt-modyfikacja-zapis obiektow ORM
+    gubi wtedy przyrosty w kazdej rundzie.
+    """
+    import main
+
+    silnik = engine.execution_options(isolation_level="AUTOCOMMIT")
+    SesjaAutocommit = sessionmaker(bind=silnik, autoflush=False)
+    bariera = threading.Barrier(WATKI, timeout=10)
+    po_barierze = weakref.WeakSet()
+
+    def get_db_autocommit():
+        db = SesjaAutocommit()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def czekaj_przed_zapisem(conn, cursor, statement, parameters, context, executemany):
+        # raz na zadanie (polaczenie sesji), przed pierwszym zapisem licznikow
+        if statement.startswith('UPDATE "Kluby"') and conn not in po_barierze:
+            po_barierze.add(conn)
+            bariera.wait()
+
+    start = datetime(2030, 8, 1, 15)
+
+    def dodaj(i):
+        gospodarze = kluby[i % len(kluby)]
+        goscie = kluby[(i + 1 + i // len(kluby)) % len(kluby)]
+        if goscie == gospodarze:
+            goscie = kluby[(i + 2) % len(kluby)]
+        return client.post("/mecze/", json={
+            "data_meczu": (start + timedelta(hours=i)).isoformat(),
+            "id_klubu_gospodarze": gospodarze,
+            "id_klubu_goscie": goscie,
+            "sezon": "2030/31",
+            "kolejka": i // 2 + 1,
+            "bramki_gospodarze": i % 4,
+            "bramki_goscie": i % 3
+        })
+
+    main.app.dependency_overrides[get_db] = get_db_autocommit
+    event.listen(silnik, "before_cursor_execute", czekaj_przed_zapisem)
+    try:
+        with ThreadPoolExecutor(max_workers=WATKI) as pula:
+            odpowiedzi = list(pula.map(dodaj, range(LICZBA_MECZOW)))
+    finally:
+        event.remove(silnik, "before_cursor_execute", czekaj_przed_zapisem)
+        main.app.dependency_overrides.pop(get_db)
+
+    assert [o.status_code for o in odpowiedzi] == [200] * LICZBA_MECZOW, next(
+        o.text for o in odpowiedzi if o.status_code != 200
+    )
+
+    db = SessionLocal()
+    try:
+        wynik = crud.sprawdz_liczniki_klubow(db)
+    finally:
+        db.close()
+    assert wynik["rozbieznosci"] == []
+    assert wynik["sprawdzone_kluby"] >= len(kluby)
@@ -0,0 +1,100 @@
+from datetime import datetime
+from sqlalchemy import insert, update
+from app import cache, models
+from app.database import engine
+
+def _inny_proces(*tagi):
+    """Zapis innego workera albo polecenia serwisowego widziany tylko przez WersjeDanych"""
+    tabela = models.WersjeDanych.__table__
+    with engine.begin() as conn:
+        conn.execute(update(tabela).where(tabela.c.tag.in_(tagi)).values(wersja=tabela.c.wersja + 1))
+
+def test_zapis_innego_procesu_zmienia_etag(client, kluby):
+    cache.wersje.synchronizuj(engine)
+    etag = client.get("/kluby/tabela/ligowa").headers["etag"]
+    assert client.get("/kluby/tabela/ligowa", headers={"if-none-match": etag}).status_code == 304
+
+    _inny_proces("kluby")
+    assert cache.wersje.synchronizuj(engine) == {"kluby"}
+    odp = client.get("/kluby/tabela/ligowa", headers={"if-none-match": etag})
+    assert odp.status_code == 200
+    assert odp.headers["etag"] != etag
+
+def test_zapis_innego_procesu_uniewaznia_tabele(client, kluby):
+    cache.wersje.synchronizuj(engine)
+    przed = {k["id_klubu"]: k["punkty"] for k in client.get("/kluby/tabela/ligowa").json()}
+
+    kluby_tabela = models.Kluby.__table__
+    with engine.begin() as conn:
+        conn.execute(update(kluby_tabela).where(kluby_tabela.c.id_klubu == kluby[0]).values(punkty=kluby_tabela.c.punkty + 100))
+    _inny_proces("kluby")
+    cache.wersje.synchronizuj(engine)
+
+    po = {k["id_klubu"]: k["punkty"] for k in client.get("/kluby/tabela/ligowa").json()}
+    assert po[kluby[0]] == przed[kluby[0]] + 100
+
+    with engine.begin() as conn:
+        conn.execute(update(kluby_tabela).where(kluby_tabela.c.id_klubu == kluby[0]).values(punkty=kluby_tabela.c.punkty - 100))
+    _inny_proces("kluby")
+    cache.wersje.synchronizuj(engine)
+
+def test_zawodnik_innego_procesu_w_wyszukiwarce(client):
+    assert client.get("/zawodnicy/search/", params={"q": "Kowal"}).status_code == 200
+    cache.wersje.synchronizuj(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Zawodnicy.__table__).values(imie="Oskar", nazwisko="Zwyszukiwarski"))
+    _inny_proces("zawodnicy")
+    cache.wersje.synchronizuj(engine)
+
+    odp = client.get("/zawodnicy/search/", params={"q": "zwyszuk"})
+    assert [z["nazwisko"] for z in odp.json()] == ["Zwyszukiwarski"]
+
+def test_mecz_innego_procesu_w_formie(client, kluby):
+    forma = f"/raporty/forma-druzyny/{kluby[2]}"
+    naglowki = {"cache-control": "no-cache"}
+    client.get(forma, headers=naglowki)
+    cache.wersje.synchronizuj(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Mecze.__table__).values(
+            data_meczu=datetime(2199, 5, 1, 15), id_klubu_gospodarze=kluby[2], id_klubu_goscie=kluby[3],
+            sezon="2198/99", kolejka=38, bramki_gospodarze=7, bramki_goscie=0
+        ))
+    _inny_proces("mecze", "kluby")
+    cache.wersje.synchronizuj(engine)
+
+    ostatni = client.get(forma, headers=naglowki).json()[0]
+    assert (ostatni["bramki_za"], ostatni["bramki_przeciw"], ostatni["przeciwnik"]) == (7, 0, "Klub Testowy 3")
+
+def test_mecz_innego_procesu_w_tabeli_historycznej(client, kluby):
+    naglowki = {"cache-control": "no-cache"}
+    assert client.post("/mecze/", json={
+        "data_meczu": "2188-08-01T15:00:00", "id_klubu_gospodarze": kluby[0], "id_klubu_goscie": kluby[1],
+        "sezon": "2188/89", "kolejka": 1, "bramki_gospodarze": 1, "bramki_goscie": 1
+    }).status_code == 200
+    assert len(client.get("/tabela", params={"sezon": "2188/89"}, headers=naglowki).json()) == 2
+    cache.wersje.synchronizuj(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Mecze.__table__).values(
+            data_meczu=datetime(2188, 8, 8, 15), id_klubu_gospodarze=kluby[2], id_klubu_goscie=kluby[3],
+            sezon="2188/89", kolejka=2, bramki_gospodarze=2, bramki_goscie=0
+        ))
+    _inny_proces("mecze", "kluby")
+    cache.wersje.synchronizuj(engine)
+
+    tabela = client.get("/tabela", params={"sezon": "2188/89"}, headers=naglowki).json()
+    assert [(w["id_klubu"], w["punkty"]) for w in tabela[:1]] == [(kluby[2], 3)]
+
+def test_wlasne_zapisy_nie_sa_cudze(client):
+    cache.wersje.synchronizuj(engine)
+    assert client.post("/kluby/", json={"nazwa_klubu": "Wersje Rovers"}).status_code == 200
+    assert cache.wersje.synchronizuj(engine) == set()
+
+def test_sluchacze_dostaja_cudze_tagi(client):
+    zmiany = []
+    cache.wersje.nasluchuj(("transfery",), zmiany.append)
+    cache.wersje.synchronizuj(engine)
+    _inny_proces("transfery", "slowniki")
+    cache.wersje.synchronizuj(engine)
+    _inny_proces("slowniki")
+    cache.wersje.synchronizuj(engine)
+    assert zmiany == [{"transfery", "slowniki"}]